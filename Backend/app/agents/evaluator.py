@@ -1,5 +1,6 @@
 """Evaluator agent: classifies DevOps query as general or debug, reasons and reframes."""
 from typing import Dict, Any
+from app.core import instrumentation
 from app.core.logging import get_logger
 from app.llm.llm import get_llm
 from app.state.state import AgentState
@@ -9,6 +10,7 @@ logger = get_logger(__name__)
 DEBUG_KEYWORDS = ["error", "crash", "fail", "debug", "exception", "traceback", "issue", "broken", "not working"]
 
 
+@instrumentation.agent("Evaluator")
 def evaluate_devops_query(state: AgentState) -> Dict[str, Any]:
     """Classify query as general or debug, and reframe if needed."""
     query = state.query
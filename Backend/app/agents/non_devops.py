@@ -1,11 +1,13 @@
 """Non-DevOps agent: responds to non-DevOps queries."""
 from typing import Dict, Any
+from app.core import instrumentation
 from app.core.logging import get_logger
 from app.state.state import AgentState
 
 logger = get_logger(__name__)
 
 
+@instrumentation.agent("NonDevOpsAgent")
 def handle_non_devops(state: AgentState) -> Dict[str, Any]:
     """Return response for non-DevOps queries."""
     answer = "I can only answer DevOps-related queries. Please ask something related to deployment, infrastructure, CI/CD, or similar topics."
@@ -2,18 +2,32 @@
 from typing import Dict, Any, List
 from app.core.logging import get_logger
 from app.core import auth
+from app.core import instrumentation
+from app.core import reranker
+from app.core.config import settings
 from app.state.state import AgentState
 
 logger = get_logger(__name__)
 
 
+@instrumentation.agent("RetrieverAgent")
 def retrieve_docs(state: AgentState) -> Dict[str, Any]:
     """Retrieve relevant documents using keyword search from TinyDB."""
     query = state.reframed_query or state.query
-    
+    # Search the raw and reframed phrasings together; they often match different docs
+    variants = [state.query] if state.query and state.query != query else []
+
     try:
-        # Use the existing auth.search_docs function
-        results = auth.search_docs(query, top_k=5)
+        # Use the existing auth.search_docs function; with reranking enabled, pull a
+        # wider candidate set and keep only the best few passages for the prompt
+        if settings.RERANK_ENABLED and reranker.is_ready():
+            with instrumentation.call("vector", "search_docs"):
+                candidates = auth.search_docs(query, top_k=settings.RERANK_CANDIDATES, variants=variants, filters=state.doc_filters)
+            with instrumentation.call("rerank", settings.RERANK_MODEL):
+                results = reranker.rerank(query, candidates, top_k=settings.RERANK_TOP_K)
+        else:
+            with instrumentation.call("vector", "search_docs"):
+                results = auth.search_docs(query, top_k=5, variants=variants, filters=state.doc_filters)
 
         # Normalize results: ensure each item has id, title, content, score
         normalized = []
@@ -23,7 +37,10 @@ def retrieve_docs(state: AgentState) -> Dict[str, Any]:
             title = r.get("title") or (r.get("metadata") or {}).get("title") or (r.get("document") or "")[:80]
             content = r.get("content") or r.get("document") or (r.get("metadata") or {}).get("content") or ""
             score = r.get("score") if r.get("score") is not None else r.get("distance")
-            normalized.append({"id": doc_id, "title": title, "content": content, "score": score})
+            entry = {"id": doc_id, "title": title, "content": content, "score": score}
+            if r.get("rerank_score") is not None:
+                entry["rerank_score"] = r.get("rerank_score")
+            normalized.append(entry)
 
         logger.info("RetrieverAgent: retrieved %d docs for query=%s", len(normalized), query)
 
@@ -1,5 +1,6 @@
 """Search agent: uses SerpAPI to search Google."""
 from typing import Dict, Any, List
+from app.core import instrumentation
 from app.core.logging import get_logger
 from app.core.config import settings
 from app.state.state import AgentState
@@ -7,6 +8,7 @@ from app.state.state import AgentState
 logger = get_logger(__name__)
 
 
+@instrumentation.agent("SearchAgent")
 def search_google(state: AgentState) -> Dict[str, Any]:
     """Search Google using SerpAPI for the (possibly reframed) query."""
     query = state.reframed_query or state.query
@@ -28,7 +30,8 @@ def search_google(state: AgentState) -> Dict[str, Any]:
             "api_key": settings.SERPAPI_API_KEY,
             "num": 5,
         }
-        results_dict = serpapi.search(params)
+        with instrumentation.call("search", "serpapi"):
+            results_dict = serpapi.search(params)
         
         organic_results = results_dict.get("organic_results", [])[:5]
         formatted = []
@@ -1,6 +1,7 @@
 """Synthesizer agent: synthesizes final answer based on all collected evidence."""
 from typing import List, Dict, Any
 from app.llm.llm import get_llm
+from app.core import instrumentation
 from app.core.logging import get_logger
 from app.state.state import AgentState
 from app.mcp import mcp_registry
@@ -8,6 +9,7 @@ from app.mcp import mcp_registry
 logger = get_logger(__name__)
 
 
+@instrumentation.agent("Synthesizer")
 def synthesize_answer(state: AgentState) -> Dict[str, Any]:
     """Synthesize final answer using retrieval results and search results.
 
@@ -28,7 +30,8 @@ def synthesize_answer(state: AgentState) -> Dict[str, Any]:
     if google_mcp:
         try:
             # Expect MCP instance to provide a `search(query, num=5)` method
-            mcp_results = google_mcp.search(query, num=5)
+            with instrumentation.call("mcp", "google"):
+                mcp_results = google_mcp.search(query, num=5)
             if mcp_results:
                 # Normalize to expected format
                 formatted = []
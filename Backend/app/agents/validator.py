@@ -1,5 +1,6 @@
 """Validator agent: checks guardrails and if query is DevOps-related."""
 from typing import Dict, Any
+from app.core import instrumentation
 from app.core.logging import get_logger
 from app.llm.llm import get_llm
 from app.state.state import AgentState
@@ -9,6 +10,7 @@ logger = get_logger(__name__)
 FORBIDDEN_KEYWORDS = ["attack", "bomb", "illegal", "hack"]
 
 
+@instrumentation.agent("Validator")
 def validate_query(state: AgentState) -> Dict[str, Any]:
     """Check guardrails and determine if query is DevOps-related using LLM.
     
@@ -26,6 +28,7 @@ def validate_query(state: AgentState) -> Dict[str, Any]:
                 "guardail_reason": "Query is blocked due to guardrail violation",
                 "is_devops_query": False,
                 "current_agent": "Validator",
+                "agent_steps": state.agent_steps + [{"agent": "Validator", "status": "blocked"}],
             }
     
     # 2. Check if DevOps-related using LLM
@@ -63,4 +66,5 @@ Answer with only "YES" or "NO"."""
         "guardail_reason": "Passed guardrail check",
         "is_devops_query": is_devops,
         "current_agent": "Validator",
+        "agent_steps": state.agent_steps + [{"agent": "Validator", "status": "done", "is_devops": is_devops}],
     }
@@ -1,22 +1,85 @@
 """Analytics API: expose recorded questions and aggregated stats."""
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Dict
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Dict, Optional
+import os
 
+from app.api.conditional import check_etag
 from app.api.docs import get_current_user, require_admin
-from app.core import analytics
+from app.core import analytics, export
+from app.core.config import settings
 
 router = APIRouter()
 
 
 @router.get("/analytics/questions", response_model=List[Dict])
-def get_questions(current_user: dict = Depends(get_current_user)):
-    """Return recorded questions for the current user; admins get all."""
-    if current_user and current_user.get("role") == "admin":
-        return analytics.list_questions()
-    return analytics.list_questions(username=current_user.get("username"))
+def get_questions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="page size; omit with cursor for the full list"),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="comma-separated question fields (default: all)"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Return recorded questions for the current user (admins get all).
 
+    Without `limit` or `cursor` every question is returned, oldest first, as
+    before pagination existed. With either, one page is returned newest first
+    (`limit` defaults to 100); when more remain, the `X-Next-Cursor` response
+    header holds the `cursor` for the next page.
+    """
+    username = None if current_user and current_user.get("role") == "admin" else current_user.get("username")
+    try:
+        selected = analytics.parse_fields(fields)
+        if limit is None and cursor is None:
+            return [q for chunk in analytics.stream_questions(username=username, fields=selected,
+                                                              chunk_size=settings.EXPORT_CHUNK_SIZE) for q in chunk]
+        page = analytics.page_questions(username=username, limit=limit or 100, cursor=cursor, fields=selected)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
 
-@router.get("/analytics/stats", response_model=Dict)
+
+# check_etag (a route-level dependency, resolved before the parameters) also requires an admin
+@router.get("/analytics/stats", response_model=Dict, dependencies=[Depends(check_etag)])
 def get_stats(admin_user: dict = Depends(require_admin)):
     """Return aggregated stats (admin only)."""
     return analytics.stats_summary()
+
+
+@router.get("/analytics/export")
+def export_questions(
+    format: str = Query("ndjson", description="ndjson, csv or parquet"),
+    since: Optional[datetime] = Query(None, description="include questions at or after this time"),
+    until: Optional[datetime] = Query(None, description="include questions before this time"),
+    username: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="comma-separated question fields (default: all)"),
+    admin_user: dict = Depends(require_admin),
+):
+    """Export recorded questions as a download, oldest first (admin only).
+
+    Rows are read and encoded in chunks, so memory use does not grow with the
+    number of rows exported. Parquet requires pyarrow on the server.
+    """
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}. Allowed: {', '.join(export.FORMATS)}")
+    try:
+        names = analytics.parse_fields(fields) or list(analytics.QUESTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export not available. Please install pyarrow.")
+
+    media_type, extension = export.FORMATS[format]
+    filename = f"questions-{datetime.now(timezone.utc):%Y%m%d%H%M%S}.{extension}"
+    chunks = analytics.stream_questions(since, until, username, names, settings.EXPORT_CHUNK_SIZE)
+    if format == "parquet":
+        path = export.write_parquet(chunks, names)
+        return FileResponse(path, media_type=media_type, filename=filename, background=BackgroundTask(os.remove, path))
+
+    body = export.ndjson_chunks(chunks) if format == "ndjson" else export.csv_chunks(chunks, names)
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
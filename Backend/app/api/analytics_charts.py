@@ -1,43 +1,26 @@
 """Analytics charts API: time-series, insights, predictions, and comprehensive visualizations."""
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta, timezone
 from collections import defaultdict
 import math
 
+from app.api.conditional import check_etag
 from app.api.docs import get_current_user, require_admin
-from app.core import analytics
+from app.core import analytics, result_cache, rollups
+from app.core.analytics_queries import BUCKETS, DAY_NAMES, bucket_key
+from app.core.config import settings
 from app.llm.llm import get_llm
 from app.core.logging import get_logger
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+# Route-level `dependencies` are resolved before the endpoint's parameters;
+# check_etag checks for an admin itself, so non-admins get 403 rather than 304.
 
-def _parse_timestamp(ts_str: str) -> datetime:
-    """Parse ISO timestamp string to datetime."""
-    try:
-        return datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-    except Exception:
-        return datetime.now(timezone.utc)
-
-
-def _bucket_timestamp(dt: datetime, bucket: str = "day") -> str:
-    """Return a bucket key (YYYY-MM-DD for day, YYYY-MM for month, etc.)."""
-    if bucket == "hour":
-        return dt.strftime("%Y-%m-%d %H:00")
-    elif bucket == "day":
-        return dt.strftime("%Y-%m-%d")
-    elif bucket == "week":
-        # ISO week number
-        return f"{dt.isocalendar()[0]}-W{dt.isocalendar()[1]:02d}"
-    elif bucket == "month":
-        return dt.strftime("%Y-%m")
-    else:
-        return dt.strftime("%Y-%m-%d")
-
-
-@router.get("/analytics/charts/questions-timeseries")
+
+@router.get("/analytics/charts/questions-timeseries", dependencies=[Depends(check_etag)])
 def get_questions_timeseries(
     bucket: str = "day",
     days_back: int = 30,
@@ -49,28 +32,19 @@ def get_questions_timeseries(
     - days_back: number of days to include
     - Returns: { buckets: [{ key, count, timestamp }], total }
     """
-    questions = analytics.list_questions()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days_back)
-    
-    bucketed: Dict[str, int] = defaultdict(int)
-    for q in questions:
-        ts = _parse_timestamp(q.get("timestamp", datetime.now(timezone.utc).isoformat()))
-        if ts >= cutoff:
-            key = _bucket_timestamp(ts, bucket)
-            bucketed[key] += 1
-    
-    sorted_keys = sorted(bucketed.keys())
-    result = [{"key": k, "count": bucketed[k]} for k in sorted_keys]
+    bucketed = analytics.time_buckets("questions", bucket, cutoff)
+    result = [{"key": k, "count": bucketed[k]} for k in sorted(bucketed)]
     
     return {
         "bucket": bucket,
         "days_back": days_back,
         "buckets": result,
-        "total": len([q for q in questions if _parse_timestamp(q.get("timestamp", datetime.now(timezone.utc).isoformat())) >= cutoff]),
+        "total": sum(bucketed.values()),
     }
 
 
-@router.get("/analytics/charts/tags-timeseries")
+@router.get("/analytics/charts/tags-timeseries", dependencies=[Depends(check_etag)])
 def get_tags_timeseries(
     bucket: str = "day",
     days_back: int = 30,
@@ -83,20 +57,14 @@ def get_tags_timeseries(
     - top_n: number of top tags to include
     - Returns: { tags: [tag_name], buckets: [{ key, tag_counts }] }
     """
-    questions = analytics.list_questions()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days_back)
+    bucketed_tags = analytics.time_buckets("tags", bucket, cutoff)
     
     # collect all tags with counts
     tag_counts: Dict[str, int] = defaultdict(int)
-    bucketed_tags: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-    
-    for q in questions:
-        ts = _parse_timestamp(q.get("timestamp", datetime.now(timezone.utc).isoformat()))
-        if ts >= cutoff:
-            key = _bucket_timestamp(ts, bucket)
-            for tag in q.get("tags", []):
-                tag_counts[tag] += 1
-                bucketed_tags[key][tag] += 1
+    for counts in bucketed_tags.values():
+        for tag, count in counts.items():
+            tag_counts[tag] += count
     
     # get top tags
     top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
@@ -115,11 +83,7 @@ def get_tags_timeseries(
     }
 
 
-@router.get("/analytics/charts/distribution")
-def get_distribution(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Return distributions for pie/bar charts: by user, by tag, by MCP usage."""
-    stats = analytics.stats_summary()
-    
+def _distribution_from_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "by_user": [{"name": user, "value": count} for user, count in stats.get("by_user", {}).items()],
         "by_tag": [{"name": tag, "value": count} for tag, count in stats.get("by_tag", {}).items()],
@@ -127,10 +91,29 @@ def get_distribution(admin_user: dict = Depends(require_admin)) -> Dict[str, Any
     }
 
 
-@router.get("/analytics/charts/user-comparison")
-def get_user_comparison(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Return metrics per user for comparative bar/scatter charts."""
-    questions = analytics.list_questions()
+@router.get("/analytics/charts/distribution", dependencies=[Depends(check_etag)])
+def get_distribution(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Return distributions for pie/bar charts: by user, by tag, by MCP usage."""
+    return _distribution_from_stats(analytics.stats_summary())
+
+
+_USER_COMPARISON_DIMS = [rollups.USER, rollups.USER_MCP, rollups.USER_TAGS]
+
+
+def _user_comparison_from_totals(totals: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    return {"users": [
+        {
+            "user": user,
+            "total_questions": total,
+            "mcp_used_count": totals[rollups.USER_MCP].get(user, 0),
+            "mcp_usage_rate": (totals[rollups.USER_MCP].get(user, 0) / total) if total > 0 else 0,
+            "avg_tags_per_question": (totals[rollups.USER_TAGS].get(user, 0) / total) if total > 0 else 0,
+        }
+        for user, total in totals[rollups.USER].items()
+    ]}
+
+
+def _user_comparison_from_questions(questions: List[Dict[str, Any]]) -> Dict[str, Any]:
     user_metrics: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"total": 0, "mcp_used": 0, "avg_tags": 0, "tags": []})
     
     for q in questions:
@@ -138,7 +121,7 @@ def get_user_comparison(admin_user: dict = Depends(require_admin)) -> Dict[str,
         user_metrics[user]["total"] += 1
         if q.get("used_mcp"):
             user_metrics[user]["mcp_used"] += 1
-        user_metrics[user]["tags"].extend(q.get("tags", []))
+        user_metrics[user]["tags"].extend(q.get("tags") or [])
     
     result = []
     for user, metrics in user_metrics.items():
@@ -155,17 +138,31 @@ def get_user_comparison(admin_user: dict = Depends(require_admin)) -> Dict[str,
     return {"users": result}
 
 
-@router.get("/analytics/charts/tag-correlation")
-def get_tag_correlation(top_n: int = 10, admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Return tag co-occurrence (heatmap data): tags that often appear together."""
-    questions = analytics.list_questions()
-    
+@router.get("/analytics/charts/user-comparison", dependencies=[Depends(check_etag)])
+def get_user_comparison(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Return metrics per user for comparative bar/scatter charts."""
+    totals = analytics.dimension_totals(_USER_COMPARISON_DIMS)
+    if totals is not None:
+        return _user_comparison_from_totals(totals)
+    return _user_comparison_from_questions(analytics.list_questions())
+
+
+def _tag_correlation_from_index(index, top_n: int) -> Dict[str, Any]:
+    top_tags = [f["tag"] for f in index.frequencies(limit=top_n)]
+    heatmap = {tag: {other: 0 for other in top_tags} for tag in top_tags}
+    for (t1, t2), count in index.co_occurrence(top_tags).items():
+        heatmap[t1][t2] = count
+        heatmap[t2][t1] = count
+    return {"tags": top_tags, "heatmap": heatmap}
+
+
+def _tag_correlation_from_questions(questions: List[Dict[str, Any]], top_n: int) -> Dict[str, Any]:
     # count co-occurrences
     tag_pairs: Dict[tuple, int] = defaultdict(int)
     all_tags: set = set()
     
     for q in questions:
-        tags = q.get("tags", [])
+        tags = q.get("tags") or []
         all_tags.update(tags)
         # count all pairs
         for i, t1 in enumerate(tags):
@@ -174,7 +171,7 @@ def get_tag_correlation(top_n: int = 10, admin_user: dict = Depends(require_admi
                 tag_pairs[pair] += 1
     
     # get top tags
-    top_tags = sorted(all_tags, key=lambda t: sum(1 for q in questions if t in q.get("tags", [])), reverse=True)[:top_n]
+    top_tags = sorted(all_tags, key=lambda t: sum(1 for q in questions if t in (q.get("tags") or [])), reverse=True)[:top_n]
     
     # build heatmap matrix
     heatmap: Dict[str, Dict[str, int]] = {tag: {other: 0 for other in top_tags} for tag in top_tags}
@@ -189,17 +186,41 @@ def get_tag_correlation(top_n: int = 10, admin_user: dict = Depends(require_admi
     }
 
 
-@router.get("/analytics/charts/success-rate")
-def get_success_rate(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Return success metrics: answer completeness, MCP efficiency."""
-    questions = analytics.list_questions()
-    
+@router.get("/analytics/charts/tag-correlation", dependencies=[Depends(check_etag)])
+def get_tag_correlation(top_n: int = 10, admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Return tag co-occurrence (heatmap data): tags that often appear together."""
+    index = analytics.tag_index()
+    if index is not None:
+        return _tag_correlation_from_index(index, top_n)
+    return _tag_correlation_from_questions(analytics.list_questions(), top_n)
+
+
+_SUCCESS_RATE_DIMS = [rollups.QUESTIONS, rollups.ANSWERED, rollups.ANSWER_CHARS, rollups.MCP]
+
+
+def _success_rate_from_totals(totals: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    total = totals[rollups.QUESTIONS].get("", 0)
+    if not total:
+        return {"total": 0, "with_answer": 0, "with_mcp": 0, "avg_answer_length": 0}
+    answered = totals[rollups.ANSWERED].get("", 0)
+    with_mcp = sum(totals[rollups.MCP].values())
+    return {
+        "total_questions": total,
+        "answered": answered,
+        "answered_rate": answered / total,
+        "with_mcp": with_mcp,
+        "mcp_rate": with_mcp / total,
+        "avg_answer_length": totals[rollups.ANSWER_CHARS].get("", 0) / total,
+    }
+
+
+def _success_rate_from_questions(questions: List[Dict[str, Any]]) -> Dict[str, Any]:
     if not questions:
         return {"total": 0, "with_answer": 0, "with_mcp": 0, "avg_answer_length": 0}
     
     with_answer = len([q for q in questions if q.get("final_answer")])
     with_mcp = len([q for q in questions if q.get("used_mcp")])
-    avg_answer_len = sum(len(q.get("final_answer", "")) for q in questions) / len(questions) if questions else 0
+    avg_answer_len = sum(len(q.get("final_answer") or "") for q in questions) / len(questions) if questions else 0
     
     return {
         "total_questions": len(questions),
@@ -211,24 +232,31 @@ def get_success_rate(admin_user: dict = Depends(require_admin)) -> Dict[str, Any
     }
 
 
-@router.get("/analytics/charts/insights")
-def get_llm_insights(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Use LLM to analyze questions and generate human-readable insights."""
-    try:
-        questions = analytics.list_questions()
-        if not questions:
-            return {"insights": "No questions recorded yet.", "recommendations": []}
-        
-        llm = get_llm()
-        
-        # prepare summary for LLM
-        stats = analytics.stats_summary()
-        recent_questions = sorted(questions, key=lambda q: q.get("timestamp", ""), reverse=True)[:10]
-        recent_text = "\n".join([f"- {q.get('question')[:100]} (tags: {','.join(q.get('tags', []))})" for q in recent_questions])
-        
-        prompt = f"""Analyze these DevOps support analytics and provide brief insights:
-
-Total questions: {len(questions)}
+@router.get("/analytics/charts/success-rate", dependencies=[Depends(check_etag)])
+def get_success_rate(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Return success metrics: answer completeness, MCP efficiency."""
+    totals = analytics.dimension_totals(_SUCCESS_RATE_DIMS)
+    if totals is not None:
+        return _success_rate_from_totals(totals)
+    return _success_rate_from_questions(analytics.list_questions())
+
+
+def _compute_insights() -> Dict[str, Any]:
+    """Ask the LLM for insights on current usage; raises if the LLM call fails."""
+    stats = analytics.stats_summary()
+    total = stats.get("total_questions", 0)
+    if not total:
+        return {"insights": "No questions recorded yet.", "recommendations": [], "total_questions": 0}
+
+    llm = get_llm()
+
+    # prepare summary for LLM
+    recent_questions = analytics.page_questions(limit=10, fields=["question", "tags"])["items"]
+    recent_text = "\n".join([f"- {(q.get('question') or '')[:100]} (tags: {','.join(q.get('tags') or [])})" for q in recent_questions])
+
+    prompt = f"""Analyze these DevOps support analytics and provide brief insights:
+
+Total questions: {total}
 By user: {stats.get('by_user', {})}
 Top tags: {dict(sorted(stats.get('by_tag', {}).items(), key=lambda x: x[1], reverse=True)[:5])}
 MCP usage: {stats.get('mcp_usage', {})}
@@ -240,58 +268,50 @@ Provide:
 1. 2-3 key insights about usage patterns
 2. 2-3 actionable recommendations
 Format: INSIGHTS: <insights> RECOMMENDATIONS: <recommendations>"""
-        
-        response = llm.invoke(prompt)
-        content = response.content if hasattr(response, "content") else str(response)
-        
-        # parse response
-        insights = content.split("RECOMMENDATIONS:")[0].replace("INSIGHTS:", "").strip() if "INSIGHTS:" in content else content[:200]
-        recommendations_text = content.split("RECOMMENDATIONS:")[1].strip() if "RECOMMENDATIONS:" in content else ""
-        recommendations = [r.strip() for r in recommendations_text.split("\n") if r.strip()][:3]
-        
+
+    response = llm.invoke(prompt)
+    content = response.content if hasattr(response, "content") else str(response)
+
+    # parse response
+    insights = content.split("RECOMMENDATIONS:")[0].replace("INSIGHTS:", "").strip() if "INSIGHTS:" in content else content[:200]
+    recommendations_text = content.split("RECOMMENDATIONS:")[1].strip() if "RECOMMENDATIONS:" in content else ""
+    recommendations = [r.strip() for r in recommendations_text.split("\n") if r.strip()][:3]
+
+    return {
+        "insights": insights,
+        "recommendations": recommendations,
+        "total_questions": total,
+    }
+
+
+def _compute_predictions() -> Dict[str, Any]:
+    """Ask the LLM to predict trends from the last two weeks; raises if the LLM call fails."""
+    now = datetime.now(timezone.utc)
+    week_ago = now - timedelta(days=7)
+    two_weeks_ago = now - timedelta(days=14)
+    recent_7 = analytics.question_count(since=week_ago)
+    prev_7 = analytics.question_count(since=two_weeks_ago, until=week_ago)
+
+    if analytics.question_count() < 5:
         return {
-            "insights": insights,
-            "recommendations": recommendations,
-            "total_questions": len(questions),
-            "analyzed_at": datetime.now(timezone.utc).isoformat(),
+            "prediction": "Insufficient data for meaningful predictions.",
+            "confidence": "low",
+            "trend": "stable",
+            "growth_rate_percent": 0,
+            "recent_7d": recent_7,
+            "prev_7d": prev_7,
         }
-    except Exception as e:
-        logger.error("LLM insights failed: %s", e)
-        return {"insights": "Unable to generate insights at this time.", "recommendations": []}
 
+    llm = get_llm()
 
-@router.get("/analytics/charts/predictions")
-def get_predictions(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Use LLM to predict future trends."""
-    try:
-        questions = analytics.list_questions()
-        if len(questions) < 5:
-            return {
-                "prediction": "Insufficient data for meaningful predictions.",
-                "confidence": "low",
-                "trend": "stable",
-                "growth_rate_percent": 0,
-                "recent_7d": 0,
-                "prev_7d": 0,
-            }
-        
-        llm = get_llm()
-        
-        # simple trend: last 7 days vs before
-        now = datetime.now(timezone.utc)
-        week_ago = now - timedelta(days=7)
-        two_weeks_ago = now - timedelta(days=14)
-        
-        recent_7 = len([q for q in questions if _parse_timestamp(q.get("timestamp", "")) >= week_ago])
-        prev_7 = len([q for q in questions if two_weeks_ago <= _parse_timestamp(q.get("timestamp", "")) < week_ago])
-        
-        trend = "increasing" if recent_7 > prev_7 else "decreasing" if recent_7 < prev_7 else "stable"
-        growth_rate = ((recent_7 - prev_7) / prev_7 * 100) if prev_7 > 0 else 0
-        
-        stats = analytics.stats_summary()
-        top_tags = sorted(stats.get("by_tag", {}).items(), key=lambda x: x[1], reverse=True)[:3]
-        
-        prompt = f"""Based on DevOps question analytics, predict future trends:
+    # simple trend: last 7 days vs before
+    trend = "increasing" if recent_7 > prev_7 else "decreasing" if recent_7 < prev_7 else "stable"
+    growth_rate = ((recent_7 - prev_7) / prev_7 * 100) if prev_7 > 0 else 0
+
+    stats = analytics.stats_summary()
+    top_tags = sorted(stats.get("by_tag", {}).items(), key=lambda x: x[1], reverse=True)[:3]
+
+    prompt = f"""Based on DevOps question analytics, predict future trends:
 
 Current trend: {trend} ({growth_rate:+.1f}% growth)
 Recent 7 days: {recent_7} questions
@@ -302,58 +322,66 @@ Provide a brief prediction (1-2 sentences) about:
 1. Expected question volume trend
 2. Likely top topics in the next period
 Format: PREDICTION: <prediction> CONFIDENCE: <low/medium/high>"""
-        
-        response = llm.invoke(prompt)
-        content = response.content if hasattr(response, "content") else str(response)
-        
-        prediction = content.split("CONFIDENCE:")[0].replace("PREDICTION:", "").strip() if "PREDICTION:" in content else content[:200]
-        confidence = content.split("CONFIDENCE:")[1].strip() if "CONFIDENCE:" in content else "medium"
-        
-        return {
-            "prediction": prediction,
-            "confidence": confidence,
-            "trend": trend,
-            "growth_rate_percent": growth_rate,
-            "recent_7d": recent_7,
-            "prev_7d": prev_7,
-        }
-    except Exception as e:
-        logger.error("Predictions failed: %s", e)
-        return {
-            "prediction": "Unable to generate predictions at this time.", 
-            "confidence": "low",
-            "trend": "stable", 
-            "growth_rate_percent": 0, 
-            "recent_7d": 0, 
-            "prev_7d": 0
-        }
 
+    response = llm.invoke(prompt)
+    content = response.content if hasattr(response, "content") else str(response)
+
+    prediction = content.split("CONFIDENCE:")[0].replace("PREDICTION:", "").strip() if "PREDICTION:" in content else content[:200]
+    confidence = content.split("CONFIDENCE:")[1].strip() if "CONFIDENCE:" in content else "medium"
+
+    return {
+        "prediction": prediction,
+        "confidence": confidence,
+        "trend": trend,
+        "growth_rate_percent": growth_rate,
+        "recent_7d": recent_7,
+        "prev_7d": prev_7,
+    }
+
+
+result_cache.register(
+    "insights", _compute_insights,
+    fallback={"insights": "Unable to generate insights at this time.", "recommendations": []},
+)
+result_cache.register(
+    "predictions", _compute_predictions,
+    fallback={
+        "prediction": "Unable to generate predictions at this time.",
+        "confidence": "low",
+        "trend": "stable",
+        "growth_rate_percent": 0,
+        "recent_7d": 0,
+        "prev_7d": 0,
+    },
+)
 
-@router.get("/analytics/charts/heatmap-hours")
+
+@router.get("/analytics/charts/insights")
+def get_llm_insights(refresh: bool = False, admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Use LLM to analyze questions and generate human-readable insights.
+
+    Served from the result cache: the last analysis is returned at once with
+    its `analyzed_at`, and recomputed in the background when stale (or when
+    `refresh` is set).
+    """
+    return result_cache.get("insights", refresh=refresh)
+
+
+@router.get("/analytics/charts/predictions")
+def get_predictions(refresh: bool = False, admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Use LLM to predict future trends (cached like `/analytics/charts/insights`)."""
+    return result_cache.get("predictions", refresh=refresh)
+
+
+@router.get("/analytics/charts/heatmap-hours", dependencies=[Depends(check_etag)])
 def get_heatmap_hours(days_back: int = 30, admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
     """Return hourly heatmap (which hours are busiest) for visualization."""
-    questions = analytics.list_questions()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days_back)
     
     # count by day-of-week and hour
-    heatmap: Dict[str, Dict[str, int]] = {
-        f"Mon": {f"{h:02d}:00": 0 for h in range(24)},
-        f"Tue": {f"{h:02d}:00": 0 for h in range(24)},
-        f"Wed": {f"{h:02d}:00": 0 for h in range(24)},
-        f"Thu": {f"{h:02d}:00": 0 for h in range(24)},
-        f"Fri": {f"{h:02d}:00": 0 for h in range(24)},
-        f"Sat": {f"{h:02d}:00": 0 for h in range(24)},
-        f"Sun": {f"{h:02d}:00": 0 for h in range(24)},
-    }
-    
-    day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    
-    for q in questions:
-        ts = _parse_timestamp(q.get("timestamp", datetime.now(timezone.utc).isoformat()))
-        if ts >= cutoff:
-            day_name = day_names[ts.weekday()]
-            hour_key = f"{ts.hour:02d}:00"
-            heatmap[day_name][hour_key] += 1
+    heatmap: Dict[str, Dict[str, int]] = {day: {f"{h:02d}:00": 0 for h in range(24)} for day in DAY_NAMES}
+    for dow, hour, count in analytics.time_buckets("hour_of_week", since=cutoff):
+        heatmap[DAY_NAMES[dow]][f"{hour:02d}:00"] += count
     
     return {
         "heatmap": heatmap,
@@ -361,20 +389,27 @@ def get_heatmap_hours(days_back: int = 30, admin_user: dict = Depends(require_ad
     }
 
 
-@router.get("/analytics/charts/scatter-tags-volume")
-def get_scatter_tags_volume(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Return scatter plot data: tag frequency vs avg questions per tag (for identifying patterns)."""
-    questions = analytics.list_questions()
-    
+def _scatter_from_index(index) -> Dict[str, Any]:
+    freqs = index.frequencies()
+    return {
+        "points": [
+            {"tag": f["tag"], "frequency": f["questions"], "avg_per_q": f["occurrences"] / f["questions"]}
+            for f in freqs
+        ],
+        "total_tags": len(freqs),
+    }
+
+
+def _scatter_from_questions(questions: List[Dict[str, Any]]) -> Dict[str, Any]:
     tag_info: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"total": 0, "in_questions": 0})
     
     for q in questions:
-        for tag in q.get("tags", []):
+        for tag in q.get("tags") or []:
             tag_info[tag]["in_questions"] += 1
     
     # count questions that have each tag
     for tag in tag_info:
-        tag_info[tag]["total"] = sum(1 for q in questions if tag in q.get("tags", []))
+        tag_info[tag]["total"] = sum(1 for q in questions if tag in (q.get("tags") or []))
     
     scatter_points = []
     for tag, info in tag_info.items():
@@ -390,16 +425,35 @@ def get_scatter_tags_volume(admin_user: dict = Depends(require_admin)) -> Dict[s
     }
 
 
-@router.get("/analytics/charts/agent-efficiency")
-def get_agent_efficiency(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
-    """Return agent performance metrics: which agents run most, avg steps per question."""
-    questions = analytics.list_questions()
-    
+@router.get("/analytics/charts/scatter-tags-volume", dependencies=[Depends(check_etag)])
+def get_scatter_tags_volume(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Return scatter plot data: tag frequency vs avg questions per tag (for identifying patterns)."""
+    index = analytics.tag_index()
+    if index is not None:
+        return _scatter_from_index(index)
+    return _scatter_from_questions(analytics.list_questions())
+
+
+_AGENT_EFFICIENCY_DIMS = [rollups.QUESTIONS, rollups.AGENT]
+
+
+def _agent_efficiency_from_totals(totals: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    agent_counts = totals[rollups.AGENT]
+    total = totals[rollups.QUESTIONS].get("", 0)
+    total_steps = sum(agent_counts.values())
+    return {
+        "agents": [{"agent": agent, "count": count} for agent, count in sorted(agent_counts.items(), key=lambda x: x[1], reverse=True)],
+        "total_steps": total_steps,
+        "avg_steps_per_question": total_steps / total if total else 0,
+    }
+
+
+def _agent_efficiency_from_questions(questions: List[Dict[str, Any]]) -> Dict[str, Any]:
     agent_counts: Dict[str, int] = defaultdict(int)
     total_steps = 0
     
     for q in questions:
-        steps = q.get("agent_steps", [])
+        steps = q.get("agent_steps") or []
         total_steps += len(steps)
         for step in steps:
             agent = step.get("agent", "unknown")
@@ -414,87 +468,255 @@ def get_agent_efficiency(admin_user: dict = Depends(require_admin)) -> Dict[str,
     }
 
 
-@router.get("/analytics/history/user")
-def get_user_history(limit: int = 50, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
-    """Return question history for the current user (extracted from JWT).
-    
-    - limit: max number of records to return
-    - Returns: { user, total_questions, recent: [{ id, question, timestamp, tags, final_answer, used_mcp, mcp_results }] }
+@router.get("/analytics/charts/agent-efficiency", dependencies=[Depends(check_etag)])
+def get_agent_efficiency(admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Return agent performance metrics: which agents run most, avg steps per question."""
+    totals = analytics.dimension_totals(_AGENT_EFFICIENCY_DIMS)
+    if totals is not None:
+        return _agent_efficiency_from_totals(totals)
+    return _agent_efficiency_from_questions(analytics.list_questions())
+
+
+_PERCENTILES = (50, 90, 95, 99)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p90/p95/p99 and max of a non-empty list."""
+    values = sorted(values)
+    out = {f"p{p}": values[max(0, math.ceil(p / 100 * len(values)) - 1)] for p in _PERCENTILES}
+    out["max"] = values[-1]
+    return out
+
+
+def _timed_steps(days_back: int):
+    """Yield (timestamp, step) for agent steps with recorded timings in the last `days_back` days."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days_back)
+    for chunk in analytics.stream_questions(since=cutoff, fields=["timestamp", "agent_steps"], chunk_size=settings.EXPORT_CHUNK_SIZE):
+        for q in chunk:
+            for step in q.get("agent_steps") or []:
+                # questions recorded before instrumentation have no timings
+                if isinstance(step, dict) and step.get("duration_ms") is not None:
+                    yield q["timestamp"], step
+
+
+def _token_counts() -> Dict[str, int]:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0}
+
+
+def _token_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    return round((prompt_tokens * settings.LLM_PROMPT_TOKEN_COST + completion_tokens * settings.LLM_COMPLETION_TOKEN_COST) / 1e6, 6)
+
+
+@router.get("/analytics/charts/agent-latency", dependencies=[Depends(check_etag)])
+def get_agent_latency(days_back: int = 7, admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """Return latency percentiles (ms) per agent and per LLM/MCP/vector call, slowest p95 first.
+
+    - days_back: number of days to include
+    - Returns: { agents: [{ agent, count, p50, p90, p95, p99, max, avg_queue_wait_ms, cache_hits }],
+      calls: [{ kind, name, count, p50, p90, p95, p99, max, errors }] }
     """
-    username = current_user.get("username")
-    
-    all_questions = analytics.list_questions(username=username)
-    # sort by timestamp descending (newest first)
-    sorted_questions = sorted(all_questions, key=lambda q: q.get("timestamp", ""), reverse=True)[:limit]
-    
-    # format for frontend
-    recent = []
-    for q in sorted_questions:
-        recent.append({
-            "id": q.get("id"),
-            "question": q.get("question"),
-            "timestamp": q.get("timestamp"),
-            "tags": q.get("tags", []),
-            "final_answer": q.get("final_answer"),
-            "used_mcp": q.get("used_mcp"),
-            "mcp_results": q.get("mcp_results", []),
-            "agent_steps": q.get("agent_steps", []),
-        })
-    
-    # compute stats for this user
-    user_stats = {
-        "total_questions": len(all_questions),
-        "answered": len([q for q in all_questions if q.get("final_answer")]),
-        "with_mcp": len([q for q in all_questions if q.get("used_mcp")]),
-        "avg_answer_length": sum(len(q.get("final_answer", "")) for q in all_questions) / len(all_questions) if all_questions else 0,
+    durations: Dict[str, List[float]] = defaultdict(list)
+    waits: Dict[str, List[float]] = defaultdict(list)
+    cache_hits: Dict[str, int] = defaultdict(int)
+    call_durations: Dict[tuple, List[float]] = defaultdict(list)
+    call_errors: Dict[tuple, int] = defaultdict(int)
+
+    for _, step in _timed_steps(days_back):
+        agent = step.get("agent", "unknown")
+        durations[agent].append(step["duration_ms"])
+        if step.get("queue_wait_ms") is not None:
+            waits[agent].append(step["queue_wait_ms"])
+        cache_hits[agent] += step.get("cache_hits") or 0
+        for c in step.get("calls") or []:
+            key = (c.get("kind", ""), c.get("name", ""))
+            call_durations[key].append(c.get("duration_ms") or 0.0)
+            call_errors[key] += 1 if c.get("error") else 0
+
+    agents = [
+        {
+            "agent": agent,
+            "count": len(values),
+            **_percentiles(values),
+            "avg_queue_wait_ms": round(sum(waits[agent]) / len(waits[agent]), 1) if waits[agent] else None,
+            "cache_hits": cache_hits[agent],
+        }
+        for agent, values in durations.items()
+    ]
+    calls = [
+        {"kind": kind, "name": name, "count": len(values), **_percentiles(values), "errors": call_errors[(kind, name)]}
+        for (kind, name), values in call_durations.items()
+    ]
+    return {
+        "days_back": days_back,
+        "agents": sorted(agents, key=lambda a: a["p95"], reverse=True),
+        "calls": sorted(calls, key=lambda c: c["p95"], reverse=True),
     }
-    
+
+
+@router.get("/analytics/charts/token-usage", dependencies=[Depends(check_etag)])
+def get_token_usage(
+    bucket: str = "day",
+    days_back: int = 30,
+    admin_user: dict = Depends(require_admin),
+) -> Dict[str, Any]:
+    """Return LLM token usage and estimated cost over time, and totals per agent.
+
+    - bucket: "hour", "day", "week", "month"
+    - Cost uses LLM_PROMPT_TOKEN_COST / LLM_COMPLETION_TOKEN_COST (USD per million tokens)
+    - Returns: { buckets: [{ key, prompt_tokens, completion_tokens, llm_calls, cost }],
+      agents: [{ agent, prompt_tokens, completion_tokens, llm_calls, cost }], totals }
+    """
+    bucket = bucket if bucket in BUCKETS else "day"
+    buckets: Dict[str, Dict[str, int]] = defaultdict(_token_counts)
+    agents: Dict[str, Dict[str, int]] = defaultdict(_token_counts)
+    totals = _token_counts()
+
+    for timestamp, step in _timed_steps(days_back):
+        llm_calls = sum(1 for c in step.get("calls") or [] if c.get("kind") == "llm")
+        if not llm_calls:
+            continue
+        key = bucket_key(datetime.fromisoformat(timestamp), bucket)
+        for counts in (buckets[key], agents[step.get("agent", "unknown")], totals):
+            counts["prompt_tokens"] += step.get("prompt_tokens") or 0
+            counts["completion_tokens"] += step.get("completion_tokens") or 0
+            counts["llm_calls"] += llm_calls
+
+    def _row(counts: Dict[str, int]) -> Dict[str, Any]:
+        return {**counts, "cost": _token_cost(counts["prompt_tokens"], counts["completion_tokens"])}
+
+    return {
+        "bucket": bucket,
+        "days_back": days_back,
+        "buckets": [{"key": k, **_row(buckets[k])} for k in sorted(buckets)],
+        "agents": sorted(({"agent": a, **_row(c)} for a, c in agents.items()), key=lambda a: a["cost"], reverse=True),
+        "totals": _row(totals),
+    }
+
+
+DASHBOARD_CHARTS = (
+    "questions-timeseries", "tags-timeseries", "distribution", "user-comparison", "tag-correlation",
+    "success-rate", "heatmap-hours", "scatter-tags-volume", "agent-efficiency",
+)
+# Question columns read by the all-time charts when no totals source or tag index is in use
+_DASHBOARD_FIELDS = ["username", "tags", "agent_steps", "final_answer", "used_mcp"]
+
+
+@router.get("/analytics/charts/dashboard", dependencies=[Depends(check_etag)])
+def get_dashboard(
+    charts: Optional[str] = Query(None, description="comma-separated chart names (default: all)"),
+    bucket: str = "day",
+    days_back: int = 30,
+    top_n: int = 5,
+    correlation_top_n: int = 10,
+    admin_user: dict = Depends(require_admin),
+) -> Dict[str, Any]:
+    """Return several chart payloads in one response, keyed by chart name.
+
+    Each payload is the same as the chart's own endpoint returns. The all-time
+    charts share one totals query (rollups or the DuckDB mirror) and the tag
+    index queries, or, when those are not in use, a single pass over the
+    question columns they need. The windowed charts use the indexed
+    time-bucket queries.
+    """
+    selected = [c.strip() for c in charts.split(",") if c.strip()] if charts else list(DASHBOARD_CHARTS)
+    unknown = sorted(set(selected) - set(DASHBOARD_CHARTS))
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown charts: {', '.join(unknown)}. Allowed: {', '.join(DASHBOARD_CHARTS)}",
+        )
+
+    dims = set()
+    if "distribution" in selected:
+        dims.update([rollups.USER, rollups.TAG, rollups.MCP])
+    for chart, chart_dims in (("user-comparison", _USER_COMPARISON_DIMS), ("success-rate", _SUCCESS_RATE_DIMS),
+                              ("agent-efficiency", _AGENT_EFFICIENCY_DIMS)):
+        if chart in selected:
+            dims.update(chart_dims)
+    totals = analytics.dimension_totals(sorted(dims)) if dims else None
+    index = analytics.tag_index()
+
+    questions: List[Dict[str, Any]] = []
+    if (totals is None and {"user-comparison", "success-rate", "agent-efficiency"} & set(selected)) or (
+        index is None and {"tag-correlation", "scatter-tags-volume"} & set(selected)
+    ):
+        for chunk in analytics.stream_questions(fields=_DASHBOARD_FIELDS):
+            questions.extend(chunk)
+
+    out: Dict[str, Any] = {}
+    for chart in dict.fromkeys(selected):
+        if chart == "questions-timeseries":
+            out[chart] = get_questions_timeseries(bucket=bucket, days_back=days_back, admin_user=admin_user)
+        elif chart == "tags-timeseries":
+            out[chart] = get_tags_timeseries(bucket=bucket, days_back=days_back, top_n=top_n, admin_user=admin_user)
+        elif chart == "heatmap-hours":
+            out[chart] = get_heatmap_hours(days_back=days_back, admin_user=admin_user)
+        elif chart == "distribution":
+            stats = ({"by_user": totals[rollups.USER], "by_tag": totals[rollups.TAG], "mcp_usage": totals[rollups.MCP]}
+                     if totals is not None else analytics.stats_summary())
+            out[chart] = _distribution_from_stats(stats)
+        elif chart == "user-comparison":
+            out[chart] = _user_comparison_from_totals(totals) if totals is not None else _user_comparison_from_questions(questions)
+        elif chart == "success-rate":
+            out[chart] = _success_rate_from_totals(totals) if totals is not None else _success_rate_from_questions(questions)
+        elif chart == "agent-efficiency":
+            out[chart] = _agent_efficiency_from_totals(totals) if totals is not None else _agent_efficiency_from_questions(questions)
+        elif chart == "tag-correlation":
+            out[chart] = _tag_correlation_from_index(index, correlation_top_n) if index is not None else _tag_correlation_from_questions(questions, correlation_top_n)
+        elif chart == "scatter-tags-volume":
+            out[chart] = _scatter_from_index(index) if index is not None else _scatter_from_questions(questions)
+
+    return {"charts": out, "generated_at": datetime.now(timezone.utc).isoformat()}
+
+
+# Fields returned in history pages unless the caller picks others
+HISTORY_FIELDS = ["id", "question", "timestamp", "tags", "final_answer", "used_mcp", "mcp_results", "agent_steps"]
+
+
+def _history(username: str, limit: int, cursor: Optional[str], fields: Optional[str]) -> Dict[str, Any]:
+    try:
+        page = analytics.page_questions(
+            username=username, limit=limit, cursor=cursor, fields=analytics.parse_fields(fields) or HISTORY_FIELDS,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "user": username,
-        "stats": user_stats,
-        "recent": recent,
-        "total_returned": len(recent),
+        "stats": analytics.user_question_stats(username),
+        "recent": page["items"],
+        "total_returned": len(page["items"]),
+        "next_cursor": page["next_cursor"],
     }
 
 
+@router.get("/analytics/history/user")
+def get_user_history(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """Return question history for the current user (extracted from JWT).
+    
+    - limit: max number of records to return
+    - cursor: `next_cursor` from the previous page
+    - fields: comma-separated question fields to return (default: all but username)
+    - Returns: { user, stats, recent: [{ id, question, timestamp, tags, final_answer, used_mcp, mcp_results }], next_cursor }
+    """
+    return _history(current_user.get("username"), limit, cursor, fields)
+
+
 @router.get("/analytics/history/admin/user/{username}")
-def get_user_history_admin(username: str, limit: int = 50, admin_user: dict = Depends(require_admin)) -> Dict[str, Any]:
+def get_user_history_admin(
+    username: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    admin_user: dict = Depends(require_admin),
+) -> Dict[str, Any]:
     """Admin-only endpoint to view any user's question history (by username in path).
     
     - username: username to fetch history for
-    - limit: max number of records to return
-    - Returns: { user, total_questions, recent: [...] }
+    - limit, cursor, fields: as for /analytics/history/user
+    - Returns: { user, stats, recent: [...], next_cursor }
     """
-    all_questions = analytics.list_questions(username=username)
-    # sort by timestamp descending (newest first)
-    sorted_questions = sorted(all_questions, key=lambda q: q.get("timestamp", ""), reverse=True)[:limit]
-    
-    # format for frontend
-    recent = []
-    for q in sorted_questions:
-        recent.append({
-            "id": q.get("id"),
-            "question": q.get("question"),
-            "timestamp": q.get("timestamp"),
-            "tags": q.get("tags", []),
-            "final_answer": q.get("final_answer"),
-            "used_mcp": q.get("used_mcp"),
-            "mcp_results": q.get("mcp_results", []),
-            "agent_steps": q.get("agent_steps", []),
-        })
-    
-    # compute stats for this user
-    user_stats = {
-        "total_questions": len(all_questions),
-        "answered": len([q for q in all_questions if q.get("final_answer")]),
-        "with_mcp": len([q for q in all_questions if q.get("used_mcp")]),
-        "avg_answer_length": sum(len(q.get("final_answer", "")) for q in all_questions) / len(all_questions) if all_questions else 0,
-    }
-    
-    return {
-        "user": username,
-        "stats": user_stats,
-        "recent": recent,
-        "total_returned": len(recent),
-    }
-
+    return _history(username, limit, cursor, fields)
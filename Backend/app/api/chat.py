@@ -1,6 +1,6 @@
 """WebSocket chat endpoint orchestrating agentic flow with streaming agent events."""
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import uuid
 
 from app.core.logging import get_logger
@@ -13,6 +13,7 @@ from app.agents.synthesizer import synthesize_answer
 from app.agents.retriever import retrieve_docs
 from app.mcp import mcp_registry
 from app.core import analytics as analytics_core
+from app.core import instrumentation
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -48,12 +49,21 @@ def _agent_description(agent_name: str) -> str:
 
 
 @router.websocket("/chat")
-async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
+async def websocket_chat(
+    websocket: WebSocket,
+    token: str = Query(...),
+    team: Optional[str] = Query(None),
+    environment: Optional[str] = Query(None),
+    doc_type: Optional[str] = Query(None),
+):
     """
     WebSocket endpoint for chat with agentic flow.
 
     Token must be provided as URL query parameter:
     ws://localhost:8000/chat?token=<jwt_token>
+
+    Optional `team`, `environment` and `doc_type` query parameters restrict
+    document retrieval for the whole session to that namespace.
     """
     try:
         # Validate token
@@ -85,10 +95,12 @@ async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
 
         session_id = str(uuid.uuid4())
         chat_history = []  # Track conversation history for context
+        doc_filters = {k: v for k, v in {"team": team, "environment": environment, "doc_type": doc_type}.items() if v}
 
         while True:
             # Receive user message
             text = await websocket.receive_text()
+            instrumentation.start_trace()
             logger.info("[chat] user=%s session=%s query=%s", user.get("username"), session_id, text)
 
             # Create initial state with chat history for context awareness
@@ -98,6 +110,7 @@ async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
                 user=user,
                 chat_history=chat_history.copy(),  # Pass previous messages as context
                 agent_steps=[],
+                doc_filters=doc_filters,
             )
 
             try:
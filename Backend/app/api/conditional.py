@@ -0,0 +1,56 @@
+"""Conditional GET (ETag / If-None-Match) for analytics endpoints.
+
+Chart data only changes when a question is recorded or tagged, so the ETag
+hashes `analytics.data_marker()` with the request path, query string and
+current hour. The hour matters because windowed charts ("last 30 days")
+move with time. `check_etag` runs as a dependency before the endpoint. When
+the client's `If-None-Match` matches, it raises `NotModified`, which becomes
+an empty 304 response, so the endpoint's database work and serialization
+are skipped. Otherwise the ETag is set on the response.
+
+FastAPI resolves a route's `dependencies=[...]` before the endpoint's own
+parameters, so `check_etag` requires an admin itself: non-admins get 403,
+never a 304. FastAPI caches dependencies per request, so the endpoint's
+`admin_user = Depends(require_admin)` reuses that result.
+"""
+from datetime import datetime, timezone
+import hashlib
+
+from fastapi import Depends, Request, Response
+from starlette.responses import Response as StarletteResponse
+
+from app.api.docs import require_admin
+from app.core import analytics
+
+
+class NotModified(Exception):
+    """The client's cached copy (`etag`) is still current."""
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+def etag_for(request: Request) -> str:
+    hour = datetime.now(timezone.utc).strftime("%Y%m%d%H")
+    key = "|".join([request.url.path, str(request.url.query), analytics.data_marker(), hour])
+    return 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def _matches(header: str, etag: str) -> bool:
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in [t.removeprefix("W/") for t in tags]
+
+
+def check_etag(request: Request, response: Response, admin_user: dict = Depends(require_admin)) -> None:
+    """Dependency for admin endpoints: answer 304 if the client already has the current data, else set the ETag."""
+    etag = etag_for(request)
+    header = request.headers.get("if-none-match")
+    if header and _matches(header, etag):
+        raise NotModified(etag)
+    response.headers["ETag"] = etag
+    # cacheable by the browser, but revalidated on every use
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+async def not_modified_handler(request: Request, exc: NotModified) -> StarletteResponse:
+    return StarletteResponse(status_code=304, headers={"ETag": exc.etag, "Cache-Control": "private, no-cache"})
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Request, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, UploadFile, File, Form
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 from app.core import auth
+from app.core import namespaces
+from app.core import dedup
+from app.core import reindex
 from app.core.logging import get_logger
 
 router = APIRouter()
@@ -32,15 +35,56 @@ class DocIn(BaseModel):
 
 class DocOut(DocIn):
     id: int
+    team: Optional[str] = None
+    environment: Optional[str] = None
+    doc_type: Optional[str] = None
 
 
-@router.post("/documents/upload", response_model=DocOut)
-async def upload_doc(file: UploadFile = File(...), admin_user: dict = Depends(require_admin)):
+class DocUpdate(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+    # "" clears a tag
+    team: Optional[str] = None
+    environment: Optional[str] = None
+    doc_type: Optional[str] = None
+
+
+class DocUpdated(DocOut):
+    reindexed: bool
+
+
+class DuplicateOut(BaseModel):
+    id: int
+    title: Optional[str] = None
+    similarity: float
+
+
+class DocUploaded(DocOut):
+    action: str  # created | skipped | replaced
+    duplicates: List[DuplicateOut] = []
+
+
+@router.post("/documents/upload", response_model=DocUploaded)
+async def upload_doc(
+    file: UploadFile = File(...),
+    team: Optional[str] = Form(None),
+    environment: Optional[str] = Form(None),
+    doc_type: Optional[str] = Form(None),
+    on_duplicate: str = Form("report"),
+    admin_user: dict = Depends(require_admin),
+):
     """Upload a PDF or TXT document for embedding (admin only).
     
     Supported formats:
     - .txt (plain text)
     - .pdf (PDF documents)
+
+    Optional `team`, `environment` and `doc_type` form fields tag the document's
+    namespace so searches and chat can be restricted to it.
+
+    Near-duplicates of existing documents are listed in `duplicates`;
+    `on_duplicate` is "report" (store anyway), "skip" (keep the existing
+    document) or "replace" (overwrite the most similar one).
     """
     # Validate file type
     allowed_extensions = {".txt", ".pdf"}
@@ -48,6 +92,8 @@ async def upload_doc(file: UploadFile = File(...), admin_user: dict = Depends(re
     
     if file_ext not in allowed_extensions:
         raise HTTPException(status_code=400, detail=f"File type not supported. Allowed: {', '.join(allowed_extensions)}")
+    if on_duplicate not in ("report", "skip", "replace"):
+        raise HTTPException(status_code=400, detail="on_duplicate must be one of: report, skip, replace")
     
     try:
         # Read file content
@@ -66,7 +112,11 @@ async def upload_doc(file: UploadFile = File(...), admin_user: dict = Depends(re
                    admin_user.get("username"), file.filename, file_ext, len(content))
         
         # Add document to database and vector store
-        doc = auth.add_doc(title, text_content)
+        doc = auth.ingest_doc(
+            title, text_content,
+            tags={"team": team, "environment": environment, "doc_type": doc_type},
+            on_duplicate=on_duplicate,
+        )
         
         return doc
     
@@ -90,12 +140,115 @@ def get_docs(user: dict = Depends(get_current_user)):
 
 
 @router.get("/documents/search", response_model=List[DocOut])
-def search(q: str = Query(..., min_length=1), user: dict = Depends(get_current_user)):
-    """Search documents (authenticated users only)."""
+def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(3, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    team: Optional[str] = Query(None),
+    environment: Optional[str] = Query(None),
+    doc_type: Optional[str] = Query(None),
+    user: dict = Depends(get_current_user),
+):
+    """Search documents (authenticated users only). Results are paginated with limit/offset.
+
+    `team`, `environment` and `doc_type` restrict the search to that namespace.
+    """
     logger.info("User %s searching documents: %s", user.get("username"), q)
-    results = auth.search_docs(q)
+    filters = {"team": team, "environment": environment, "doc_type": doc_type}
+    results = auth.search_docs(q, top_k=limit, offset=offset, filters=filters)
     # Convert TinyDB's doc_id to id for response model
     for doc in results:
         if "doc_id" in doc and "id" not in doc:
             doc["id"] = doc["doc_id"]
     return results
+
+
+@router.put("/documents/{doc_id}", response_model=DocUpdated)
+def update_doc(doc_id: int, payload: DocUpdate, admin_user: dict = Depends(require_admin)):
+    """Replace a document's title and/or content (admin only). Only changed text is re-embedded."""
+    tags = {f: getattr(payload, f) for f in namespaces.FIELDS if getattr(payload, f) is not None}
+    if payload.title is None and payload.content is None and not tags:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    logger.info("Admin %s updating document %s", admin_user.get("username"), doc_id)
+    doc = auth.update_doc(doc_id, title=payload.title, content=payload.content, tags=tags)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return doc
+
+
+@router.delete("/documents/{doc_id}", status_code=204)
+def delete_doc(doc_id: int, admin_user: dict = Depends(require_admin)):
+    """Delete a document from the database and the search indexes (admin only)."""
+    logger.info("Admin %s deleting document %s", admin_user.get("username"), doc_id)
+    if not auth.delete_doc(doc_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+
+
+@router.get("/documents/namespaces")
+def namespace_stats(user: dict = Depends(get_current_user)):
+    """Document count, content size and search latency per team/environment/doc_type (authenticated users only)."""
+    return namespaces.stats()
+
+
+@router.post("/documents/duplicates/scan")
+def scan_duplicates(threshold: Optional[float] = Query(None, ge=0.0, le=1.0), admin_user: dict = Depends(require_admin)):
+    """Group near-duplicate documents already in the corpus (admin only).
+
+    Documents stored before duplicate detection existed are signed first.
+    """
+    logger.info("Admin %s scanning for duplicate documents", admin_user.get("username"))
+    return dedup.scan(threshold)
+
+
+@router.get("/documents/index/diff")
+def index_diff(admin_user: dict = Depends(require_admin)):
+    """List doc ids missing from (or stale in) the vector index and orphaned index entries (admin only)."""
+    try:
+        return reindex.diff()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/documents/index/repair")
+def index_repair(admin_user: dict = Depends(require_admin)):
+    """Index missing and stale docs and drop orphaned vector entries (admin only)."""
+    logger.info("Admin %s repairing vector index", admin_user.get("username"))
+    try:
+        return reindex.repair()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/documents/index/rebuild", status_code=202)
+def index_rebuild(
+    batch_size: int = Query(256, ge=1, le=5000),
+    workers: int = Query(2, ge=1, le=16),
+    admin_user: dict = Depends(require_admin),
+):
+    """Start a background rebuild into a shadow collection, swapped in on completion (admin only).
+
+    Poll `/documents/index/status` for progress and throughput.
+    """
+    if reindex.get_status().get("state") == "running":
+        raise HTTPException(status_code=409, detail="A rebuild is already running")
+    logger.info("Admin %s starting vector index rebuild", admin_user.get("username"))
+    try:
+        return reindex.start_rebuild(batch_size, workers)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/documents/index/gc")
+def index_gc(admin_user: dict = Depends(require_admin)):
+    """Drop vector collections replaced by a rebuild once the grace period has passed (admin only)."""
+    logger.info("Admin %s dropping replaced vector collections", admin_user.get("username"))
+    try:
+        return reindex.gc()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/documents/index/status")
+def index_status(admin_user: dict = Depends(require_admin)):
+    """Return the state of the current or last rebuild, including docs/sec (admin only)."""
+    return reindex.get_status()
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 
+from app.core import vector_store
+
 router = APIRouter()
 
 
@@ -9,6 +11,17 @@ def health_check():
     return {"status": "ok"}
 
 
+@router.get("/health/ready", tags=["health"])
+def readiness():
+    """Report whether RAG is available: embedding model/index state and load timings.
+
+    The app serves non-RAG traffic while the vector store is still warming up,
+    so this always returns 200; `rag` is "ready", "loading", "failed" or "idle".
+    """
+    vs = vector_store.status()
+    return {"status": "ok", "rag": vs.get("state"), "vector_store": vs}
+
+
 class EchoIn(BaseModel):
     text: str
 
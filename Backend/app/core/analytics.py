@@ -1,11 +1,14 @@
 """Analytics helpers: record questions, categorize via LLM, and produce simple stats."""
-from datetime import datetime
-from typing import Any, Dict, List, Optional
-from sqlalchemy import func
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import base64
+from sqlalchemy import and_, case, func, or_
 
+from app.core import analytics_queries, columnar, question_tags, rollups, tagging
+from app.core.config import settings
 from app.core.logging import get_logger
 from app.llm.llm import get_llm
-from app.core.database import SessionLocal
+from app.core.database import Base, SessionLocal, engine, ensure_columns, ensure_indexes
 from app.core.models import Question
 
 logger = get_logger(__name__)
@@ -35,11 +38,26 @@ def _categorize_with_llm(text: str) -> List[str]:
         return []
 
 
+def init_schema() -> None:
+    """Create and upgrade the analytics tables; run by the app lifespan and each analytics CLI.
+
+    Adds `questions` columns and indexes introduced after the first deploy,
+    and marks the rollups and `question_tags` complete on an empty database.
+    """
+    Base.metadata.create_all(bind=engine)
+    ensure_columns(Question.__table__)
+    # create_all skips tables that already exist, so later indexes are added here
+    ensure_indexes(Question.__table__)
+    rollups.init()
+    question_tags.init()
+
+
 def record_question(username: str, question: str, agent_steps: List[Dict[str, Any]], final_answer: str, used_mcp: Optional[str], mcp_results: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
     """Record a question and its metadata into the DB and return the saved record."""
     db = SessionLocal()
     try:
-        tags = _categorize_with_llm(question)
+        # batch mode leaves tagging to the background worker (app.core.tagging)
+        tags = _categorize_with_llm(question) if settings.TAGGING_MODE == "inline" else []
         
         new_q = Question(
             username=username,
@@ -50,12 +68,24 @@ def record_question(username: str, question: str, agent_steps: List[Dict[str, An
             agent_steps=agent_steps or [],
             final_answer=final_answer,
             used_mcp=used_mcp,
-            mcp_results=mcp_results or []
+            mcp_results=mcp_results or [],
+            tagged_at=datetime.now(timezone.utc) if tags else None,
         )
         
         db.add(new_q)
+        db.flush()
+        question_tags.index_question(db, new_q.id, tags)
+        try:
+            with db.begin_nested():
+                rollups.record(db, new_q)
+        except Exception as e:
+            # Keep the question; rollups stop being served until they are rebuilt
+            logger.error("Analytics: rollup update failed, invalidating rollups: %s", e)
+            rollups.invalidate(db)
         db.commit()
         db.refresh(new_q)
+        if not tags:
+            tagging.notify()
         
         logger.info("Analytics: recorded question id=%s user=%s tags=%s", new_q.id, username, tags)
         
@@ -104,31 +134,286 @@ def list_questions(username: Optional[str] = None) -> List[Dict[str, Any]]:
         db.close()
 
 
+QUESTION_FIELDS = (
+    "id", "username", "question", "timestamp", "tags", "agent_steps", "final_answer", "used_mcp", "mcp_results",
+)
+
+
+def _question_dict(row, fields: Sequence[str]) -> Dict[str, Any]:
+    out = {f: getattr(row, f) for f in fields}
+    if "timestamp" in out:
+        out["timestamp"] = out["timestamp"].isoformat() if out["timestamp"] else None
+    return out
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated field list (None keeps every field); raises ValueError on unknown names."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(names) - set(QUESTION_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(QUESTION_FIELDS)}")
+    return names
+
+
+def encode_cursor(timestamp: datetime, question_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{question_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return (timestamp, id) from a cursor made by `encode_cursor`; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, question_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(question_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def page_questions(
+    username: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """Return one page of questions, newest first, as `{"items": [...], "next_cursor": ...}`.
+
+    Keyset pagination on (timestamp, id): `cursor` is the `next_cursor` of the
+    previous page, so every page is one indexed range scan no matter how deep.
+    `fields` limits the selected columns (default: all of `QUESTION_FIELDS`).
+    """
+    fields = list(fields or QUESTION_FIELDS)
+    # the cursor needs the sort key even when the caller did not ask for it
+    columns = list(dict.fromkeys(fields + ["id", "timestamp"]))
+    db = SessionLocal()
+    try:
+        query = db.query(*[getattr(Question, c) for c in columns])
+        if username:
+            query = query.filter(Question.username == username)
+        if cursor:
+            ts, last_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                Question.timestamp < ts,
+                and_(Question.timestamp == ts, Question.id < last_id),
+            ))
+        rows = query.order_by(Question.timestamp.desc(), Question.id.desc()).limit(limit + 1).all()
+    finally:
+        db.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if last.timestamp is not None:
+            next_cursor = encode_cursor(last.timestamp, last.id)
+    return {"items": [_question_dict(r, fields) for r in rows], "next_cursor": next_cursor}
+
+
+def stream_questions(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    username: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    chunk_size: int = 1000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield questions with `since <= timestamp < until` in id order, `chunk_size` dicts at a time.
+
+    Rows come from a server-side cursor, so memory stays bounded by one chunk
+    however many rows match. The session stays open until the generator is exhausted or closed.
+    """
+    fields = list(fields or QUESTION_FIELDS)
+    db = SessionLocal()
+    try:
+        query = db.query(*[getattr(Question, c) for c in fields])
+        if since is not None:
+            query = query.filter(Question.timestamp >= since)
+        if until is not None:
+            query = query.filter(Question.timestamp < until)
+        if username:
+            query = query.filter(Question.username == username)
+        chunk = []
+        for row in query.order_by(Question.id).execution_options(stream_results=True, yield_per=chunk_size):
+            chunk.append(_question_dict(row, fields))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
+
+
+def data_version() -> int:
+    """Highest question id: grows with every recorded question (an indexed lookup)."""
+    db = SessionLocal()
+    try:
+        return db.query(func.max(Question.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+def data_marker() -> str:
+    """Changes whenever chart data can change: a question recorded or tagged, or the analytics source switched.
+
+    With the DuckDB mirror in use, the maxima are the ones the mirror has
+    synced, since that is the data the charts are computed from; otherwise
+    they come from the main database (indexed lookups). Whether this worker
+    holds the mirror is left out, so every worker gives the same marker for
+    the same data.
+    """
+    if columnar.enabled():
+        max_id, tagged = columnar.synced_marker()
+    else:
+        db = SessionLocal()
+        try:
+            max_id, max_tagged = db.query(func.max(Question.id), func.max(Question.tagged_at)).one()
+        finally:
+            db.close()
+        if max_tagged is not None and max_tagged.tzinfo is not None:
+            max_tagged = max_tagged.astimezone(timezone.utc).replace(tzinfo=None)  # as the mirror stores it
+        tagged = max_tagged.isoformat() if max_tagged else None
+    source = f"rollup{rollups.ROLLUP_VERSION}" if rollups.enabled() else "sql"
+    tags = "tagtable" if question_tags.is_ready() else "tagjson"
+    return f"{max_id or 0}:{tagged or ''}:{source}:{tags}"
+
+
+def question_count(since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+    """Questions with `since <= timestamp < until` (either bound optional)."""
+    db = SessionLocal()
+    try:
+        query = db.query(func.count(Question.id))
+        if since is not None:
+            query = query.filter(Question.timestamp >= since)
+        if until is not None:
+            query = query.filter(Question.timestamp < until)
+        return query.scalar() or 0
+    finally:
+        db.close()
+
+
+def user_question_stats(username: str) -> Dict[str, Any]:
+    """Totals for one user's history from a single aggregate query."""
+    db = SessionLocal()
+    try:
+        answered = func.coalesce(func.length(Question.final_answer), 0)
+        row = db.query(
+            func.count(Question.id).label("total"),
+            func.sum(case((answered > 0, 1), else_=0)).label("answered"),
+            func.sum(case((func.coalesce(Question.used_mcp, "") != "", 1), else_=0)).label("with_mcp"),
+            func.avg(answered).label("avg_answer_length"),
+        ).filter(Question.username == username).one()
+    finally:
+        db.close()
+    return {
+        "total_questions": row.total or 0,
+        "answered": int(row.answered or 0),
+        "with_mcp": int(row.with_mcp or 0),
+        "avg_answer_length": float(row.avg_answer_length or 0),
+    }
+
+
+def time_buckets(kind: str, bucket: str = "day", since: Optional[datetime] = None) -> Any:
+    """Time-bucketed aggregate for charts.
+
+    `kind` is "questions" (count per bucket), "tags" (tag counts per bucket)
+    or "hour_of_week" ((weekday, hour, count) slots; `bucket` is ignored).
+    Read from the DuckDB mirror with `ANALYTICS_ENGINE=duckdb`, from the
+    hourly rollups when they are in use (the window then starts at the hour
+    containing `since`), otherwise computed from raw questions in the
+    database (see `app.core.analytics_queries`).
+    """
+    if kind not in ("questions", "tags", "hour_of_week"):
+        raise ValueError(f"Unknown aggregate: {kind}")
+    if columnar.enabled():
+        if kind == "questions":
+            return columnar.questions_per_bucket(bucket, since)
+        if kind == "tags":
+            return columnar.tags_per_bucket(bucket, since)
+        return columnar.hour_of_week(since)
+    if rollups.enabled():
+        return _rollup_buckets(kind, bucket, since)
+    db = SessionLocal()
+    try:
+        if kind == "questions":
+            return analytics_queries.questions_per_bucket(db, bucket, since)
+        if kind == "tags":
+            return analytics_queries.tags_per_bucket(db, bucket, since)
+        return analytics_queries.hour_of_week(db, since)
+    finally:
+        db.close()
+
+
+def _rollup_buckets(kind: str, bucket: str, since: Optional[datetime]) -> Any:
+    bucket = bucket if bucket in analytics_queries.BUCKETS else "day"
+    if kind == "hour_of_week":
+        slots: Dict[tuple, int] = {}
+        for hour, _, n in rollups.series(rollups.QUESTIONS, since):
+            slots[(hour.weekday(), hour.hour)] = slots.get((hour.weekday(), hour.hour), 0) + n
+        return [(dow, h, n) for (dow, h), n in slots.items()]
+    if kind == "questions":
+        counts: Dict[str, int] = {}
+        for hour, _, n in rollups.series(rollups.QUESTIONS, since):
+            key = analytics_queries.bucket_key(hour, bucket)
+            counts[key] = counts.get(key, 0) + n
+        return counts
+    out: Dict[str, Dict[str, int]] = {}
+    for hour, tag, n in rollups.series(rollups.TAG, since):
+        tags = out.setdefault(analytics_queries.bucket_key(hour, bucket), {})
+        tags[tag] = tags.get(tag, 0) + n
+    return out
+
+
+def dimension_totals(dimensions: Sequence[str]) -> Optional[Dict[str, Dict[str, int]]]:
+    """All-time counts per rollup dimension from the DuckDB mirror or the rollups; None when neither is in use."""
+    if columnar.enabled():
+        return columnar.totals(dimensions)
+    if not rollups.enabled():
+        return None
+    return rollups.totals(dimensions)
+
+
+def tag_index():
+    """Module answering `frequencies()` / `co_occurrence()` (DuckDB mirror or `question_tags`), or None."""
+    if columnar.enabled():
+        return columnar
+    if question_tags.is_ready():
+        return question_tags
+    return None
+
+
 def stats_summary() -> Dict[str, Any]:
-    """Return simple aggregated stats useful for visualizations."""
+    """Return simple aggregated stats useful for visualizations.
+
+    Read from the DuckDB mirror or the rollups when in use; otherwise counted with GROUP BY
+    in the database, so no question rows (or their answer/step JSON) are loaded.
+    """
+    totals = dimension_totals([rollups.QUESTIONS, rollups.USER, rollups.TAG, rollups.MCP])
+    if totals is not None:
+        return {
+            "total_questions": totals[rollups.QUESTIONS].get("", 0),
+            "by_user": totals[rollups.USER],
+            "by_tag": totals[rollups.TAG],
+            "mcp_usage": totals[rollups.MCP],
+        }
+
     db = SessionLocal()
     try:
-        questions = db.query(Question).all()
-        total = len(questions)
-        by_user: Dict[str, int] = {}
-        by_tag: Dict[str, int] = {}
-        mcp_usage: Dict[str, int] = {}
+        total = db.query(func.count(Question.id)).scalar() or 0
 
-        for q in questions:
-            user = q.username or "unknown"
-            by_user[user] = by_user.get(user, 0) + 1
-            
-            for tag in (q.tags or []):
-                by_tag[tag] = by_tag.get(tag, 0) + 1
-            
-            mcp = q.used_mcp
-            if mcp:
-                mcp_usage[mcp] = mcp_usage.get(mcp, 0) + 1
+        user = func.coalesce(Question.username, "unknown")
+        by_user = {u: n for u, n in db.query(user, func.count(Question.id)).group_by(user)}
+
+        mcp_usage = {
+            m: n for m, n in db.query(Question.used_mcp, func.count(Question.id))
+            .filter(Question.used_mcp.isnot(None), Question.used_mcp != "")
+            .group_by(Question.used_mcp)
+        }
 
         return {
             "total_questions": total,
             "by_user": by_user,
-            "by_tag": by_tag,
+            "by_tag": analytics_queries.tag_counts(db),
             "mcp_usage": mcp_usage,
         }
     finally:
@@ -0,0 +1,207 @@
+"""Database-side aggregation queries for the analytics charts.
+
+Time bucketing runs in SQL (`date_trunc` / `extract` on Postgres, `strftime`
+on SQLite), filtered on the indexed `questions.timestamp` column, so only
+rows inside the requested window are read and only one row per bucket comes
+back. Tag queries read the normalized `question_tags` table once it is
+backfilled, and otherwise expand the JSON `tags` array in the database
+(`json_array_elements_text` / `json_each`). Other dialects fall back to
+reading just the timestamp (and tags) of the rows in the window and bucketing
+in Python.
+
+Bucket keys match the chart API: "YYYY-MM-DD HH:00" (hour), "YYYY-MM-DD"
+(day), "YYYY-Www" ISO week, and "YYYY-MM" (month).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, text
+from sqlalchemy.orm import Session
+
+from app.core import question_tags
+from app.core.logging import get_logger
+from app.core.models import Question, QuestionTag
+
+logger = get_logger(__name__)
+
+BUCKETS = ("hour", "day", "week", "month")
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Start of the bucket containing `q.timestamp` (weeks start on Monday, as ISO weeks do)
+_TRUNCATE = {
+    "postgresql": {
+        "hour": "date_trunc('hour', q.timestamp)",
+        "day": "date_trunc('day', q.timestamp)",
+        "week": "date_trunc('week', q.timestamp)",
+        "month": "date_trunc('month', q.timestamp)",
+    },
+    "sqlite": {
+        "hour": "strftime('%Y-%m-%d %H:00:00', q.timestamp)",
+        "day": "strftime('%Y-%m-%d 00:00:00', q.timestamp)",
+        "week": "strftime('%Y-%m-%d 00:00:00', q.timestamp, 'weekday 0', '-6 days')",
+        "month": "strftime('%Y-%m-01 00:00:00', q.timestamp)",
+    },
+}
+
+# Day of week (0 = Monday) and hour of `q.timestamp`
+_DOW_HOUR = {
+    "postgresql": ("CAST(extract(isodow FROM q.timestamp) AS integer) - 1", "CAST(extract(hour FROM q.timestamp) AS integer)"),
+    "sqlite": ("(CAST(strftime('%w', q.timestamp) AS integer) + 6) % 7", "CAST(strftime('%H', q.timestamp) AS integer)"),
+}
+
+# One row per (question, tag) and the tag expression; non-array `tags` values count as no tags
+_TAGS_JOIN = {
+    "postgresql": (
+        "questions q CROSS JOIN json_array_elements_text("
+        "CASE WHEN json_typeof(q.tags) = 'array' THEN q.tags ELSE '[]'::json END) AS t(tag)",
+        "t.tag",
+    ),
+    "sqlite": (
+        "questions q, json_each("
+        "CASE WHEN json_valid(q.tags) AND json_type(q.tags) = 'array' THEN q.tags ELSE '[]' END) AS t",
+        "t.value",
+    ),
+}
+
+
+def bucket_key(dt: datetime, bucket: str = "day") -> str:
+    """Chart key for the bucket containing `dt`."""
+    if bucket == "hour":
+        return dt.strftime("%Y-%m-%d %H:00")
+    if bucket == "week":
+        year, week, _ = dt.isocalendar()
+        return f"{year}-W{week:02d}"
+    if bucket == "month":
+        return dt.strftime("%Y-%m")
+    return dt.strftime("%Y-%m-%d")
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _window(since: Optional[datetime], username: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    clauses, params = [], {}
+    if since is not None:
+        clauses.append("q.timestamp >= :since")
+        params["since"] = since
+    if username:
+        clauses.append("q.username = :username")
+        params["username"] = username
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _window_rows(db: Session, since: Optional[datetime], username: Optional[str], *columns):
+    query = db.query(*columns).filter(Question.timestamp.isnot(None))
+    if since is not None:
+        query = query.filter(Question.timestamp >= since)
+    if username:
+        query = query.filter(Question.username == username)
+    return query.yield_per(1000)
+
+
+def _try_sql(db: Session, sql: str, params: Dict[str, Any]):
+    stmt = text(sql)
+    if "since" in params:
+        # bind through the column type so SQLite compares in its stored text format
+        stmt = stmt.bindparams(bindparam("since", type_=Question.__table__.c.timestamp.type))
+    try:
+        return db.execute(stmt, params).all()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Analytics: SQL aggregation failed, aggregating in Python: %s", e)
+        return None
+
+
+def questions_per_bucket(db: Session, bucket: str = "day", since: Optional[datetime] = None,
+                         username: Optional[str] = None) -> Dict[str, int]:
+    """Question count per time bucket since `since`, keyed like `bucket_key`."""
+    bucket = bucket if bucket in BUCKETS else "day"
+    counts: Dict[str, int] = {}
+    truncate = _TRUNCATE.get(_dialect(db), {}).get(bucket)
+    if truncate is not None:
+        where, params = _window(since, username)
+        rows = _try_sql(db, f"SELECT {truncate} AS b, count(*) AS n FROM questions q{where} GROUP BY b", params)
+        if rows is not None:
+            for b, n in rows:
+                if b is not None:
+                    key = bucket_key(_as_datetime(b), bucket)
+                    counts[key] = counts.get(key, 0) + n
+            return counts
+
+    for (ts,) in _window_rows(db, since, username, Question.timestamp):
+        key = bucket_key(ts, bucket)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def tags_per_bucket(db: Session, bucket: str = "day", since: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+    """Tag counts per time bucket since `since`: `{bucket_key: {tag: count}}`."""
+    bucket = bucket if bucket in BUCKETS else "day"
+    out: Dict[str, Dict[str, int]] = {}
+    dialect = _dialect(db)
+    truncate = _TRUNCATE.get(dialect, {}).get(bucket)
+    if truncate is not None and dialect in _TAGS_JOIN:
+        join, tag = _TAGS_JOIN[dialect]
+        where, params = _window(since, None)
+        rows = _try_sql(db, f"SELECT {truncate} AS b, {tag} AS tag, count(*) AS n FROM {join}{where} GROUP BY b, {tag}", params)
+        if rows is not None:
+            for b, tag, n in rows:
+                if b is not None and tag is not None:
+                    tags = out.setdefault(bucket_key(_as_datetime(b), bucket), {})
+                    tags[tag] = tags.get(tag, 0) + n
+            return out
+
+    for ts, tags in _window_rows(db, since, None, Question.timestamp, Question.tags):
+        for tag in (tags if isinstance(tags, list) else []):
+            counts = out.setdefault(bucket_key(ts, bucket), {})
+            counts[tag] = counts.get(tag, 0) + 1
+    return out
+
+
+def tag_counts(db: Session, since: Optional[datetime] = None) -> Dict[str, int]:
+    """Tag occurrences (since `since`, if given), from `question_tags` once it is backfilled."""
+    if question_tags.is_ready():
+        query = db.query(QuestionTag.tag, func.sum(QuestionTag.count))
+        if since is not None:
+            query = query.join(Question, Question.id == QuestionTag.question_id).filter(Question.timestamp >= since)
+        return {tag: int(n) for tag, n in query.group_by(QuestionTag.tag)}
+
+    dialect = _dialect(db)
+    if dialect in _TAGS_JOIN:
+        join, tag = _TAGS_JOIN[dialect]
+        where, params = _window(since, None)
+        rows = _try_sql(db, f"SELECT {tag} AS tag, count(*) AS n FROM {join}{where} GROUP BY {tag}", params)
+        if rows is not None:
+            return {tag: n for tag, n in rows if tag is not None}
+
+    counts: Dict[str, int] = {}
+    query = db.query(Question.tags)
+    if since is not None:
+        query = query.filter(Question.timestamp >= since)
+    for (tags,) in query.yield_per(1000):
+        for tag in (tags if isinstance(tags, list) else []):
+            counts[tag] = counts.get(tag, 0) + 1
+    return counts
+
+
+def hour_of_week(db: Session, since: Optional[datetime] = None) -> List[Tuple[int, int, int]]:
+    """(day of week with 0 = Monday, hour, count) for every non-empty slot since `since`."""
+    exprs = _DOW_HOUR.get(_dialect(db))
+    if exprs is not None:
+        where, params = _window(since, None)
+        rows = _try_sql(
+            db, f"SELECT {exprs[0]} AS dow, {exprs[1]} AS hour, count(*) AS n FROM questions q{where} GROUP BY dow, hour",
+            params,
+        )
+        if rows is not None:
+            return [(int(dow), int(hour), n) for dow, hour, n in rows if dow is not None]
+
+    slots: Dict[Tuple[int, int], int] = {}
+    for (ts,) in _window_rows(db, since, None, Question.timestamp):
+        slots[(ts.weekday(), ts.hour)] = slots.get((ts.weekday(), ts.hour), 0) + 1
+    return [(dow, hour, n) for (dow, hour), n in slots.items()]
@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from io import BytesIO
@@ -6,18 +7,25 @@ import jwt
 
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, func
 
 from app.core import vector_store
+from app.core import dedup
+from app.core import fulltext
+from app.core import namespaces
 from app.core.logging import get_logger
 from app.core.config import settings
-from app.core.database import SessionLocal, engine, Base
+from app.core.database import SessionLocal, engine, Base, ensure_columns
 from app.core.models import User, Doc
 
 logger = get_logger(__name__)
 
 # Verify tables exist on startup
 Base.metadata.create_all(bind=engine)
+# Columns added to existing tables after their first deploy (analytics tables: analytics.init_schema)
+ensure_columns(Doc.__table__)
+# Full-text index on docs (tsvector on Postgres, FTS5 on SQLite)
+fulltext.init(engine)
 
 def init_db():
     db = SessionLocal()
@@ -137,28 +145,183 @@ def verify_user_credentials(username: str, password: str) -> bool:
 
 
 # Document storage and search (Postgres + Vector Store)
-def add_doc(title: str, content: str) -> Dict[str, Any]:
+def _mark_indexed(db: Session, doc_id: int, content_hash: str, indexed_hash: str) -> None:
+    """Record the vector entry just written for a doc, unless the doc changed meanwhile."""
+    db.query(Doc).filter(Doc.id == doc_id, Doc.content_hash == content_hash).update(
+        {Doc.indexed_hash: indexed_hash}, synchronize_session=False,
+    )
+    db.commit()
+
+
+def _sign_doc(db: Session, doc: Doc) -> None:
+    """Store the doc's MinHash signature for near-duplicate lookups (best effort)."""
+    if not settings.DEDUP_ENABLED:
+        return
+    try:
+        dedup.index_doc(db, doc.id, doc.content, doc.content_hash)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Failed to sign doc %s for dedup: %s", doc.id, e)
+
+
+def find_duplicate_docs(content: str, exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Stored docs that are near-duplicates of `content` (id, title, similarity)."""
+    if not settings.DEDUP_ENABLED:
+        return []
+    db = SessionLocal()
+    try:
+        return dedup.find_duplicates(db, content, exclude_id=exclude_id)
+    finally:
+        db.close()
+
+
+def ingest_doc(title: str, content: str, tags: Optional[Dict[str, str]] = None, on_duplicate: str = "report") -> Dict[str, Any]:
+    """Add a doc, checking for near-duplicates first.
+
+    `on_duplicate` decides what happens when one is found:
+    - "report": store the new doc anyway and list the duplicates
+    - "skip": keep the existing doc and store nothing
+    - "replace": overwrite the most similar existing doc with the new title, content and tags
+    The result is the stored (or kept) doc plus `action` and `duplicates`.
+    """
+    if on_duplicate not in ("report", "skip", "replace"):
+        raise ValueError(f"Unknown on_duplicate mode: {on_duplicate}")
+    try:
+        duplicates = find_duplicate_docs(content)
+    except Exception as e:
+        logger.warning("Duplicate check failed, storing doc: %s", e)
+        duplicates = []
+
+    if duplicates and on_duplicate == "skip":
+        db = SessionLocal()
+        try:
+            existing = db.query(Doc).filter(Doc.id == duplicates[0]["id"]).first()
+            doc = None
+            if existing is not None:
+                doc = {"id": existing.id, "title": existing.title, "content": existing.content, **namespaces.doc_tags(existing)}
+        finally:
+            db.close()
+        # The duplicate may have been deleted since the check; then store the upload
+        if doc is not None:
+            logger.info("Skipped upload of %s: near-duplicate of doc id=%s", title, doc["id"])
+            return {**doc, "action": "skipped", "duplicates": duplicates}
+    if duplicates and on_duplicate == "replace":
+        doc = update_doc(duplicates[0]["id"], title=title, content=content, tags=tags)
+        if doc is not None:
+            doc.pop("reindexed", None)
+            logger.info("Replaced doc id=%s with upload %s", doc["id"], title)
+            return {**doc, "action": "replaced", "duplicates": duplicates}
+
+    doc = add_doc(title, content, tags=tags)
+    return {**doc, "action": "created", "duplicates": duplicates}
+
+
+def add_doc(title: str, content: str, tags: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Store a doc and index it; `tags` sets its namespace (team, environment, doc_type)."""
+    tags = namespaces.normalize(tags)
     db = SessionLocal()
     try:
-        new_doc = Doc(title=title, content=content)
+        new_doc = Doc(title=title, content=content, content_hash=vector_store.content_hash(title, content), **tags)
         db.add(new_doc)
         db.commit()
         db.refresh(new_doc)
         logger.info("Added doc %s id=%s", title, new_doc.id)
+        _sign_doc(db, new_doc)
         
         # Add to vector store if available
         try:
-            if vector_store.is_ready():
-                vector_store.add_document(
-                    str(new_doc.id), 
-                    title, 
-                    content, 
-                    metadata={"id": new_doc.id, "title": title}
-                )
+            metadata = namespaces.vector_metadata(new_doc.id, title, tags)
+            if vector_store.is_ready() and vector_store.add_document(str(new_doc.id), title, content, metadata=metadata):
+                _mark_indexed(db, new_doc.id, new_doc.content_hash, vector_store.entry_hash(new_doc.content_hash, tags))
         except Exception as e:
             logger.warning("Failed to add doc to vector store: %s", e)
             
-        return {"id": new_doc.id, "title": new_doc.title, "content": new_doc.content}
+        return {"id": new_doc.id, "title": new_doc.title, "content": new_doc.content, **tags}
+    finally:
+        db.close()
+
+
+def update_doc(
+    doc_id: int,
+    title: Optional[str] = None,
+    content: Optional[str] = None,
+    tags: Optional[Dict[str, Optional[str]]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Update a doc's title, content and/or namespace tags and re-index it if needed.
+
+    The keyword index follows the row (FTS5 triggers / generated tsvector); the
+    vector entry is re-written only when it differs from the one last indexed
+    (`indexed_hash`), which also retries an earlier failed re-index.
+    A tag set to "" is cleared. Returns None if the doc does not exist.
+    `reindexed` is True when the vector entry was re-written.
+    """
+    db = SessionLocal()
+    try:
+        doc = db.query(Doc).filter(Doc.id == doc_id).first()
+        if doc is None:
+            return None
+        new_title = doc.title if title is None else title
+        new_content = doc.content if content is None else content
+        new_hash = vector_store.content_hash(new_title, new_content)
+        old_tags = namespaces.doc_tags(doc)
+        new_tags = dict(old_tags)
+        for field, value in (tags or {}).items():
+            if value is not None:
+                new_tags[field] = value
+        new_tags = namespaces.normalize(new_tags)
+        metadata = namespaces.vector_metadata(doc.id, new_title, new_tags)
+        new_entry = vector_store.entry_hash(new_hash, new_tags)
+        changed = new_hash != doc.content_hash or new_tags != old_tags
+
+        if changed or new_title != doc.title or new_content != doc.content:
+            doc.title, doc.content, doc.content_hash = new_title, new_content, new_hash
+            for field in namespaces.FIELDS:
+                setattr(doc, field, new_tags.get(field))
+            db.commit()
+            db.refresh(doc)
+            logger.info("Updated doc id=%s", doc_id)
+            _sign_doc(db, doc)
+
+        reindexed = False
+        if new_entry != doc.indexed_hash:
+            try:
+                if vector_store.is_ready() and vector_store.add_document(str(doc.id), doc.title, doc.content, metadata=metadata):
+                    _mark_indexed(db, doc.id, new_hash, new_entry)
+                    reindexed = True
+            except Exception as e:
+                logger.warning("Failed to re-index doc %s in vector store: %s", doc_id, e)
+            if not reindexed:
+                # left stale for `reindex repair`, which compares indexed_hash
+                logger.warning("Doc %s not re-indexed; the vector entry is out of date", doc_id)
+
+        return {"id": doc.id, "title": doc.title, "content": doc.content, "reindexed": reindexed, **new_tags}
+    finally:
+        db.close()
+
+
+def delete_doc(doc_id: int) -> bool:
+    """Delete a doc and its vector entry. Returns False if the doc does not exist."""
+    db = SessionLocal()
+    try:
+        deleted = db.query(Doc).filter(Doc.id == doc_id).delete(synchronize_session=False)
+        db.commit()
+        if not deleted:
+            return False
+        logger.info("Deleted doc id=%s", doc_id)
+        try:
+            dedup.remove_doc(db, doc_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Failed to drop dedup signature for doc %s: %s", doc_id, e)
+        try:
+            if vector_store.is_ready():
+                vector_store.delete_ids([str(doc_id)])
+        except Exception as e:
+            # left as an orphan for `reindex repair` to drop
+            logger.warning("Failed to delete doc %s from vector store: %s", doc_id, e)
+        return True
     finally:
         db.close()
 
@@ -167,57 +330,139 @@ def list_docs() -> List[Dict[str, Any]]:
     db = SessionLocal()
     try:
         docs = db.query(Doc).all()
-        return [{"id": d.id, "title": d.title, "content": d.content} for d in docs]
+        return [{"id": d.id, "title": d.title, "content": d.content, **namespaces.doc_tags(d)} for d in docs]
     finally:
         db.close()
 
 
-def search_docs(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-    """Search documents using Vector store first, falling back to basic SQL ILIKE."""
+def _fetch_docs_by_ids(db: Session, ids: List[int], snippet_chars: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+    """Load many docs in a single query, keyed by id.
+
+    Only id/title/content are selected; when `snippet_chars` is set the content is
+    truncated in the database so the full text is never transferred.
+    """
+    if not ids:
+        return {}
+    content_col = func.substr(Doc.content, 1, snippet_chars) if snippet_chars else Doc.content
+    rows = db.query(Doc.id, Doc.title, content_col.label("content")).filter(Doc.id.in_(ids)).all()
+    return {r.id: {"id": r.id, "title": r.title, "content": r.content} for r in rows}
+
+
+def _merge_vector_hits(result_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Merge per-variant vector hits, keeping each id's closest match, nearest first."""
+    best: Dict[Any, Dict[str, Any]] = {}
+    for hits in result_lists:
+        for r in hits:
+            prev = best.get(r.get("id"))
+            if prev is None or (r.get("distance") or 0.0) < (prev.get("distance") or 0.0):
+                best[r.get("id")] = r
+    return sorted(best.values(), key=lambda r: r.get("distance") or 0.0)
+
+
+def search_docs(
+    query: str,
+    top_k: int = 3,
+    offset: int = 0,
+    snippet_chars: Optional[int] = settings.DOCS_SNIPPET_CHARS,
+    variants: Optional[List[str]] = None,
+    filters: Optional[Dict[str, str]] = None,
+) -> List[Dict[str, Any]]:
+    """Search documents, recording the latency under the searched namespace."""
+    filters = namespaces.normalize(filters)
+    start = time.perf_counter()
+    try:
+        return _search_docs(query, top_k, offset, snippet_chars, variants, filters)
+    finally:
+        namespaces.record_latency(filters, (time.perf_counter() - start) * 1000)
+
+
+def _search_docs(
+    query: str,
+    top_k: int,
+    offset: int,
+    snippet_chars: Optional[int],
+    variants: Optional[List[str]],
+    filters: Dict[str, str],
+) -> List[Dict[str, Any]]:
+    """Search documents using Vector store first, then database full-text search, then SQL ILIKE.
+
+    ILIKE runs when full-text search fails or finds nothing, so partial words
+    and identifiers the full-text tokenizer splits differently still match.
+
+    `variants` are extra phrasings of the query (e.g. the Evaluator's reframed
+    query); vector search embeds and searches them together with `query` in one
+    batch and merges the hits. `filters` (team/environment/doc_type) are pushed
+    into every backend so only that namespace is searched. Returned `content`
+    is truncated to `snippet_chars` (None returns the full text).
+    """
+    texts = [query] + [v for v in (variants or []) if v and v != query]
+    where = namespaces.to_where(filters)
+
     # 1. Try vector request
     try:
         if vector_store.is_ready():
-            vs_results = vector_store.query(query, top_k=top_k)
-            out = []
+            if len(texts) == 1:
+                vs_results = vector_store.query(query, top_k=offset + top_k, where=where)
+            else:
+                vs_results = _merge_vector_hits(vector_store.query_batch(texts, top_k=offset + top_k, where=where))
+            vs_results = vs_results[offset:offset + top_k]
+
+            # Resolve vector hits to DB ids; doc_id might be int or str in vector store, but int in DB
+            resolved = []
+            for r in vs_results:
+                meta = r.get("metadata", {}) or {}
+                doc_id = meta.get("id") or r.get("id")
+                try:
+                    tid = int(doc_id) if doc_id is not None else None
+                except (TypeError, ValueError):
+                    tid = None
+                resolved.append((r, meta, doc_id, tid))
+
             db = SessionLocal()
             try:
-                for r in vs_results:
-                    meta = r.get("metadata", {}) or {}
-                    # Attempt to resolve ID
-                    doc_id = meta.get("id") or r.get("id")
-                    
-                    db_doc = None
-                    if doc_id:
-                        # doc_id might be int or str in vector store, but int in DB
-                        try:
-                            tid = int(doc_id)
-                            db_doc = db.query(Doc).filter(Doc.id == tid).first()
-                        except ValueError:
-                            pass
-                    
-                    entry = {}
-                    if db_doc:
-                        entry = {"id": db_doc.id, "title": db_doc.title, "content": db_doc.content}
-                    else:
-                        entry = {"id": doc_id, "title": meta.get("title"), "content": r.get("document")}
-                    
-                    entry["score"] = 1.0 - float(r.get("distance", 0.0)) if r.get("distance") is not None else 1.0
-                    out.append(entry)
-                return out[:top_k]
+                db_docs = _fetch_docs_by_ids(db, [tid for _, _, _, tid in resolved if tid is not None], snippet_chars)
             finally:
                 db.close()
+
+            # Preserve vector ranking order
+            out = []
+            for r, meta, doc_id, tid in resolved:
+                entry = dict(db_docs[tid]) if tid in db_docs else None
+                if entry is None:
+                    content = r.get("document") or ""
+                    entry = {"id": doc_id, "title": meta.get("title"), "content": content[:snippet_chars] if snippet_chars else content}
+                entry["score"] = 1.0 - float(r.get("distance", 0.0)) if r.get("distance") is not None else 1.0
+                out.append(entry)
+            return out
     except Exception as e:
         logger.warning("Vector search failed, falling back to SQL: %s", e)
 
-    # 2. Fallback: SQL ILIKE
+    # 2. Database full-text search (ranked, paginated, content snippet only)
+    if settings.DOCS_FULLTEXT_ENABLED and fulltext.is_ready():
+        db = SessionLocal()
+        try:
+            # Terms from every variant go into one OR query
+            terms = " ".join(texts)
+            hits = fulltext.search(db, terms, limit=top_k, offset=offset, snippet_chars=snippet_chars, filters=filters)
+            # An empty later page of full-text results stays empty, so pages do not mix backends
+            if hits or (offset and fulltext.search(db, terms, limit=1, offset=0, snippet_chars=1, filters=filters)):
+                return hits
+            # No whole-word match: partial words and identifiers may still match by substring below
+        except Exception as e:
+            logger.warning("Full-text search failed, falling back to ILIKE: %s", e)
+        finally:
+            db.close()
+
+    # 3. Fallback: SQL ILIKE
     db = SessionLocal()
     try:
         # Simple search in title OR content
         # Note: Postgres ILIKE is case-insensitive
         q_str = f"%{query}%"
-        matches = db.query(Doc).filter(
+        content_col = func.substr(Doc.content, 1, snippet_chars) if snippet_chars else Doc.content
+        matches = db.query(Doc.id, Doc.title, content_col.label("content")).filter(
             or_(Doc.title.ilike(q_str), Doc.content.ilike(q_str))
-        ).limit(top_k).all()
+        ).filter_by(**filters).order_by(Doc.id).offset(offset).limit(top_k).all()
         
         # Simple scoring simulation
         return [{"id": d.id, "title": d.title, "content": d.content, "score": 0.5} for d in matches]
@@ -0,0 +1,373 @@
+"""Optional columnar analytics engine: a local DuckDB mirror of `questions`.
+
+With `ANALYTICS_ENGINE=duckdb`, chart aggregates run as vectorized SQL over a
+DuckDB file at `COLUMNAR_PATH` instead of the transactional database, so
+heavy admin analytics do not compete with auth and chat traffic. The mirror
+keeps only the columns the charts use: id, username, timestamp (naive UTC),
+tags, the agent of each step, answer length, and MCP used.
+
+The mirror is synced incrementally by pulling from the main database:
+
+- rows with an id above the highest id mirrored (new questions)
+- rows whose `tagged_at` moved past the last seen value (tags added later by
+  `app.core.tagging`). Each sync re-reads `COLUMNAR_TAGGED_OVERLAP_SECONDS`
+  of overlap, in case a tagging transaction committed late.
+
+Reads sync first if the last sync is older than `COLUMNAR_SYNC_SECONDS`.
+DuckDB allows one writing process per file. If the file cannot be opened
+(e.g. another API worker holds it) or `duckdb` is not installed, analytics
+fall back to aggregating in the main database (the SQL path). Command line
+(from the Backend directory):
+
+    python -m app.core.columnar sync
+    python -m app.core.columnar rebuild
+    python -m app.core.columnar status
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import func, or_
+
+from app.core import rollups
+from app.core.analytics_queries import BUCKETS, bucket_key
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logging import get_logger
+from app.core.models import Question
+
+logger = get_logger(__name__)
+
+_COLUMNS = (
+    "{'id': 'BIGINT', 'username': 'VARCHAR', 'timestamp': 'TIMESTAMP', 'tags': 'VARCHAR[]',"
+    " 'agents': 'VARCHAR[]', 'answer_len': 'INTEGER', 'used_mcp': 'VARCHAR'}"
+)
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS questions (
+        id BIGINT PRIMARY KEY,
+        username VARCHAR,
+        timestamp TIMESTAMP,
+        tags VARCHAR[],
+        agents VARCHAR[],
+        answer_len INTEGER,
+        used_mcp VARCHAR
+    )""",
+    "CREATE TABLE IF NOT EXISTS sync_state (key VARCHAR PRIMARY KEY, value VARCHAR)",
+]
+
+_lock = threading.RLock()  # one DuckDB connection per process, used by one thread at a time
+_con = None
+_error: Optional[str] = None
+_synced_at = 0.0
+
+
+def _base_dir() -> str:
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _path() -> str:
+    path = settings.COLUMNAR_PATH
+    return path if os.path.isabs(path) else os.path.join(_base_dir(), path)
+
+
+def _connect():
+    """The process's DuckDB connection, opened on first use; None if unavailable."""
+    global _con, _error
+    if _con is not None or _error is not None:
+        return _con
+    try:
+        import duckdb
+    except ImportError:
+        _error = "duckdb not installed"
+        logger.warning("Columnar: duckdb not installed, using the default analytics engine")
+        return None
+    try:
+        os.makedirs(os.path.dirname(_path()), exist_ok=True)
+        con = duckdb.connect(_path())
+        for ddl in _SCHEMA:
+            con.execute(ddl)
+        _con = con
+    except Exception as e:
+        _error = str(e)
+        logger.warning("Columnar: cannot open %s, using the default analytics engine: %s", _path(), e)
+    return _con
+
+
+def enabled() -> bool:
+    """Whether analytics should read the DuckDB mirror (`ANALYTICS_ENGINE=duckdb` and it opened)."""
+    if settings.ANALYTICS_ENGINE != "duckdb":
+        return False
+    with _lock:
+        return _connect() is not None
+
+
+def _naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _mirror_row(q) -> Dict[str, Any]:
+    tags = q.tags if isinstance(q.tags, list) else []
+    steps = q.agent_steps if isinstance(q.agent_steps, list) else []
+    timestamp = _naive_utc(q.timestamp)
+    return {
+        "id": q.id,
+        "username": q.username or "unknown",
+        "timestamp": timestamp.isoformat() if timestamp else None,
+        "tags": [str(t) for t in tags],
+        "agents": [(s.get("agent") if isinstance(s, dict) else None) or "unknown" for s in steps],
+        "answer_len": int(q.answer_len or 0),
+        "used_mcp": q.used_mcp or None,
+    }
+
+
+def _load(con, rows: List[Dict[str, Any]]) -> None:
+    """Upsert rows through a staged NDJSON file (DuckDB's reader is far faster than binding Python values)."""
+    fd, path = tempfile.mkstemp(prefix="columnar-", suffix=".ndjson")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+        # re-tagged rows (and rows of an interrupted sync) replace their mirrored copy
+        con.execute(
+            f"INSERT OR REPLACE INTO questions SELECT * FROM read_json(?, format='newline_delimited', columns={_COLUMNS})",
+            [path],
+        )
+    finally:
+        os.remove(path)
+
+
+def _state(con) -> Dict[str, str]:
+    return dict(con.execute("SELECT key, value FROM sync_state").fetchall())
+
+
+def _set_state(con, **values: str) -> None:
+    for key, value in values.items():
+        con.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", [key, value])
+
+
+def sync(batch_size: int = 5000) -> Dict[str, Any]:
+    """Pull new and re-tagged questions into the mirror."""
+    global _synced_at
+    start = time.perf_counter()
+    with _lock:
+        con = _connect()
+        if con is None:
+            raise RuntimeError(f"Columnar store unavailable: {_error}")
+        state = _state(con)
+        last_id = int(state.get("last_id", 0))
+        last_tagged = datetime.fromisoformat(state["tagged_at"]) if state.get("tagged_at") else None
+
+        changed = Question.id > last_id
+        if last_tagged is not None:
+            overlap = timedelta(seconds=settings.COLUMNAR_TAGGED_OVERLAP_SECONDS)
+            changed = or_(changed, Question.tagged_at > last_tagged - overlap)
+        max_id, max_tagged, synced = last_id, last_tagged, 0
+        cursor_id = 0
+        db = SessionLocal()
+        try:
+            while True:
+                batch = (
+                    db.query(
+                        Question.id, Question.username, Question.timestamp, Question.tags, Question.agent_steps,
+                        func.length(Question.final_answer).label("answer_len"), Question.used_mcp, Question.tagged_at,
+                    )
+                    .filter(changed, Question.id > cursor_id)
+                    .order_by(Question.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not batch:
+                    break
+                _load(con, [_mirror_row(q) for q in batch])
+                cursor_id = batch[-1].id
+                max_id = max(max_id, cursor_id)
+                for q in batch:
+                    tagged = _naive_utc(q.tagged_at)
+                    if tagged is not None and (max_tagged is None or tagged > max_tagged):
+                        max_tagged = tagged
+                synced += len(batch)
+        finally:
+            db.close()
+        _set_state(con, last_id=str(max_id), synced_at=datetime.now(timezone.utc).isoformat())
+        if max_tagged is not None:
+            _set_state(con, tagged_at=max_tagged.isoformat())
+        _synced_at = time.monotonic()
+
+    elapsed = time.perf_counter() - start
+    if synced:
+        logger.info("Columnar: synced %d questions in %.2fs", synced, elapsed)
+    return {"synced": synced, "last_id": max_id, "elapsed_s": round(elapsed, 2)}
+
+
+def rebuild(batch_size: int = 5000) -> Dict[str, Any]:
+    """Empty the mirror and copy every question again."""
+    with _lock:
+        con = _connect()
+        if con is None:
+            raise RuntimeError(f"Columnar store unavailable: {_error}")
+        con.execute("DELETE FROM questions")
+        con.execute("DELETE FROM sync_state")
+        return sync(batch_size)
+
+
+def _sync_if_due() -> None:
+    """Sync when the mirror is older than `COLUMNAR_SYNC_SECONDS`; the caller holds `_lock`."""
+    if time.monotonic() - _synced_at >= settings.COLUMNAR_SYNC_SECONDS:
+        try:
+            sync()
+        except Exception as e:
+            logger.warning("Columnar: sync failed, serving the last mirrored data: %s", e)
+
+
+def _query(sql: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+    """Run a read query, syncing first when the mirror is due."""
+    with _lock:
+        _sync_if_due()
+        return _connect().execute(sql, list(params)).fetchall()
+
+
+def synced_marker() -> Tuple[int, Optional[str]]:
+    """(highest id, latest tagged_at as naive UTC ISO) the mirror holds, syncing first when due.
+
+    Reads served right after this come from the same mirrored data, so it
+    keys caches of mirror results (see `analytics.data_marker`).
+    """
+    with _lock:
+        _sync_if_due()
+        state = _state(_connect())
+    return int(state.get("last_id", 0)), state.get("tagged_at")
+
+
+def _window(since: Optional[datetime]) -> Tuple[str, List[Any]]:
+    if since is None:
+        return "", []
+    return " AND timestamp >= ?", [_naive_utc(since)]
+
+
+def questions_per_bucket(bucket: str = "day", since: Optional[datetime] = None) -> Dict[str, int]:
+    bucket = bucket if bucket in BUCKETS else "day"
+    where, params = _window(since)
+    counts: Dict[str, int] = {}
+    for b, n in _query(
+        f"SELECT date_trunc('{bucket}', timestamp) AS b, count(*) FROM questions WHERE timestamp IS NOT NULL{where} GROUP BY b",
+        params,
+    ):
+        key = bucket_key(b, bucket)
+        counts[key] = counts.get(key, 0) + n
+    return counts
+
+
+def tags_per_bucket(bucket: str = "day", since: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+    bucket = bucket if bucket in BUCKETS else "day"
+    where, params = _window(since)
+    out: Dict[str, Dict[str, int]] = {}
+    for b, tag, n in _query(
+        f"SELECT b, tag, count(*) FROM (SELECT date_trunc('{bucket}', timestamp) AS b, unnest(tags) AS tag"
+        f" FROM questions WHERE timestamp IS NOT NULL{where}) GROUP BY b, tag",
+        params,
+    ):
+        tags = out.setdefault(bucket_key(b, bucket), {})
+        tags[tag] = tags.get(tag, 0) + n
+    return out
+
+
+def hour_of_week(since: Optional[datetime] = None) -> List[Tuple[int, int, int]]:
+    where, params = _window(since)
+    return [(int(dow), int(hour), n) for dow, hour, n in _query(
+        "SELECT isodow(timestamp) - 1 AS dow, hour(timestamp) AS h, count(*) FROM questions"
+        f" WHERE timestamp IS NOT NULL{where} GROUP BY dow, h",
+        params,
+    )]
+
+
+# Rollup dimension -> (value expression, count expression, FROM/WHERE), matching rollups.totals
+_TOTALS = {
+    rollups.QUESTIONS: ("''", "count(*)", "questions"),
+    rollups.USER: ("username", "count(*)", "questions"),
+    rollups.MCP: ("used_mcp", "count(*)", "questions WHERE used_mcp IS NOT NULL AND used_mcp <> ''"),
+    rollups.USER_MCP: ("username", "count(*)", "questions WHERE used_mcp IS NOT NULL AND used_mcp <> ''"),
+    rollups.TAG: ("tag", "count(*)", "(SELECT unnest(tags) AS tag FROM questions)"),
+    rollups.USER_TAGS: ("username", "sum(len(tags))", "questions WHERE len(tags) > 0"),
+    rollups.AGENT: ("agent", "count(*)", "(SELECT unnest(agents) AS agent FROM questions)"),
+    rollups.ANSWERED: ("''", "count(*)", "questions WHERE answer_len > 0"),
+    rollups.ANSWER_CHARS: ("''", "sum(answer_len)", "questions WHERE answer_len > 0"),
+}
+
+
+def totals(dimensions: Sequence[str]) -> Dict[str, Dict[str, int]]:
+    """All-time count per value for each rollup dimension: `{dimension: {value: count}}`."""
+    parts = [
+        f"SELECT '{d}' AS dimension, {_TOTALS[d][0]} AS value, {_TOTALS[d][1]} AS n FROM {_TOTALS[d][2]} GROUP BY value"
+        for d in dimensions
+    ]
+    out: Dict[str, Dict[str, int]] = {d: {} for d in dimensions}
+    if parts:
+        for d, v, n in _query(" UNION ALL ".join(parts)):
+            if n:
+                out[d][v] = int(n)
+    return out
+
+
+def frequencies(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Per tag: questions carrying it and total occurrences, most frequent first (like `question_tags`)."""
+    rows = _query(
+        "SELECT tag, count(DISTINCT id) AS questions, count(*) AS occurrences"
+        " FROM (SELECT id, unnest(tags) AS tag FROM questions) WHERE trim(tag) <> ''"
+        " GROUP BY tag ORDER BY questions DESC, tag" + (f" LIMIT {int(limit)}" if limit else "")
+    )
+    return [{"tag": t, "questions": q, "occurrences": o} for t, q, o in rows]
+
+
+def co_occurrence(tags: Sequence[str]) -> Dict[Tuple[str, str], int]:
+    """Questions carrying both tags, for every pair of `tags` that occurs together (keys sorted)."""
+    if len(tags) < 2:
+        return {}
+    rows = _query(
+        "WITH t AS (SELECT DISTINCT id, unnest(tags) AS tag FROM questions)"
+        " SELECT a.tag, b.tag, count(*) FROM t a JOIN t b ON a.id = b.id AND a.tag < b.tag"
+        " WHERE list_contains(?, a.tag) AND list_contains(?, b.tag) GROUP BY a.tag, b.tag",
+        [list(tags), list(tags)],
+    )
+    return {(t1, t2): n for t1, t2, n in rows}
+
+
+def status() -> Dict[str, Any]:
+    with _lock:
+        con = _connect()
+        if con is None:
+            return {"engine": settings.ANALYTICS_ENGINE, "in_use": False, "error": _error, "path": _path()}
+        rows = con.execute("SELECT count(*) FROM questions").fetchone()[0]
+        state = _state(con)
+    return {
+        "engine": settings.ANALYTICS_ENGINE,
+        "in_use": enabled(),
+        "path": _path(),
+        "rows": rows,
+        "last_id": int(state.get("last_id", 0)),
+        "synced_at": state.get("synced_at"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the DuckDB analytics mirror of the questions table.")
+    parser.add_argument("command", choices=["sync", "rebuild", "status"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    from app.core import analytics  # imports this module
+    analytics.init_schema()
+    if args.command == "sync":
+        print(sync(args.batch_size))
+    elif args.command == "rebuild":
+        print(rebuild(args.batch_size))
+    else:
+        print(status())
+
+
+if __name__ == "__main__":
+    main()
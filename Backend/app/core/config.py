@@ -20,6 +20,65 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
 
+    # Vector store / embeddings
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND: str = "sentence-transformers"  # or "onnx" (ONNX Runtime on CPU), "service" (shared embedding service)
+    EMBEDDING_ONNX_QUANTIZE: bool = True  # int8 dynamic quantization for the onnx backend
+    EMBEDDING_ONNX_DIR: str = ".models/onnx"  # exported models, relative to Backend/
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_THREADS: int = 0  # onnx intra-op threads; 0 lets ONNX Runtime decide
+    EMBEDDING_SERVICE_SOCKET: str = ""  # default: $XDG_RUNTIME_DIR/pipelight-embeddings.sock, else Backend/.run/embeddings.sock
+    EMBEDDING_SERVICE_BACKEND: str = "sentence-transformers"  # model backend loaded by the service process
+    EMBEDDING_SERVICE_MAX_BATCH: int = 64  # texts per micro-batch
+    EMBEDDING_SERVICE_MAX_WAIT_MS: float = 5.0  # how long the first request waits for others to join its batch
+    EMBEDDING_SERVICE_TIMEOUT_SECONDS: float = 30.0
+    VECTOR_WARMUP_BACKOFF_SECONDS: float = 5.0  # first retry delay after a failed warmup, doubled per attempt
+    VECTOR_WARMUP_BACKOFF_MAX_SECONDS: float = 300.0
+    VECTOR_INDEX_BACKEND: str = "chroma"  # or "native" (flat, HNSW when large), "flat", "hnsw"
+    VECTOR_INDEX_HNSW_THRESHOLD: int = 20000  # live vectors before "native" switches from flat to HNSW (a private graph per worker)
+    VECTOR_INDEX_HNSW_M: int = 16
+    VECTOR_INDEX_HNSW_EF_CONSTRUCTION: int = 200
+    VECTOR_INDEX_HNSW_EF_SEARCH: int = 64
+    VECTOR_INDEX_COMPACT_RATIO: float = 0.2  # native index: compact once this share of rows is tombstoned
+    VECTOR_INDEX_GC_GRACE_SECONDS: float = 300.0  # `reindex gc` keeps replaced collections until the swap is this old
+
+    # Document search
+    DOCS_FULLTEXT_ENABLED: bool = True  # use tsvector/FTS5 before falling back to ILIKE
+    DOCS_SNIPPET_CHARS: int = 300  # content characters returned by keyword search
+
+    # Near-duplicate detection (MinHash + LSH)
+    DEDUP_ENABLED: bool = True
+    DEDUP_THRESHOLD: float = 0.8  # estimated Jaccard similarity of word 5-gram shingles
+    DEDUP_NUM_PERM: int = 128  # signature length
+    DEDUP_BANDS: int = 16  # LSH bands (NUM_PERM / BANDS rows each); more bands find lower similarities
+
+    # Analytics
+    ANALYTICS_ENGINE: str = "rollup"  # "rollup" (hourly pre-aggregates, once built), "sql" (aggregate raw questions) or "duckdb" (local columnar mirror; single writer, so only one uvicorn worker uses it, the rest aggregate in SQL)
+    COLUMNAR_PATH: str = ".analytics/questions.duckdb"  # DuckDB mirror for ANALYTICS_ENGINE=duckdb, relative to Backend/
+    COLUMNAR_SYNC_SECONDS: float = 30.0  # reads pull new questions into the mirror at most this often
+    COLUMNAR_TAGGED_OVERLAP_SECONDS: float = 60.0  # re-read questions tagged this long before the last sync
+    TAGGING_MODE: str = "batch"  # "batch" (background worker, many questions per LLM call) or "inline" (one call per recorded question)
+    TAGGING_BATCH_SIZE: int = 20  # questions per tagging prompt
+    TAGGING_CONCURRENCY: int = 2  # tagging prompts in flight
+    TAGGING_INTERVAL_SECONDS: float = 300.0  # how often the worker retries untagged questions
+    TAGGING_MAX_WAIT_SECONDS: float = 5.0  # after a new question, wait this long for others to join its batch
+    TAGGING_MAX_ATTEMPTS: int = 3  # stop retrying a question the LLM left out of this many answers
+    EXPORT_CHUNK_SIZE: int = 1000  # rows fetched and encoded per chunk by /analytics/export
+    LLM_PROMPT_TOKEN_COST: float = 0.59  # USD per million prompt tokens, for /analytics/charts/token-usage
+    LLM_COMPLETION_TOKEN_COST: float = 0.79  # USD per million completion tokens
+    RESULT_CACHE_TTL_SECONDS: float = 900.0  # LLM insights/predictions older than this refresh in the background
+    RESULT_CACHE_CHANGE_THRESHOLD: int = 25  # ...as do results with this many questions recorded since
+    RESULT_CACHE_RETRY_SECONDS: float = 60.0  # wait before retrying a failed refresh
+
+    # Retrieval reranking (local cross-encoder on CPU)
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 50  # candidates pulled from search before reranking
+    RERANK_TOP_K: int = 3  # passages sent to the Synthesizer after reranking
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_BUDGET_MS: int = 300  # stop scoring new batches after this much time
+    RERANK_CACHE_SIZE: int = 4096  # cached (query, passage) scores
+
     class Config:
         env_file = ".env"
 
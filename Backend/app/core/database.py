@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from typing import List
+
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -22,3 +24,42 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def ensure_columns(table) -> List[str]:
+    """Add columns (and their indexes) declared on `table` but missing from an existing database table.
+
+    `create_all` creates tables but never alters them, so columns added to a
+    model later are created here (nullable, without server defaults).
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return []
+    existing = {c["name"] for c in inspector.get_columns(table.name)}
+    added = []
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl_type = column.type.compile(dialect=engine.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}")
+            added.append(column.name)
+        if added:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+    return added
+
+
+def ensure_indexes(table) -> List[str]:
+    """Create indexes declared on `table` but missing from an existing database table."""
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return []
+    existing = {i["name"] for i in inspector.get_indexes(table.name)}
+    created = []
+    with engine.begin() as conn:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+                created.append(index.name)
+    return created
@@ -0,0 +1,215 @@
+"""Near-duplicate document detection with MinHash signatures and LSH buckets.
+
+Each doc's content is split into word 5-gram shingles and reduced to a
+`DEDUP_NUM_PERM`-value MinHash signature (stored in `doc_signatures`). The
+signature is cut into `DEDUP_BANDS` bands. Each band is hashed into a bucket
+row in `doc_lsh_buckets`, so finding candidates for a new doc is one indexed
+`IN` lookup instead of a scan of the corpus. Candidates are then confirmed by
+estimated Jaccard similarity (the share of equal signature values) against
+`DEDUP_THRESHOLD`.
+
+`add_doc`/`update_doc`/`delete_doc` keep the tables current; `backfill()`
+signs docs stored before this existed and `scan()` groups the duplicates
+already in the corpus. Command line (from the Backend directory):
+
+    python -m app.core.dedup backfill
+    python -m app.core.dedup scan --threshold 0.85
+"""
+from typing import List, Dict, Any, Optional
+import argparse
+import hashlib
+import re
+import zlib
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logging import get_logger
+from app.core.models import Doc, DocSignature, DocLshBucket
+
+logger = get_logger(__name__)
+
+SHINGLE_WORDS = 5
+_PRIME = np.uint64((1 << 31) - 1)
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Fixed seed: signatures must be comparable across processes and restarts
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, int(_PRIME), size=settings.DEDUP_NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, int(_PRIME), size=settings.DEDUP_NUM_PERM).astype(np.uint64)
+
+
+def _shingles(text: str) -> np.ndarray:
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    if len(tokens) < SHINGLE_WORDS:
+        grams = {" ".join(tokens)}
+    else:
+        grams = {" ".join(tokens[i:i + SHINGLE_WORDS]) for i in range(len(tokens) - SHINGLE_WORDS + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) % int(_PRIME) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of `text` (uint32 array), or None if it has no words."""
+    shingles = _shingles(text)
+    if not len(shingles):
+        return None
+    sig = np.full(len(_A), _PRIME, dtype=np.uint64)
+    # (a*x + b) mod p fits in uint64 since a, b, x < 2^31; chunked to bound memory on long docs
+    for start in range(0, len(shingles), 2048):
+        x = shingles[start:start + 2048]
+        hashed = (_A[:, None] * x[None, :] + _B[:, None]) % _PRIME
+        np.minimum(sig, hashed.min(axis=1), out=sig)
+    return sig.astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.mean(a == b))
+
+
+def _buckets(sig: np.ndarray) -> List[str]:
+    rows = len(sig) // settings.DEDUP_BANDS
+    return [
+        f"{band}:{hashlib.blake2b(sig[band * rows:(band + 1) * rows].tobytes(), digest_size=8).hexdigest()}"
+        for band in range(settings.DEDUP_BANDS)
+    ]
+
+
+def _load_signatures(db: Session, doc_ids) -> Dict[int, np.ndarray]:
+    rows = db.query(DocSignature.doc_id, DocSignature.signature).filter(DocSignature.doc_id.in_(list(doc_ids))).all()
+    return {r.doc_id: np.frombuffer(r.signature, dtype=np.uint32) for r in rows}
+
+
+def find_similar(db: Session, sig: Optional[np.ndarray], exclude_id: Optional[int] = None,
+                 threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Docs whose estimated similarity to `sig` is at least `threshold`, most similar first."""
+    if sig is None:
+        return []
+    threshold = settings.DEDUP_THRESHOLD if threshold is None else threshold
+    candidates = {
+        r.doc_id for r in db.query(DocLshBucket.doc_id).filter(DocLshBucket.bucket.in_(_buckets(sig))).distinct()
+    }
+    candidates.discard(exclude_id)
+    if not candidates:
+        return []
+    scored = [(doc_id, similarity(sig, other)) for doc_id, other in _load_signatures(db, candidates).items()]
+    scored = [(doc_id, s) for doc_id, s in scored if s >= threshold]
+    if not scored:
+        return []
+    titles = dict(db.query(Doc.id, Doc.title).filter(Doc.id.in_([d for d, _ in scored])).all())
+    return sorted(
+        ({"id": doc_id, "title": titles.get(doc_id), "similarity": round(s, 3)} for doc_id, s in scored if doc_id in titles),
+        key=lambda d: d["similarity"], reverse=True,
+    )
+
+
+def find_duplicates(db: Session, content: str, exclude_id: Optional[int] = None,
+                    threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Stored docs that are near-duplicates of `content`."""
+    return find_similar(db, signature(content), exclude_id, threshold)
+
+
+def index_doc(db: Session, doc_id: int, content: str, content_hash: Optional[str] = None) -> None:
+    """Store (or replace) a doc's signature and buckets; the caller commits."""
+    remove_doc(db, doc_id)
+    sig = signature(content)
+    if sig is None:
+        return
+    db.add(DocSignature(doc_id=doc_id, signature=sig.tobytes(), content_hash=content_hash))
+    db.add_all([DocLshBucket(bucket=b, doc_id=doc_id) for b in _buckets(sig)])
+
+
+def remove_doc(db: Session, doc_id: int) -> None:
+    """Drop a doc's signature and buckets; the caller commits."""
+    db.query(DocLshBucket).filter(DocLshBucket.doc_id == doc_id).delete(synchronize_session=False)
+    db.query(DocSignature).filter(DocSignature.doc_id == doc_id).delete(synchronize_session=False)
+
+
+def backfill(batch_size: int = 500) -> int:
+    """Sign docs that have no signature or whose content changed since signing."""
+    db = SessionLocal()
+    try:
+        stale = [
+            r.id for r in db.query(Doc.id)
+            .outerjoin(DocSignature, DocSignature.doc_id == Doc.id)
+            .filter((DocSignature.doc_id.is_(None)) | (DocSignature.content_hash.is_distinct_from(Doc.content_hash)))
+        ]
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            for doc in db.query(Doc.id, Doc.content, Doc.content_hash).filter(Doc.id.in_(batch)):
+                index_doc(db, doc.id, doc.content, doc.content_hash)
+            db.commit()
+        if stale:
+            logger.info("Dedup: signed %d docs", len(stale))
+        return len(stale)
+    finally:
+        db.close()
+
+
+def scan(threshold: Optional[float] = None) -> Dict[str, Any]:
+    """Group near-duplicate docs already in the corpus (after a backfill)."""
+    threshold = settings.DEDUP_THRESHOLD if threshold is None else threshold
+    backfilled = backfill()
+    db = SessionLocal()
+    try:
+        shared = select(DocLshBucket.bucket).group_by(DocLshBucket.bucket).having(func.count(DocLshBucket.doc_id) > 1)
+        bucket_docs: Dict[str, List[int]] = {}
+        for r in db.query(DocLshBucket.bucket, DocLshBucket.doc_id).filter(DocLshBucket.bucket.in_(shared)):
+            bucket_docs.setdefault(r.bucket, []).append(r.doc_id)
+        pairs = {(a, b) for ids in bucket_docs.values() for a in ids for b in ids if a < b}
+        signatures = _load_signatures(db, {d for pair in pairs for d in pair}) if pairs else {}
+
+        # Union-find over confirmed pairs
+        parent: Dict[int, int] = {}
+
+        def _find(x: int) -> int:
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        scores: Dict[tuple, float] = {}
+        for a, b in pairs:
+            s = similarity(signatures[a], signatures[b])
+            if s >= threshold:
+                scores[(a, b)] = s
+                parent[_find(a)] = _find(b)
+
+        groups: Dict[int, List[int]] = {}
+        for doc_id in parent:
+            groups.setdefault(_find(doc_id), []).append(doc_id)
+        members = [sorted(g) for g in groups.values() if len(g) > 1]
+        titles = dict(db.query(Doc.id, Doc.title).filter(Doc.id.in_([d for g in members for d in g])).all()) if members else {}
+        out = [
+            {
+                "docs": [{"id": d, "title": titles.get(d)} for d in g],
+                "max_similarity": round(max(s for (a, b), s in scores.items() if a in g and b in g), 3),
+            }
+            for g in sorted(members, key=lambda g: g[0])
+        ]
+        return {"threshold": threshold, "backfilled": backfilled, "candidate_pairs": len(pairs), "groups": out}
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate documents.")
+    parser.add_argument("command", choices=["backfill", "scan"])
+    parser.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args()
+    if args.command == "backfill":
+        print({"signed": backfill()})
+        return
+    report = scan(args.threshold)
+    print(f"{len(report['groups'])} duplicate groups ({report['candidate_pairs']} candidate pairs, threshold {report['threshold']})")
+    for group in report["groups"]:
+        print(f"  {group['max_similarity']:.3f}  " + ", ".join(f"{d['id']}:{d['title']}" for d in group["docs"]))
+
+
+if __name__ == "__main__":
+    main()
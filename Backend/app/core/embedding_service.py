@@ -0,0 +1,260 @@
+"""Out-of-process embedding service shared by all uvicorn workers on a host.
+
+One process loads the embedding model (`EMBEDDING_SERVICE_BACKEND`, any
+backend from `app.core.embeddings`) and serves encode requests on a Unix
+socket. Requests from concurrent callers are micro-batched: the batcher
+takes the first waiting request, then keeps collecting for up to
+`EMBEDDING_SERVICE_MAX_WAIT_MS` or until `EMBEDDING_SERVICE_MAX_BATCH` texts,
+and encodes them in one model call. Workers set `EMBEDDING_BACKEND=service`
+and talk to it through `embeddings.RemoteEmbeddingBackend`, so each one holds
+a socket instead of its own copy of the model.
+
+Protocol: every message is a frame made of a 4-byte big-endian length and a
+JSON header, optionally followed by a binary payload whose size the header
+describes. Requests are `{"op": "encode", "texts": [...]}` or
+`{"op": "stats"}`. An encode response header is
+`{"shape": [n, dim], "queue_ms": ..., "batch_texts": ...}` followed by
+n * dim float32 values; failures return `{"error": "..."}`.
+
+The socket is created with mode 0600, so the workers must run as the same
+user as the service. By default it lives in `$XDG_RUNTIME_DIR` (or
+`Backend/.run/`, created 0700) rather than a shared directory such as /tmp.
+
+Run it (from the Backend directory) before starting the workers:
+
+    python -m app.core.embedding_service
+"""
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple
+import argparse
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+
+from app.core import embeddings
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_HEADER = struct.Struct(">I")
+_MAX_FRAME = 64 * 1024 * 1024
+
+
+def send_frame(sock: socket.socket, header: Dict[str, Any], payload: bytes = b"") -> None:
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding service connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> Dict[str, Any]:
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if length > _MAX_FRAME:
+        raise ValueError(f"frame too large: {length} bytes")
+    return json.loads(_recv_exact(sock, length))
+
+
+def recv_payload(sock: socket.socket, n: int) -> bytes:
+    return _recv_exact(sock, n)
+
+
+class MicroBatcher:
+    """Collects encode requests from many connections and runs them as shared batches."""
+
+    def __init__(self, backend: embeddings.EmbeddingBackend, max_batch: int, max_wait_ms: float):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[List[str], float, Future]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._queue_ms: deque = deque(maxlen=1000)
+        self._encode_ms: deque = deque(maxlen=1000)
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._queue.put((texts, time.perf_counter(), future))
+        return future
+
+    def _collect(self) -> List[Tuple[List[str], float, Future]]:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            texts = [t for item in batch for t in item[0]]
+            start = time.perf_counter()
+            try:
+                vectors = self.backend.encode(texts)
+            except Exception as e:
+                logger.error("Embedding service: encode failed for %d texts: %s", len(texts), e)
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            encode_ms = (time.perf_counter() - start) * 1000
+
+            offset = 0
+            for item_texts, enqueued, future in batch:
+                queue_ms = (start - enqueued) * 1000
+                future.set_result((vectors[offset:offset + len(item_texts)], queue_ms, len(texts)))
+                offset += len(item_texts)
+                with self._stats_lock:
+                    self._queue_ms.append(queue_ms)
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._texts += len(texts)
+                self._batches += 1
+                self._encode_ms.append(encode_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            queue_ms = sorted(self._queue_ms)
+            encode_ms = sorted(self._encode_ms)
+            info = {
+                "requests": self._requests,
+                "texts": self._texts,
+                "batches": self._batches,
+                "avg_batch_texts": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "pending": self._queue.qsize(),
+            }
+
+        def _pct(values, pct):
+            return round(values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))], 2) if values else None
+
+        info.update(
+            queue_p50_ms=_pct(queue_ms, 50), queue_p95_ms=_pct(queue_ms, 95),
+            encode_p50_ms=_pct(encode_ms, 50), encode_p95_ms=_pct(encode_ms, 95),
+        )
+        return info
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        batcher: MicroBatcher = self.server.batcher
+        sock = self.request
+        while True:
+            try:
+                request = recv_frame(sock)
+            except (ConnectionError, OSError):
+                return
+            try:
+                if request.get("op") == "stats":
+                    send_frame(sock, {**batcher.stats(), "backend": batcher.backend.name, "model": settings.EMBEDDING_MODEL})
+                    continue
+                texts = [str(t) for t in request.get("texts", [])]
+                if not texts:
+                    send_frame(sock, {"shape": [0, 0], "queue_ms": 0.0, "batch_texts": 0})
+                    continue
+                vectors, queue_ms, batch_texts = batcher.submit(texts).result()
+                payload = vectors.astype("float32", copy=False).tobytes()
+                send_frame(sock, {"shape": list(vectors.shape), "queue_ms": round(queue_ms, 3), "batch_texts": batch_texts}, payload)
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                send_frame(sock, {"error": str(e)})
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # every worker thread connects at once after a restart
+
+    def __init__(self, socket_path: str, batcher: MicroBatcher):
+        self.batcher = batcher
+        super().__init__(socket_path, _Handler)
+
+
+def _bind(socket_path: str, batcher: MicroBatcher) -> EmbeddingServer:
+    """Listen on `socket_path`, reachable only by the user running the service."""
+    directory = os.path.dirname(socket_path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, mode=0o700)
+    if os.path.lexists(socket_path):
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            raise SystemExit(f"{socket_path} exists and is not a socket; refusing to replace it")
+        os.remove(socket_path)  # stale socket from a previous run
+    # Bind under a restrictive umask so the socket is never reachable by others, even briefly
+    old_umask = os.umask(0o177)
+    try:
+        server = EmbeddingServer(socket_path, batcher)
+    finally:
+        os.umask(old_umask)
+    os.chmod(socket_path, 0o600)
+    return server
+
+
+def serve(socket_path: Optional[str] = None, backend_name: Optional[str] = None) -> None:
+    """Load the model and serve encode requests until interrupted."""
+    socket_path = socket_path or embeddings.service_socket_path()
+    backend_name = backend_name or settings.EMBEDDING_SERVICE_BACKEND
+    if backend_name == "service":
+        raise SystemExit("EMBEDDING_SERVICE_BACKEND must name a local backend, not 'service'")
+
+    start = time.perf_counter()
+    backend = embeddings.get_backend(backend_name)
+    backend.encode(["warmup"])
+    logger.info("Embedding service: loaded %s (%s) in %.0fms",
+                settings.EMBEDDING_MODEL, backend.name, (time.perf_counter() - start) * 1000)
+
+    batcher = MicroBatcher(backend, settings.EMBEDDING_SERVICE_MAX_BATCH, settings.EMBEDDING_SERVICE_MAX_WAIT_MS)
+    server = _bind(socket_path, batcher)
+    logger.info("Embedding service: listening on %s", socket_path)
+
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt  # unwind serve_forever so the socket file is removed
+
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.remove(socket_path)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve embeddings to local workers over a Unix socket.")
+    parser.add_argument("--socket", default=None, help="socket path (default: EMBEDDING_SERVICE_SOCKET, else a per-user runtime path)")
+    parser.add_argument("--backend", default=None, help=f"model backend (default: {settings.EMBEDDING_SERVICE_BACKEND})")
+    args = parser.parse_args()
+    serve(args.socket, args.backend)
+
+
+if __name__ == "__main__":
+    main()
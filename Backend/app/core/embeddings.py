@@ -0,0 +1,285 @@
+"""Pluggable embedding backends for the vector store.
+
+Backends (selected with `EMBEDDING_BACKEND`):
+
+- `sentence-transformers`: the PyTorch `SentenceTransformer` model (default).
+- `onnx`: the same transformer exported to ONNX and run with ONNX Runtime on
+  CPU, optionally int8 dynamic-quantized (`EMBEDDING_ONNX_QUANTIZE`). Pooling
+  (attention-masked mean + L2 normalization) matches all-MiniLM-L6-v2's
+  SentenceTransformer pipeline. The export is created on first use under
+  `EMBEDDING_ONNX_DIR` and reused afterwards.
+- `service`: a thin client for `app.core.embedding_service`, which owns one
+  copy of the model per host and micro-batches requests from every worker.
+
+Every backend returns a float32 NumPy array of shape (len(texts), dim).
+`compare_backends` checks a candidate backend's output against a reference;
+`benchmarks/bench_embeddings.py` reports the same check alongside
+throughput, latency and memory for each backend.
+"""
+from typing import List, Dict, Any, Optional
+import os
+import socket
+import threading
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingBackend:
+    """Interface for text embedding backends."""
+
+    name = "base"
+
+    def encode(self, texts: List[str]):
+        """Return a float32 array of shape (len(texts), dim)."""
+        raise NotImplementedError
+
+    @property
+    def dim(self) -> int:
+        return int(self.encode(["dim"]).shape[1])
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """PyTorch SentenceTransformer model."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str]):
+        import numpy as np
+
+        return np.asarray(
+            self._model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+
+def _hf_model_id(model_name: str) -> str:
+    # SentenceTransformer accepts short names for its own models
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = True) -> str:
+    """Export `model_name` to ONNX under `out_dir` (and an int8 copy if `quantize`); return the model path."""
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+    target = int8_path if quantize else fp32_path
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(out_dir, exist_ok=True)
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        hf_id = _hf_model_id(model_name)
+        logger.info("Embeddings: exporting %s to ONNX at %s", hf_id, fp32_path)
+        tokenizer = AutoTokenizer.from_pretrained(hf_id)
+        model = AutoModel.from_pretrained(hf_id).eval()
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        # positional order matches BertModel.forward(input_ids, attention_mask, token_type_ids)
+        input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+        dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[n] for n in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(out_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        logger.info("Embeddings: quantizing %s to int8", fp32_path)
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return target
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime (CPU) export of a sentence-transformers model, optionally int8-quantized."""
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: str,
+        quantize: bool = True,
+        batch_size: int = 32,
+        max_length: int = 256,
+        threads: int = 0,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.max_length = max_length
+        model_path = export_onnx(model_name, model_dir, quantize)
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        # the standalone fast tokenizer keeps torch/transformers out of this process
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+    def encode(self, texts: List[str]):
+        import numpy as np
+
+        out = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            encodings = self._tokenizer.encode_batch(batch)
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            hidden = self._session.run(None, feeds)[0]
+
+            # attention-masked mean pooling followed by L2 normalization
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        if not out:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(out)
+
+
+class RemoteEmbeddingBackend(EmbeddingBackend):
+    """Client for the local embedding service (one persistent socket per thread)."""
+
+    name = "service"
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.last_queue_ms: Optional[float] = None
+
+    def _connect(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _call(self, request: Dict[str, Any]):
+        from app.core import embedding_service
+
+        # One reconnect covers a service restart between calls
+        for attempt in range(2):
+            try:
+                sock = self._connect()
+                embedding_service.send_frame(sock, request)
+                header = embedding_service.recv_frame(sock)
+                payload = b""
+                if "shape" in header:
+                    rows, dim = header["shape"]
+                    payload = embedding_service.recv_payload(sock, rows * dim * 4)
+                break
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt:
+                    raise
+        if "error" in header:
+            raise RuntimeError(f"Embedding service error: {header['error']}")
+        return header, payload
+
+    def encode(self, texts: List[str]):
+        import numpy as np
+
+        header, payload = self._call({"op": "encode", "texts": list(texts)})
+        self.last_queue_ms = header.get("queue_ms")
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching and queue-wait statistics reported by the service."""
+        return self._call({"op": "stats"})[0]
+
+
+def service_socket_path() -> str:
+    """Socket of the embedding service: `EMBEDDING_SERVICE_SOCKET`, or a per-user runtime path."""
+    path = settings.EMBEDDING_SERVICE_SOCKET
+    if not path:
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+        if runtime_dir:
+            return os.path.join(runtime_dir, "pipelight-embeddings.sock")
+        path = os.path.join(".run", "embeddings.sock")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), "..", "..", path)
+    return os.path.normpath(path)
+
+
+def _onnx_dir(model_name: str) -> str:
+    base = settings.EMBEDDING_ONNX_DIR
+    if not os.path.isabs(base):
+        base = os.path.join(os.path.dirname(__file__), "..", "..", base)
+    return os.path.join(base, model_name.replace("/", "__"))
+
+
+def get_backend(name: Optional[str] = None, quantize: Optional[bool] = None) -> EmbeddingBackend:
+    """Build the configured (or named) embedding backend."""
+    name = name or settings.EMBEDDING_BACKEND
+    model_name = settings.EMBEDDING_MODEL
+    if name == "sentence-transformers":
+        return SentenceTransformerBackend(model_name, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    if name == "onnx":
+        return OnnxBackend(
+            model_name,
+            _onnx_dir(model_name),
+            quantize=settings.EMBEDDING_ONNX_QUANTIZE if quantize is None else quantize,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            threads=settings.EMBEDDING_THREADS,
+        )
+    if name == "service":
+        return RemoteEmbeddingBackend(service_socket_path(), timeout=settings.EMBEDDING_SERVICE_TIMEOUT_SECONDS)
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def compare_backends(reference: EmbeddingBackend, candidate: EmbeddingBackend, texts: List[str]) -> Dict[str, Any]:
+    """Cosine similarity between two backends' embeddings of the same texts."""
+    import numpy as np
+
+    a = reference.encode(texts)
+    b = candidate.encode(texts)
+    a = a / np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b = b / np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    cos = (a * b).sum(axis=1)
+    return {"n": len(texts), "mean_cosine": float(cos.mean()), "min_cosine": float(cos.min())}
@@ -0,0 +1,89 @@
+"""Streaming export of recorded questions (NDJSON, CSV, Parquet).
+
+Rows are read in chunks of `EXPORT_CHUNK_SIZE` from a server-side cursor
+(`analytics.stream_questions`) and encoded chunk by chunk, so memory stays
+flat however many rows are exported. NDJSON and CSV are streamed straight to
+the client. Parquet needs its footer written last, so it is written one row
+group per chunk to a local temporary file, which is then sent and deleted.
+Parquet needs the optional `pyarrow` package.
+
+In CSV and Parquet the JSON columns (`tags`, `agent_steps`, `mcp_results`)
+are encoded as JSON strings.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+import csv
+import io
+import json
+import os
+import tempfile
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+JSON_FIELDS = ("tags", "agent_steps", "mcp_results")
+
+
+def ndjson_chunks(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in chunk).encode()
+
+
+def _flat(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: json.dumps(v, default=str) if k in JSON_FIELDS and v is not None else v for k, v in row.items()}
+
+
+def csv_chunks(chunks: Iterable[List[Dict[str, Any]]], fields: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(fields))
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(_flat(row) for row in chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_parquet(chunks: Iterable[List[Dict[str, Any]]], fields: Sequence[str]) -> str:
+    """Write the chunks as row groups to a temporary .parquet file and return its path (caller deletes it)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export not available. Please install pyarrow.")
+
+    types = {"id": pa.int64(), "timestamp": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(f, types.get(f, pa.string())) for f in fields])
+    fd, path = tempfile.mkstemp(prefix="questions-", suffix=".parquet")
+    os.close(fd)
+    rows = 0
+    try:
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in chunks:
+                records = [_flat(row) for row in chunk]
+                if "timestamp" in fields:
+                    for r in records:
+                        r["timestamp"] = datetime.fromisoformat(r["timestamp"]) if r["timestamp"] else None
+                writer.write_table(pa.Table.from_pylist(records, schema=schema))
+                rows += len(records)
+    except Exception:
+        os.remove(path)
+        raise
+    logger.info("Export: wrote %d rows to %s", rows, path)
+    return path
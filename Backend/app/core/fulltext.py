@@ -0,0 +1,154 @@
+"""Database-side full-text search over the `docs` table.
+
+On Postgres a generated `search_vector` tsvector column (title weighted
+above content) with a GIN index is added to `docs`, and matches are ranked
+with `ts_rank`. On SQLite an FTS5 table with external content over `docs`
+is created and kept in sync by triggers; matches are ranked with `bm25`.
+
+Queries select `id`, `title` and (by default) a leading snippet of `content`, so the
+full document text never leaves the database. Other dialects leave the
+backend disabled and callers should fall back to ILIKE matching.
+"""
+import re
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_ready = False
+_dialect = None
+
+# Columns that may appear in `filters` (interpolated as identifiers, so whitelisted)
+_FILTER_COLUMNS = ("team", "environment", "doc_type")
+
+# Longer queries are truncated; chat turns can be paragraphs long.
+_MAX_TERMS = 32
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_POSTGRES_DDL = [
+    "ALTER TABLE docs ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_docs_search_vector ON docs USING GIN (search_vector)",
+]
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+    "title, content, content='docs', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS docs_fts_ai AFTER INSERT ON docs BEGIN "
+    "INSERT INTO docs_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS docs_fts_ad AFTER DELETE ON docs BEGIN "
+    "INSERT INTO docs_fts(docs_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS docs_fts_au AFTER UPDATE ON docs BEGIN "
+    "INSERT INTO docs_fts(docs_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO docs_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+# `{content}` is either the full column or a leading substring and `{filters}`
+# holds extra namespace conditions (see `search`)
+_POSTGRES_SEARCH = (
+    "SELECT d.id, d.title, {content} AS content, ts_rank(d.search_vector, q) AS rank "
+    "FROM docs d, to_tsquery('english', :tsquery) q "
+    "WHERE d.search_vector @@ q{filters} "
+    "ORDER BY rank DESC, d.id "
+    "LIMIT :limit OFFSET :offset"
+)
+
+_SQLITE_SEARCH = (
+    "SELECT d.id, d.title, {content} AS content, -bm25(docs_fts, 10.0, 1.0) AS rank "
+    "FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid "
+    "WHERE docs_fts MATCH :tsquery{filters} "
+    "ORDER BY bm25(docs_fts, 10.0, 1.0), d.id "
+    "LIMIT :limit OFFSET :offset"
+)
+
+
+def init(engine: Engine) -> None:
+    """Create the full-text index structures for the engine's dialect (idempotent)."""
+    global _ready, _dialect
+    dialect = engine.dialect.name
+    try:
+        if dialect == "postgresql":
+            with engine.begin() as conn:
+                for stmt in _POSTGRES_DDL:
+                    conn.exec_driver_sql(stmt)
+        elif dialect == "sqlite":
+            with engine.begin() as conn:
+                existed = conn.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'docs_fts'"
+                ).first() is not None
+                for stmt in _SQLITE_DDL:
+                    conn.exec_driver_sql(stmt)
+                if not existed:
+                    # Index rows that were inserted before the FTS table existed
+                    conn.exec_driver_sql("INSERT INTO docs_fts(docs_fts) VALUES ('rebuild')")
+        else:
+            logger.info("Full-text search not supported on dialect %s; using ILIKE fallback", dialect)
+            _ready = False
+            return
+        _dialect = dialect
+        _ready = True
+        logger.info("Full-text search initialized (%s)", dialect)
+    except Exception as e:
+        _ready = False
+        logger.warning("Full-text search unavailable: %s", e)
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def _terms(query: str) -> List[str]:
+    return _TOKEN_RE.findall(query or "")[:_MAX_TERMS]
+
+
+def _to_query(terms: List[str]) -> str:
+    """Build an OR query so long natural-language questions still match partially."""
+    if _dialect == "postgresql":
+        return " | ".join(terms)
+    return " OR ".join('"%s"' % t for t in terms)
+
+
+def search(
+    db: Session,
+    query: str,
+    limit: int = 3,
+    offset: int = 0,
+    snippet_chars: Optional[int] = 300,
+    filters: Optional[Dict[str, str]] = None,
+) -> List[Dict[str, Any]]:
+    """Return ranked matches as dicts with id, title, content and score in (0, 1).
+
+    `content` is truncated to `snippet_chars` in the database; pass None for the full text.
+    `filters` restricts matches to docs whose namespace columns equal the given values.
+    """
+    if not _ready:
+        raise RuntimeError("Full-text search not initialized")
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    template = _POSTGRES_SEARCH if _dialect == "postgresql" else _SQLITE_SEARCH
+    content = "substr(d.content, 1, :snippet_chars)" if snippet_chars else "d.content"
+    params = {"tsquery": _to_query(terms), "limit": limit, "offset": offset}
+    if snippet_chars:
+        params["snippet_chars"] = snippet_chars
+    conditions = ""
+    for column, value in (filters or {}).items():
+        if column not in _FILTER_COLUMNS:
+            raise ValueError(f"Unsupported filter column: {column}")
+        conditions += f" AND d.{column} = :f_{column}"
+        params[f"f_{column}"] = value
+    rows = db.execute(text(template.format(content=content, filters=conditions)), params).all()
+
+    # ts_rank and -bm25 are unbounded positive ranks; squash into (0, 1) so scores
+    # are comparable with the vector (1 - distance) and ILIKE (0.5) paths.
+    return [
+        {"id": r.id, "title": r.title, "content": r.content or "", "score": float(r.rank) / (1.0 + float(r.rank))}
+        for r in rows
+    ]
@@ -0,0 +1,102 @@
+"""Per-agent latency and token accounting for the chat pipeline.
+
+Every agent function is wrapped with `@agent("Name")`. The wrapper times the
+call and adds its metrics to the `agent_steps` entry the agent appends:
+
+- `duration_ms`: wall time of the agent call
+- `queue_wait_ms`: time since the previous stage of the same question ended
+  (or since the question was received), i.e. time spent waiting between
+  stages; only present when the caller started a trace with `start_trace()`
+- `prompt_tokens` / `completion_tokens`: summed over the agent's LLM calls
+- `cache_hits`: cache lookups served from a cache (e.g. reranker scores)
+- `calls`: one entry per LLM / MCP / vector / search call made by the agent,
+  with `kind`, `name`, `duration_ms` and, for LLM calls, token counts
+
+Calls are recorded with the `call(kind, name)` context manager and cache
+hits with `add_cache_hits(n)`; the LLM returned by `get_llm()` records its
+own `invoke` calls. State is kept in context variables, so concurrent
+questions do not mix; calls made outside an agent (tagging, insights) are
+not recorded. The steps are stored with the question in
+`Question.agent_steps`.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+import functools
+import time
+
+_step: ContextVar[Optional[Dict[str, Any]]] = ContextVar("agent_step", default=None)
+_last_end: ContextVar[Optional[float]] = ContextVar("agent_last_end", default=None)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def start_trace() -> None:
+    """Start timing a new question in the current context (call when it is received)."""
+    _last_end.set(time.perf_counter())
+
+
+def token_usage(response: Any) -> Dict[str, int]:
+    """Prompt/completion token counts reported on a LangChain message, if any."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        return {"prompt_tokens": int(usage.get("input_tokens") or 0),
+                "completion_tokens": int(usage.get("output_tokens") or 0)}
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return {"prompt_tokens": int(usage.get("prompt_tokens") or 0),
+            "completion_tokens": int(usage.get("completion_tokens") or 0)}
+
+
+@contextmanager
+def call(kind: str, name: str = "") -> Iterator[Dict[str, Any]]:
+    """Time an LLM/MCP/vector/search call; the caller may add token counts to the yielded record."""
+    record: Dict[str, Any] = {"kind": kind, "name": name}
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        record["error"] = True
+        raise
+    finally:
+        record["duration_ms"] = _ms(time.perf_counter() - start)
+        step = _step.get()
+        if step is not None:
+            step["calls"].append(record)
+            step["prompt_tokens"] += record.get("prompt_tokens", 0)
+            step["completion_tokens"] += record.get("completion_tokens", 0)
+
+
+def add_cache_hits(n: int) -> None:
+    """Count `n` cache hits on the running agent step, if any."""
+    step = _step.get()
+    if step is not None:
+        step["cache_hits"] += n
+
+
+def agent(name: str) -> Callable:
+    """Decorator for agent functions `(state) -> dict`: adds timing and token metrics to the step it appends."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            start = time.perf_counter()
+            last_end = _last_end.get()
+            metrics: Dict[str, Any] = {"duration_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0, "calls": []}
+            if last_end is not None:
+                metrics["queue_wait_ms"] = _ms(start - last_end)
+            token = _step.set(metrics)
+            try:
+                result = fn(state, *args, **kwargs)
+            finally:
+                _step.reset(token)
+                end = time.perf_counter()
+                metrics["duration_ms"] = _ms(end - start)
+                if last_end is not None:
+                    _last_end.set(end)
+            steps = result.get("agent_steps") if isinstance(result, dict) else None
+            if steps and len(steps) > len(state.agent_steps) and steps[-1].get("agent") == name:
+                steps[-1] = {**steps[-1], **metrics}
+            return result
+        return wrapper
+    return decorate
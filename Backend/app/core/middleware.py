@@ -22,7 +22,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
         
         # Skip auth for public endpoints
-        if request.url.path in ["/api/auth/login", "/api/auth/register", "/docs", "/openapi.json", "/api/health"]:
+        if request.url.path in ["/api/auth/login", "/api/auth/register", "/docs", "/openapi.json", "/api/health", "/api/health/ready"]:
             return await call_next(request)
         
         # Protect /api endpoints (except auth)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, ARRAY
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, ARRAY, LargeBinary, Index, BigInteger, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -18,7 +18,30 @@ class Doc(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     content = Column(Text)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the indexed text; skips re-embedding unchanged docs
+    indexed_hash = Column(String(64), nullable=True)  # vector_store.entry_hash of the live vector entry, set after a successful upsert
+    # Namespace tags, copied into the vector metadata for filtered retrieval
+    team = Column(String, index=True, nullable=True)
+    environment = Column(String, index=True, nullable=True)
+    doc_type = Column(String, index=True, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class DocSignature(Base):
+    """MinHash signature of a doc's text, for near-duplicate detection (see app.core.dedup)."""
+    __tablename__ = "doc_signatures"
+
+    doc_id = Column(Integer, primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # uint32 array
+    content_hash = Column(String(64), nullable=True)  # Doc.content_hash the signature was computed from
+
+class DocLshBucket(Base):
+    """LSH band bucket -> doc; docs sharing any bucket are near-duplicate candidates."""
+    __tablename__ = "doc_lsh_buckets"
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(String(40), index=True, nullable=False)  # "<band>:<hash of the band's rows>"
+    doc_id = Column(Integer, index=True, nullable=False)
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
@@ -43,9 +66,47 @@ class Question(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, index=True)
     question = Column(Text)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now()) # Keeping as timestamp to match existing logic, or map to created_at
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True) # Keeping as timestamp to match existing logic, or map to created_at
     tags = Column(JSON, default=[]) # Storing list of strings as JSON
     agent_steps = Column(JSON, default=[])
     final_answer = Column(Text, nullable=True)
     used_mcp = Column(String, nullable=True)
     mcp_results = Column(JSON, default=[])
+    tagged_at = Column(DateTime(timezone=True), nullable=True, index=True)  # when the LLM tagged it; NULL = still to tag
+    tag_attempts = Column(Integer, nullable=True)  # batched prompts whose answer left this question out
+
+    # Per-user history pages and windowed chart queries scan these in timestamp order
+    __table_args__ = (Index("ix_questions_username_timestamp", "username", "timestamp"),)
+
+class QuestionTag(Base):
+    """One row per (question, tag), so tag analytics are indexed SQL instead of JSON scans."""
+    __tablename__ = "question_tags"
+
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=1)  # occurrences in the question's tag list
+
+    __table_args__ = (Index("ix_question_tags_tag_question", "tag", "question_id"),)
+
+class QuestionRollup(Base):
+    """Hourly question aggregate for one dimension value (see app.core.rollups)."""
+    __tablename__ = "question_rollups"
+
+    id = Column(Integer, primary_key=True)
+    hour = Column(DateTime(timezone=True), nullable=False)  # start of the hour
+    dimension = Column(String(16), nullable=False)  # questions, user, tag, mcp, agent, ...
+    value = Column(String, nullable=False, default="")  # "" for whole-hour totals
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("hour", "dimension", "value", name="uq_question_rollups_key"),
+        Index("ix_question_rollups_dimension_hour", "dimension", "hour"),
+    )
+
+class AnalyticsMeta(Base):
+    """Key/value state of derived analytics tables (e.g. which rollup version is built)."""
+    __tablename__ = "analytics_meta"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
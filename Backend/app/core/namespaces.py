@@ -0,0 +1,106 @@
+"""Document namespaces: team, environment and doc type tags.
+
+Docs are tagged on upload, and the tags are copied into the vector metadata,
+so one filter dict (e.g. `{"team": "payments", "environment": "prod"}`) can
+be pushed down both as a vector `where` clause and as SQL conditions in
+keyword search. Search latency is tracked per filter combination in process
+memory. `stats()` combines it with per-namespace document counts and sizes
+from the database.
+"""
+from collections import deque
+from typing import List, Dict, Any, Optional
+import threading
+
+from sqlalchemy import func
+
+from app.core.database import SessionLocal
+from app.core.logging import get_logger
+from app.core.models import Doc
+
+logger = get_logger(__name__)
+
+FIELDS = ("team", "environment", "doc_type")
+
+_LATENCY_WINDOW = 500  # most recent searches kept per namespace
+_latency_lock = threading.Lock()
+_latencies: Dict[str, deque] = {}
+_query_counts: Dict[str, int] = {}
+
+
+def normalize(filters: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Keep known, non-empty namespace fields."""
+    if not filters:
+        return {}
+    unknown = set(filters) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown namespace fields: {', '.join(sorted(unknown))}")
+    return {k: str(filters[k]).strip() for k in FIELDS if filters.get(k) is not None and str(filters[k]).strip()}
+
+
+def vector_metadata(doc_id: int, title: Optional[str], tags: Dict[str, str]) -> Dict[str, Any]:
+    """Metadata stored with a doc's vector; unset tags are omitted (Chroma rejects None values)."""
+    return {"id": doc_id, "title": title, **normalize(tags)}
+
+
+def doc_tags(doc) -> Dict[str, str]:
+    """Namespace tags of a `Doc` row (or any object with the tag attributes)."""
+    return normalize({f: getattr(doc, f, None) for f in FIELDS})
+
+
+def to_where(filters: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Vector metadata filter for `filters` (Chroma needs `$and` for more than one field)."""
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return dict(filters)
+    return {"$and": [{k: v} for k, v in filters.items()]}
+
+
+def key(filters: Dict[str, str]) -> str:
+    return ",".join(f"{k}={filters[k]}" for k in FIELDS if k in filters) or "*"
+
+
+def record_latency(filters: Dict[str, str], ms: float) -> None:
+    k = key(filters)
+    with _latency_lock:
+        window = _latencies.get(k)
+        if window is None:
+            window = _latencies[k] = deque(maxlen=_LATENCY_WINDOW)
+        window.append(ms)
+        _query_counts[k] = _query_counts.get(k, 0) + 1
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return round(ordered[idx], 2)
+
+
+def latency_stats() -> Dict[str, Dict[str, Any]]:
+    """Search latency per filter combination ("*" is unfiltered) since process start."""
+    with _latency_lock:
+        snapshot = {k: sorted(v) for k, v in _latencies.items()}
+        counts = dict(_query_counts)
+    return {
+        k: {"queries": counts[k], "p50_ms": _percentile(v, 50), "p95_ms": _percentile(v, 95), "max_ms": round(v[-1], 2)}
+        for k, v in snapshot.items() if v
+    }
+
+
+def stats() -> Dict[str, Any]:
+    """Document count and content size per (team, environment, doc_type), plus search latency per filter."""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Doc.team, Doc.environment, Doc.doc_type,
+            func.count(Doc.id).label("documents"),
+            func.coalesce(func.sum(func.length(Doc.content)), 0).label("content_chars"),
+        ).group_by(Doc.team, Doc.environment, Doc.doc_type).all()
+    finally:
+        db.close()
+    namespaces = [
+        {**{f: getattr(r, f) for f in FIELDS}, "documents": r.documents, "content_chars": int(r.content_chars or 0)}
+        for r in rows
+    ]
+    namespaces.sort(key=lambda n: n["documents"], reverse=True)
+    # Latency is keyed by the filter as searched, which may cover several namespaces
+    return {"namespaces": namespaces, "search_latency": latency_stats()}
@@ -0,0 +1,168 @@
+"""Normalized question tags for tag analytics.
+
+`Question.tags` stays the JSON list returned by the API. Each tag is also
+stored as a `question_tags` row (question_id, tag, occurrences), written in
+the same transaction as the question by `record_question`. Tag frequency,
+top-N and co-occurrence then become GROUP BY queries and a self-join on the
+(tag, question_id) index, instead of rescanning every question per tag.
+
+Rows for questions recorded before this table existed come from
+`backfill()`. The chart endpoints use the table once the backfill has run,
+which is recorded in `analytics_meta`. `init()` marks a fresh database with
+no questions as backfilled. Command line (from the Backend directory):
+
+    python -m app.core.question_tags backfill
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import time
+
+from sqlalchemy import and_, exists, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from app.core.database import SessionLocal
+from app.core.logging import get_logger
+from app.core.models import AnalyticsMeta, Question, QuestionTag
+
+logger = get_logger(__name__)
+
+_META_KEY = "question_tags_backfilled"
+_RECHECK_SECONDS = 60.0
+_ready = False
+_checked_at = 0.0
+
+
+def tag_rows(question_id: int, tags: Any) -> List[QuestionTag]:
+    """`question_tags` rows for one question's JSON tag list."""
+    counts: Dict[str, int] = {}
+    for tag in (tags if isinstance(tags, list) else []):
+        if tag is not None and str(tag).strip():
+            counts[str(tag)] = counts.get(str(tag), 0) + 1
+    return [QuestionTag(question_id=question_id, tag=t, count=n) for t, n in counts.items()]
+
+
+def index_question(db: Session, question_id: int, tags: Any) -> None:
+    """Store a new question's tags; the caller commits."""
+    db.add_all(tag_rows(question_id, tags))
+
+
+def _mark_ready(db: Session) -> None:
+    if db.get(AnalyticsMeta, _META_KEY) is None:
+        db.add(AnalyticsMeta(key=_META_KEY, value="1"))
+
+
+def init() -> None:
+    """Mark the table complete on a database with no questions yet (idempotent)."""
+    db = SessionLocal()
+    try:
+        if db.get(AnalyticsMeta, _META_KEY) is None and db.query(Question.id).first() is None:
+            _mark_ready(db)
+            db.commit()
+    except IntegrityError:
+        db.rollback()  # another worker marked it first
+    except Exception as e:
+        db.rollback()
+        logger.warning("Question tags: init failed: %s", e)
+    finally:
+        db.close()
+
+
+def is_ready() -> bool:
+    """True once every recorded question's tags are in `question_tags`."""
+    global _ready, _checked_at
+    if _ready or time.monotonic() - _checked_at < _RECHECK_SECONDS:
+        return _ready
+    _checked_at = time.monotonic()
+    db = SessionLocal()
+    try:
+        _ready = db.get(AnalyticsMeta, _META_KEY) is not None
+        return _ready
+    finally:
+        db.close()
+
+
+def backfill(batch_size: int = 1000) -> Dict[str, Any]:
+    """Index tags of questions that have no `question_tags` rows yet, then mark the table complete."""
+    global _ready
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        scanned = indexed = 0
+        last_id = 0
+        missing = ~exists().where(QuestionTag.question_id == Question.id)
+        while True:
+            batch = (
+                db.query(Question.id, Question.tags)
+                .filter(Question.id > last_id, missing)
+                .order_by(Question.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for q in batch:
+                rows = tag_rows(q.id, q.tags)
+                db.add_all(rows)
+                indexed += bool(rows)
+            scanned += len(batch)
+            last_id = batch[-1].id
+            db.commit()
+        _mark_ready(db)
+        db.commit()
+        _ready = True
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    logger.info("Question tags: indexed %d of %d scanned questions in %.1fs", indexed, scanned, elapsed)
+    return {"scanned": scanned, "indexed": indexed, "elapsed_s": round(elapsed, 2)}
+
+
+def frequencies(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Per tag: questions carrying it and total occurrences, most frequent first."""
+    db = SessionLocal()
+    try:
+        questions = func.count(QuestionTag.question_id)
+        query = (
+            db.query(QuestionTag.tag, questions.label("questions"), func.sum(QuestionTag.count).label("occurrences"))
+            .group_by(QuestionTag.tag)
+            .order_by(questions.desc(), QuestionTag.tag)
+        )
+        if limit:
+            query = query.limit(limit)
+        return [{"tag": r.tag, "questions": r.questions, "occurrences": int(r.occurrences or 0)} for r in query]
+    finally:
+        db.close()
+
+
+def co_occurrence(tags: Sequence[str]) -> Dict[Tuple[str, str], int]:
+    """Questions carrying both tags, for every pair of `tags` that occurs together (keys sorted)."""
+    if len(tags) < 2:
+        return {}
+    a, b = aliased(QuestionTag), aliased(QuestionTag)
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(a.tag, b.tag, func.count())
+            .join(b, and_(a.question_id == b.question_id, a.tag < b.tag))
+            .filter(a.tag.in_(list(tags)), b.tag.in_(list(tags)))
+            .group_by(a.tag, b.tag)
+            .all()
+        )
+    finally:
+        db.close()
+    return {(t1, t2): n for t1, t2, n in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the normalized question_tags table.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    from app.core import analytics  # imports this module
+    analytics.init_schema()
+    print(backfill(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
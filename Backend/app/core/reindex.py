@@ -0,0 +1,311 @@
+"""Rebuild and consistency checks for the vector index against the `docs` table.
+
+`add_doc` writes to the database first and to the vector store best-effort,
+so the two can drift. Each doc records the hash of the vector entry it was
+last indexed with (`Doc.indexed_hash`, written only after a successful
+upsert), derived from its `content_hash` and namespace tags. This module
+provides:
+
+- `diff()`: list docs missing from the index, docs whose vector entry is
+  stale (its `indexed_hash` does not match the doc's current hashes, or is
+  unknown), and index entries whose doc no longer exists (orphaned). It
+  reads only ids, hashes and tags, never the doc text.
+- `repair()`: index the missing and stale docs and drop the orphaned entries.
+- `rebuild()`: stream every doc with a server-side cursor, embed in large
+  batches on a worker pool, upsert into a fresh shadow collection and swap
+  it in atomically once complete; `indexed_hash` is updated after the
+  swap. Progress (docs/sec) is logged and exposed through `get_status()`.
+- `gc()`: drop collections replaced by a rebuild, once the swap is
+  `VECTOR_INDEX_GC_GRACE_SECONDS` old (other workers may still be querying
+  the old collection until they re-read the pointer file).
+
+Command line (from the Backend directory):
+
+    python -m app.core.reindex diff
+    python -m app.core.reindex repair
+    python -m app.core.reindex rebuild --batch-size 256 --workers 2
+    python -m app.core.reindex gc
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import argparse
+import threading
+import time
+
+from sqlalchemy import bindparam, func, update
+
+from app.core import namespaces, vector_store
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logging import get_logger
+from app.core.models import Doc
+
+logger = get_logger(__name__)
+
+_status_lock = threading.Lock()
+_status: Dict[str, Any] = {"state": "idle"}
+
+
+def get_status() -> Dict[str, Any]:
+    with _status_lock:
+        return dict(_status)
+
+
+def _set_status(**fields) -> None:
+    with _status_lock:
+        _status.update(fields)
+
+
+def _stream_docs(batch_size: int, ids: Optional[List[int]] = None) -> Iterator[List[Tuple[int, str, str, Dict[str, str]]]]:
+    """Yield batches of (id, title, content, namespace tags) using a server-side cursor."""
+    db = SessionLocal()
+    try:
+        query = db.query(Doc.id, Doc.title, Doc.content, Doc.team, Doc.environment, Doc.doc_type).order_by(Doc.id)
+        if ids is not None:
+            query = query.filter(Doc.id.in_(ids))
+        batch = []
+        for row in query.execution_options(stream_results=True, yield_per=batch_size):
+            batch.append((row.id, row.title, row.content, namespaces.doc_tags(row)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        db.close()
+
+
+def _index_batch(collection, batch: List[Tuple[int, str, str, Dict[str, str]]]) -> List[Tuple[int, str, str]]:
+    """Upsert a batch and return (doc id, content hash, entry hash) for each doc written."""
+    # Same document text and metadata as auth.add_doc / vector_store.add_document
+    texts = [vector_store.document_text(title, content) for _, title, content, _ in batch]
+    metadatas = [namespaces.vector_metadata(doc_id, title, tags) for doc_id, title, _, tags in batch]
+    embeddings = vector_store.embed(texts)
+    collection.upsert(
+        ids=[str(doc_id) for doc_id, _, _, _ in batch],
+        documents=texts,
+        metadatas=metadatas,
+        embeddings=embeddings,
+    )
+    written = []
+    for doc_id, title, content, tags in batch:
+        content_hash = vector_store.content_hash(title, content)
+        written.append((doc_id, content_hash, vector_store.entry_hash(content_hash, tags)))
+    return written
+
+
+def _mark_indexed(entries: List[Tuple[int, str, str]]) -> None:
+    """Store the entry hash each doc was indexed with (and its content hash, if it had none yet)."""
+    if not entries:
+        return
+    docs = Doc.__table__
+    stmt = (
+        update(docs)
+        .where(docs.c.id == bindparam("doc_id"))
+        .values(
+            indexed_hash=bindparam("entry"),
+            # docs stored before content_hash existed get it here, so diff can check them
+            content_hash=func.coalesce(docs.c.content_hash, bindparam("content_hash")),
+        )
+    )
+    db = SessionLocal()
+    try:
+        db.execute(stmt, [{"doc_id": d, "content_hash": c, "entry": e} for d, c, e in entries])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _index_docs(collection, batch_size: int, workers: int, ids: Optional[List[int]] = None, total: int = 0,
+                mark: bool = True) -> List[Tuple[int, str, str]]:
+    """Embed and upsert docs into `collection`, keeping at most 2 batches per worker in flight.
+
+    With `mark`, each batch's `indexed_hash` is stored as soon as it is written
+    and nothing is returned; otherwise the (id, entry hash) pairs are returned
+    (with content hashes) for the caller to store, e.g. after swapping in a
+    shadow collection.
+    """
+    start = time.perf_counter()
+    processed = 0
+    written: List[Tuple[int, str, str]] = []
+    in_flight = deque()
+
+    def _drain(limit: int) -> None:
+        nonlocal processed
+        while len(in_flight) > limit:
+            entries = in_flight.popleft().result()
+            if mark:
+                _mark_indexed(entries)
+            else:
+                written.extend(entries)
+            processed += len(entries)
+            elapsed = time.perf_counter() - start
+            rate = processed / elapsed if elapsed > 0 else 0.0
+            _set_status(processed=processed, docs_per_sec=round(rate, 1))
+            logger.info("Reindex: %d/%d docs (%.1f docs/sec)", processed, total, rate)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _stream_docs(batch_size, ids):
+            in_flight.append(pool.submit(_index_batch, collection, batch))
+            _drain(workers * 2)
+        _drain(0)
+    return written
+
+
+def diff() -> Dict[str, Any]:
+    """Compare docs in the database with the live vector collection: missing, stale and orphaned ids."""
+    if not vector_store.is_ready():
+        raise RuntimeError("Vector store not initialized")
+    db_ids = set()
+    current = set()  # docs whose indexed_hash matches their content hash and tags
+    db = SessionLocal()
+    try:
+        query = db.query(Doc.id, Doc.content_hash, Doc.indexed_hash, Doc.team, Doc.environment, Doc.doc_type)
+        for row in query.execution_options(stream_results=True, yield_per=1000):
+            db_ids.add(str(row.id))
+            if row.content_hash and row.indexed_hash == vector_store.entry_hash(row.content_hash, namespaces.doc_tags(row)):
+                current.add(str(row.id))
+    finally:
+        db.close()
+    index_ids = set(vector_store.list_ids())
+
+    def _sort_key(i: str):
+        return (0, int(i), "") if i.isdigit() else (1, 0, i)
+
+    missing = sorted(db_ids - index_ids, key=_sort_key)
+    stale = sorted((db_ids & index_ids) - current, key=_sort_key)
+    orphaned = sorted(index_ids - db_ids, key=_sort_key)
+    return {
+        "collection": vector_store.active_collection_name(),
+        "db_count": len(db_ids),
+        "index_count": len(index_ids),
+        "missing": missing,
+        "stale": stale,
+        "orphaned": orphaned,
+        "in_sync": not missing and not stale and not orphaned,
+    }
+
+
+def repair(batch_size: int = 256, workers: int = 2) -> Dict[str, Any]:
+    """Index docs missing from (or stale in) the live collection and delete orphaned entries."""
+    report = diff()
+    ids = [int(i) for i in report["missing"] + report["stale"] if i.isdigit()]
+    if ids:
+        collection = vector_store.open_collection(report["collection"])
+        _index_docs(collection, batch_size, workers, ids=ids, total=len(ids))
+    if report["orphaned"]:
+        vector_store.delete_ids(report["orphaned"])
+    logger.info("Reindex: repaired %d missing, %d stale and %d orphaned ids",
+                len(report["missing"]), len(report["stale"]), len(report["orphaned"]))
+    return {"indexed": len(ids), "deleted": len(report["orphaned"])}
+
+
+def gc(grace_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """Drop inactive vector collections (never the shadow of a rebuild running in this process)."""
+    grace = settings.VECTOR_INDEX_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    status = get_status()
+    keep = [status["collection"]] if status.get("state") == "running" and status.get("collection") else []
+    return vector_store.drop_inactive(grace, keep=keep)
+
+
+def _claim() -> None:
+    """Mark a rebuild as running, refusing to start a second one."""
+    if not vector_store.is_ready():
+        raise RuntimeError("Vector store not initialized")
+    with _status_lock:
+        if _status.get("state") == "running":
+            raise RuntimeError("A rebuild is already running")
+        _status.clear()
+        _status.update(state="running", processed=0, docs_per_sec=0.0,
+                       started_at=datetime.now(timezone.utc).isoformat())
+
+
+def _run_rebuild(batch_size: int, workers: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        db = SessionLocal()
+        try:
+            total = db.query(func.count(Doc.id)).scalar() or 0
+        finally:
+            db.close()
+        shadow_name = f"{vector_store.DEFAULT_COLLECTION}_{int(time.time())}"
+        _set_status(total=total, collection=shadow_name)
+        logger.info("Reindex: rebuilding %d docs into shadow collection %s", total, shadow_name)
+
+        shadow = vector_store.open_collection(shadow_name)
+        written = _index_docs(shadow, batch_size, workers, total=total, mark=False)
+        vector_store.swap_collection(shadow_name)
+        _mark_indexed(written)
+        processed = len(written)
+
+        # Docs added to the old collection while the rebuild was running
+        caught_up = repair(batch_size, workers)["indexed"]
+
+        elapsed = time.perf_counter() - start
+        result = {
+            "state": "complete",
+            "collection": shadow_name,
+            "processed": processed + caught_up,
+            "total": total,
+            "elapsed_s": round(elapsed, 2),
+            "docs_per_sec": round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _set_status(**result)
+        logger.info("Reindex: rebuilt %d docs in %.1fs (%.1f docs/sec)", result["processed"], elapsed, result["docs_per_sec"])
+        return get_status()
+    except Exception as e:
+        _set_status(state="failed", error=str(e), finished_at=datetime.now(timezone.utc).isoformat())
+        logger.error("Reindex: rebuild failed: %s", e)
+        raise
+
+
+def rebuild(batch_size: int = 256, workers: int = 2) -> Dict[str, Any]:
+    """Re-embed every doc into a shadow collection and swap it in when complete."""
+    _claim()
+    return _run_rebuild(batch_size, workers)
+
+
+def start_rebuild(batch_size: int = 256, workers: int = 2) -> Dict[str, Any]:
+    """Run `rebuild` on a background thread and return the initial status."""
+    _claim()
+
+    def _run():
+        try:
+            _run_rebuild(batch_size, workers)
+        except Exception:
+            pass  # recorded in status
+
+    threading.Thread(target=_run, name="reindex", daemon=True).start()
+    return get_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or rebuild the vector index against the docs table.")
+    parser.add_argument("command", choices=["diff", "repair", "rebuild", "gc"])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--grace-seconds", type=float, default=None, help="gc: minimum age of the last swap")
+    args = parser.parse_args()
+
+    if not vector_store.wait_until_ready():
+        raise SystemExit(f"Vector store unavailable: {vector_store.status().get('error')}")
+
+    if args.command == "diff":
+        report = diff()
+        print(f"collection={report['collection']} db={report['db_count']} index={report['index_count']}")
+        print(f"missing ({len(report['missing'])}): {' '.join(report['missing'])}")
+        print(f"stale ({len(report['stale'])}): {' '.join(report['stale'])}")
+        print(f"orphaned ({len(report['orphaned'])}): {' '.join(report['orphaned'])}")
+    elif args.command == "repair":
+        print(repair(args.batch_size, args.workers))
+    elif args.command == "gc":
+        print(gc(args.grace_seconds))
+    else:
+        print(rebuild(args.batch_size, args.workers))
+
+
+if __name__ == "__main__":
+    main()
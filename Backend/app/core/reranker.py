@@ -0,0 +1,143 @@
+"""Optional cross-encoder reranking of retrieved passages.
+
+Scores (query, passage) pairs with a small local cross-encoder
+(`cross-encoder/ms-marco-MiniLM-L-6-v2` by default) on CPU so the retriever
+can pull a wide candidate set from the vector store and keep only the best
+few for the Synthesizer prompt.
+
+Inference runs in batches against a latency budget: once the budget is
+spent, the remaining candidates are left unscored and keep their original
+retrieval order behind the scored ones. Scores are cached per
+(query, passage) so repeated and follow-up questions skip the model.
+
+If sentence-transformers is unavailable the reranker stays disabled and
+`rerank` simply truncates the candidate list.
+"""
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import threading
+import time
+
+from app.core import instrumentation
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_ready = False
+_init_attempted = False
+_model = None
+_init_lock = threading.Lock()
+
+_cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _init():
+    global _ready, _init_attempted, _model
+    with _init_lock:
+        if _init_attempted:
+            return
+        _init_attempted = True
+        try:
+            from sentence_transformers import CrossEncoder
+
+            _model = CrossEncoder(settings.RERANK_MODEL, max_length=256, device="cpu")
+            _ready = True
+            logger.info("Reranker initialized (%s)", settings.RERANK_MODEL)
+        except Exception as e:
+            _ready = False
+            logger.warning("Reranker unavailable: %s", e)
+
+
+def is_ready() -> bool:
+    if not _ready and not _init_attempted:
+        # load once on first use; a failed load is not retried per call
+        _init()
+    return _ready
+
+
+def _passage_text(candidate: Dict[str, Any]) -> str:
+    title = candidate.get("title") or ""
+    content = candidate.get("content") or candidate.get("document") or ""
+    return f"{title}\n{content}" if title else content
+
+
+def _cache_key(query: str, passage: str) -> Tuple[str, str]:
+    return query, hashlib.sha1(passage.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: Tuple[str, str]) -> Optional[float]:
+    with _cache_lock:
+        score = _cache.get(key)
+        if score is not None:
+            _cache.move_to_end(key)
+        return score
+
+
+def _cache_put(key: Tuple[str, str], score: float) -> None:
+    with _cache_lock:
+        _cache[key] = score
+        _cache.move_to_end(key)
+        while len(_cache) > settings.RERANK_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def rerank(
+    query: str,
+    candidates: List[Dict[str, Any]],
+    top_k: int = 3,
+    budget_ms: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Return the best `top_k` candidates ordered by cross-encoder score.
+
+    Each returned candidate is a copy with `rerank_score` set when it was scored.
+    """
+    if not candidates or not is_ready():
+        return candidates[:top_k]
+
+    budget_ms = settings.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+    batch_size = batch_size or settings.RERANK_BATCH_SIZE
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000.0
+
+    passages = [_passage_text(c) for c in candidates]
+    keys = [_cache_key(query, p) for p in passages]
+    scores: List[Optional[float]] = [_cache_get(k) for k in keys]
+    cache_hits = sum(1 for s in scores if s is not None)
+    instrumentation.add_cache_hits(cache_hits)
+
+    # Score uncached candidates in retrieval order so a cutoff drops the least likely ones
+    pending = [i for i, s in enumerate(scores) if s is None]
+    cut_off = False
+    for b in range(0, len(pending), batch_size):
+        if time.perf_counter() >= deadline:
+            cut_off = True
+            break
+        batch = pending[b:b + batch_size]
+        try:
+            preds = _model.predict([(query, passages[i]) for i in batch], batch_size=len(batch), show_progress_bar=False)
+        except Exception as e:
+            logger.warning("Reranker: scoring failed, keeping retrieval order for the rest: %s", e)
+            break
+        for i, score in zip(batch, preds):
+            scores[i] = float(score)
+            _cache_put(keys[i], scores[i])
+
+    scored = sorted((i for i, s in enumerate(scores) if s is not None), key=lambda i: scores[i], reverse=True)
+    unscored = [i for i, s in enumerate(scores) if s is None]
+
+    out = []
+    for i in (scored + unscored)[:top_k]:
+        entry = dict(candidates[i])
+        if scores[i] is not None:
+            entry["rerank_score"] = scores[i]
+        out.append(entry)
+
+    logger.info(
+        "Reranker: scored %d/%d candidates (cache hits=%d, cut_off=%s) in %.1fms",
+        len(scored), len(candidates), cache_hits, cut_off, (time.perf_counter() - start) * 1000,
+    )
+    return out
@@ -0,0 +1,155 @@
+"""Stale-while-revalidate cache for expensive computed analytics results.
+
+LLM insights and predictions take seconds to compute and change slowly, so
+each is registered here with its compute function. `get()` returns the last
+result immediately, stamped with `analyzed_at`, and recomputes it on a
+background thread when it is stale:
+
+- older than `RESULT_CACHE_TTL_SECONDS`, or
+- `RESULT_CACHE_CHANGE_THRESHOLD` questions were recorded since it was
+  computed (measured with `analytics.data_version()`, an indexed max(id)).
+
+Only the very first request for a result waits for it. A scheduler thread,
+started with the first `get()`, also refreshes stale results that have been
+read since their last refresh, so the next dashboard load is already fresh.
+A failed refresh keeps serving the previous result (or the registered
+fallback) and is retried after `RESULT_CACHE_RETRY_SECONDS`.
+
+The cache lives in process memory: each API worker keeps its own copy.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+import threading
+import time
+
+from app.core import analytics
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_registry_lock = threading.Lock()
+_entries: Dict[str, "_Entry"] = {}
+_scheduler_started = False
+
+
+class _Entry:
+    def __init__(self, name: str, compute: Callable[[], Dict[str, Any]], fallback: Dict[str, Any]):
+        self.name = name
+        self.compute = compute
+        self.fallback = fallback
+        self.value: Optional[Dict[str, Any]] = None
+        self.computed_at: Optional[datetime] = None
+        self.version = 0  # data_version() when the last refresh started
+        self.checked_at = 0.0  # monotonic time of the last refresh attempt
+        self.failed = False
+        self.read_at = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock()  # held while computing
+
+
+def register(name: str, compute: Callable[[], Dict[str, Any]], fallback: Dict[str, Any]) -> None:
+    """Register `compute` under `name`; `fallback` is served if it has never succeeded."""
+    with _registry_lock:
+        _entries[name] = _Entry(name, compute, fallback)
+
+
+def _is_stale(entry: _Entry, version: int) -> bool:
+    age = time.monotonic() - entry.checked_at
+    if entry.failed:
+        return age >= settings.RESULT_CACHE_RETRY_SECONDS
+    if age >= settings.RESULT_CACHE_TTL_SECONDS:
+        return True
+    # any data at all invalidates a result computed on an empty table
+    return version - entry.version >= settings.RESULT_CACHE_CHANGE_THRESHOLD or (entry.version == 0 < version)
+
+
+def _refresh(entry: _Entry, version: int) -> None:
+    """Recompute `entry`; the caller holds `entry.lock`."""
+    start = time.perf_counter()
+    entry.checked_at = time.monotonic()
+    entry.version = version
+    try:
+        value = entry.compute()
+    except Exception as e:
+        entry.failed = True
+        logger.warning("Result cache: refreshing %s failed: %s", entry.name, e)
+        return
+    entry.value = value
+    entry.computed_at = datetime.now(timezone.utc)
+    entry.failed = False
+    logger.info("Result cache: refreshed %s in %.2fs", entry.name, time.perf_counter() - start)
+
+
+def _refresh_in_background(entry: _Entry, version: int) -> None:
+    if not entry.lock.acquire(blocking=False):
+        return  # already refreshing
+
+    def _run():
+        try:
+            _refresh(entry, version)
+        finally:
+            entry.refreshing = False
+            entry.lock.release()
+
+    entry.refreshing = True
+    threading.Thread(target=_run, name=f"result-cache-{entry.name}", daemon=True).start()
+
+
+def _schedule_loop() -> None:
+    interval = max(1.0, min(settings.RESULT_CACHE_TTL_SECONDS, settings.RESULT_CACHE_RETRY_SECONDS))
+    while True:
+        time.sleep(interval)
+        try:
+            version = analytics.data_version()
+            for entry in list(_entries.values()):
+                if entry.value is not None and entry.read_at > entry.checked_at and _is_stale(entry, version):
+                    _refresh_in_background(entry, version)
+        except Exception as e:
+            logger.warning("Result cache: scheduled refresh failed: %s", e)
+
+
+def _start_scheduler() -> None:
+    global _scheduler_started
+    with _registry_lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+    threading.Thread(target=_schedule_loop, name="result-cache-scheduler", daemon=True).start()
+
+
+def get(name: str, refresh: bool = False) -> Dict[str, Any]:
+    """The cached result for `name` with `analyzed_at` and `refreshing`, refreshed in the background if stale.
+
+    `refresh` forces a background refresh. Raises KeyError for an unregistered name.
+    """
+    entry = _entries[name]
+    _start_scheduler()
+    entry.read_at = time.monotonic()
+    version = analytics.data_version()
+
+    if entry.value is None and not entry.failed:
+        with entry.lock:
+            if entry.value is None and not entry.failed:  # another request may have computed it meanwhile
+                _refresh(entry, version)
+    elif refresh or _is_stale(entry, version):
+        _refresh_in_background(entry, version)
+
+    if entry.value is None:
+        return {**entry.fallback, "analyzed_at": None, "refreshing": entry.refreshing}
+    return {**entry.value, "analyzed_at": entry.computed_at.isoformat(), "refreshing": entry.refreshing}
+
+
+def status() -> Dict[str, Any]:
+    """Age and state of every registered result."""
+    now = time.monotonic()
+    return {
+        name: {
+            "analyzed_at": e.computed_at.isoformat() if e.computed_at else None,
+            "seconds_since_check": round(now - e.checked_at, 1) if e.checked_at else None,
+            "data_version": e.version,
+            "refreshing": e.refreshing,
+            "failed": e.failed,
+        }
+        for name, e in list(_entries.items())
+    }
@@ -0,0 +1,278 @@
+"""Hourly analytics rollups, maintained incrementally as questions are recorded.
+
+`question_rollups` holds one row per (hour, dimension, value) with a count:
+
+- `questions`: questions asked in the hour (value "")
+- `user`, `mcp`, `tag`, `agent`: questions per user / MCP used / tag, and agent steps per agent
+- `user_mcp`, `user_tags`: per user, questions that used an MCP and tags attached
+- `answered`, `answer_chars`: questions with an answer, and total answer length
+
+`record_question` adds a question's counts in the same transaction as the
+question itself, so chart endpoints can read a few rows per hour instead of
+scanning raw questions. Day-of-week/hour heatmaps come straight from the
+hourly `questions` rows.
+
+Rollups are used once `rebuild()` has populated them from the existing
+questions. The built `ROLLUP_VERSION` is stored in `analytics_meta`. Until
+then, or after a version bump, analytics aggregate the raw questions in SQL.
+`init()` marks a fresh database with no questions as built. Command line (from the
+Backend directory):
+
+    python -m app.core.rollups rebuild
+    python -m app.core.rollups status
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import time
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logging import get_logger
+from app.core.models import AnalyticsMeta, Question, QuestionRollup
+
+logger = get_logger(__name__)
+
+# Bump when dimensions or their meaning change; readers fall back to raw SQL until a rebuild
+ROLLUP_VERSION = 1
+_META_KEY = "rollup_version"
+
+QUESTIONS = "questions"
+USER = "user"
+TAG = "tag"
+MCP = "mcp"
+AGENT = "agent"
+USER_MCP = "user_mcp"
+USER_TAGS = "user_tags"
+ANSWERED = "answered"
+ANSWER_CHARS = "answer_chars"
+
+_RECHECK_SECONDS = 60.0  # how often a worker re-reads the built flag (another worker may invalidate it)
+_built = False
+_checked_at = 0.0
+
+
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def deltas(username: Optional[str], tags: Any, used_mcp: Optional[str], agent_steps: Any,
+           final_answer: Optional[str]) -> Dict[Tuple[str, str], int]:
+    """Rollup increments for one question, keyed by (dimension, value)."""
+    user = username or "unknown"
+    out: Dict[Tuple[str, str], int] = {(QUESTIONS, ""): 1, (USER, user): 1}
+    if used_mcp:
+        out[(MCP, used_mcp)] = 1
+        out[(USER_MCP, user)] = 1
+    out.update(tag_deltas(username, tags))
+    for step in (agent_steps if isinstance(agent_steps, list) else []):
+        agent = (step.get("agent") if isinstance(step, dict) else None) or "unknown"
+        out[(AGENT, agent)] = out.get((AGENT, agent), 0) + 1
+    if final_answer:
+        out[(ANSWERED, "")] = 1
+        out[(ANSWER_CHARS, "")] = len(final_answer)
+    return out
+
+
+def tag_deltas(username: Optional[str], tags: Any) -> Dict[Tuple[str, str], int]:
+    """Rollup increments for the tags of one question (also used when tags are added later)."""
+    tags = tags if isinstance(tags, list) else []
+    out: Dict[Tuple[str, str], int] = {}
+    for tag in tags:
+        out[(TAG, str(tag))] = out.get((TAG, str(tag)), 0) + 1
+    if tags:
+        out[(USER_TAGS, username or "unknown")] = len(tags)
+    return out
+
+
+def apply(db: Session, timestamp: datetime, increments: Dict[Tuple[str, str], int]) -> None:
+    """Add `increments` to the rollup rows of `timestamp`'s hour; the caller commits."""
+    hour = hour_of(timestamp)
+    rows = [{"hour": hour, "dimension": d, "value": v, "count": n} for (d, v), n in increments.items() if n]
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(QuestionRollup).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["hour", "dimension", "value"],
+            set_={"count": QuestionRollup.count + stmt.excluded["count"]},
+        )
+        db.execute(stmt)
+        return
+
+    for row in rows:
+        updated = db.query(QuestionRollup).filter_by(hour=hour, dimension=row["dimension"], value=row["value"]).update(
+            {QuestionRollup.count: QuestionRollup.count + row["count"]}, synchronize_session=False,
+        )
+        if not updated:
+            db.add(QuestionRollup(**row))
+
+
+def record(db: Session, question: Question) -> None:
+    """Add a newly stored question to the rollups; the caller commits."""
+    apply(db, question.timestamp or datetime.now(timezone.utc), deltas(
+        question.username, question.tags, question.used_mcp, question.agent_steps, question.final_answer,
+    ))
+
+
+def _set_meta(db: Session, key: str, value: Optional[str]) -> None:
+    row = db.get(AnalyticsMeta, key)
+    if row is None:
+        db.add(AnalyticsMeta(key=key, value=value))
+    else:
+        row.value = value
+
+
+def invalidate(db: Session) -> None:
+    """Stop serving rollups (e.g. after a failed increment) until the next rebuild; the caller commits."""
+    global _built, _checked_at
+    _set_meta(db, _META_KEY, None)
+    _built, _checked_at = False, time.monotonic()
+
+
+def init() -> None:
+    """Mark rollups built on a database with no questions yet (nothing to backfill; idempotent)."""
+    db = SessionLocal()
+    try:
+        if db.get(AnalyticsMeta, _META_KEY) is None and db.query(Question.id).first() is None:
+            db.add(AnalyticsMeta(key=_META_KEY, value=str(ROLLUP_VERSION)))
+            db.commit()
+    except IntegrityError:
+        db.rollback()  # another worker marked it first
+    except Exception as e:
+        db.rollback()
+        logger.warning("Rollups: init failed: %s", e)
+    finally:
+        db.close()
+
+
+def is_built() -> bool:
+    """True once rollups for the current `ROLLUP_VERSION` are populated."""
+    global _built, _checked_at
+    if time.monotonic() - _checked_at < _RECHECK_SECONDS:
+        return _built
+    _checked_at = time.monotonic()
+    db = SessionLocal()
+    try:
+        row = db.get(AnalyticsMeta, _META_KEY)
+        _built = row is not None and row.value == str(ROLLUP_VERSION)
+        return _built
+    finally:
+        db.close()
+
+
+def enabled() -> bool:
+    """Whether analytics should read rollups (`ANALYTICS_ENGINE=rollup` and built)."""
+    return settings.ANALYTICS_ENGINE == "rollup" and is_built()
+
+
+def rebuild(batch_size: int = 5000) -> Dict[str, Any]:
+    """Recompute every rollup row from the questions table in one transaction."""
+    global _built, _checked_at
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        db.query(QuestionRollup).delete(synchronize_session=False)
+        counts: Dict[Tuple[datetime, str, str], int] = {}
+        questions = skipped = 0
+        rows = db.query(
+            Question.timestamp, Question.username, Question.tags, Question.used_mcp,
+            Question.agent_steps, Question.final_answer,
+        ).yield_per(batch_size)
+        for q in rows:
+            if q.timestamp is None:
+                skipped += 1
+                continue
+            hour = hour_of(q.timestamp)
+            for (d, v), n in deltas(q.username, q.tags, q.used_mcp, q.agent_steps, q.final_answer).items():
+                counts[(hour, d, v)] = counts.get((hour, d, v), 0) + n
+            questions += 1
+
+        items = [{"hour": h, "dimension": d, "value": v, "count": n} for (h, d, v), n in counts.items()]
+        for i in range(0, len(items), batch_size):
+            db.execute(insert(QuestionRollup), items[i:i + batch_size])
+        _set_meta(db, _META_KEY, str(ROLLUP_VERSION))
+        _set_meta(db, "rollup_rebuilt_at", datetime.now(timezone.utc).isoformat())
+        db.commit()
+        _built, _checked_at = True, time.monotonic()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info("Rollups: rebuilt %d rows from %d questions in %.1fs", len(items), questions, elapsed)
+    return {"questions": questions, "skipped": skipped, "rows": len(items), "elapsed_s": round(elapsed, 2)}
+
+
+def totals(dimensions: Sequence[str]) -> Dict[str, Dict[str, int]]:
+    """All-time count per value for each dimension: `{dimension: {value: count}}`."""
+    db = SessionLocal()
+    try:
+        rows = db.query(QuestionRollup.dimension, QuestionRollup.value, func.sum(QuestionRollup.count)).filter(
+            QuestionRollup.dimension.in_(list(dimensions))
+        ).group_by(QuestionRollup.dimension, QuestionRollup.value).all()
+    finally:
+        db.close()
+    out: Dict[str, Dict[str, int]] = {d: {} for d in dimensions}
+    for d, v, n in rows:
+        out[d][v] = int(n or 0)
+    return out
+
+
+def series(dimension: str, since: Optional[datetime] = None) -> List[Tuple[datetime, str, int]]:
+    """(hour, value, count) rows of one dimension, from the hour containing `since`."""
+    db = SessionLocal()
+    try:
+        query = db.query(QuestionRollup.hour, QuestionRollup.value, QuestionRollup.count).filter(
+            QuestionRollup.dimension == dimension
+        )
+        if since is not None:
+            query = query.filter(QuestionRollup.hour >= hour_of(since))
+        return [(r.hour, r.value, int(r.count)) for r in query]
+    finally:
+        db.close()
+
+
+def status() -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        meta = {r.key: r.value for r in db.query(AnalyticsMeta)}
+        rows = db.query(func.count(QuestionRollup.id)).scalar() or 0
+    finally:
+        db.close()
+    return {
+        "engine": settings.ANALYTICS_ENGINE,
+        "version": ROLLUP_VERSION,
+        "built_version": meta.get(_META_KEY),
+        "in_use": enabled(),
+        "rebuilt_at": meta.get("rollup_rebuilt_at"),
+        "rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the hourly analytics rollup tables.")
+    parser.add_argument("command", choices=["rebuild", "status"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    from app.core import analytics  # imports this module
+    analytics.init_schema()
+    if args.command == "rebuild":
+        print(rebuild(args.batch_size))
+    else:
+        print(status())
+
+
+if __name__ == "__main__":
+    main()
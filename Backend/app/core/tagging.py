@@ -0,0 +1,292 @@
+"""Batched LLM tagging of recorded questions.
+
+With `TAGGING_MODE=batch`, `record_question` stores new questions untagged
+and wakes a background worker. The worker waits `TAGGING_MAX_WAIT_SECONDS`
+for more questions to arrive, then sends up to `TAGGING_BATCH_SIZE` of them
+per prompt. The LLM answers with a JSON object of tags keyed by question id,
+and up to `TAGGING_CONCURRENCY` prompts are in flight at once. With
+`TAGGING_MODE=inline`, questions are tagged one LLM call at a time while
+they are recorded, as before.
+
+A question is untagged while `tagged_at` is NULL and it has no
+`question_tags` rows. That covers questions recorded while the LLM was down
+and historic rows stored with `tags=[]`. The worker retries them every
+`TAGGING_INTERVAL_SECONDS`, and stops a pass at the first failed prompt.
+A question the LLM leaves out of a batch answer (e.g. a truncated reply)
+stays untagged and is retried, up to `TAGGING_MAX_ATTEMPTS` answers.
+Tags are written to `Question.tags`, `question_tags` and the tag rollups in
+one transaction. Each API worker runs its own tagging thread. The
+`tagged_at IS NULL` guard on the update means a question is tagged only
+once, even if two workers prompt for it.
+
+Command line (from the Backend directory):
+
+    python -m app.core.tagging backfill --batch-size 20 --concurrency 2
+    python -m app.core.tagging status
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import re
+import threading
+import time
+
+from sqlalchemy import exists, func, or_
+
+from app.core import question_tags, rollups
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logging import get_logger
+from app.core.models import Question, QuestionTag
+from app.llm.llm import get_llm
+
+logger = get_logger(__name__)
+
+MAX_TAGS = 5
+_MAX_QUESTION_CHARS = 500  # per question in a batched prompt
+
+_wake = threading.Event()
+_worker_lock = threading.Lock()
+_worker_started = False
+_status_lock = threading.Lock()
+_status: Dict[str, Any] = {"state": "idle"}
+
+
+def _set_status(**fields) -> None:
+    with _status_lock:
+        _status.update(fields)
+
+
+def build_prompt(batch: Sequence[Tuple[int, str]]) -> str:
+    """One classification prompt for several (id, question) pairs."""
+    lines = [f"[{qid}] {' '.join((text or '').split())[:_MAX_QUESTION_CHARS]}" for qid, text in batch]
+    return (
+        "You are a classifier. For each DevOps user question below, return up to"
+        f" {MAX_TAGS} short tags describing its topic(s). Answer with only a JSON object"
+        ' mapping each question id to its list of tags, e.g. {"12": ["kubernetes", "networking"]}.'
+        "\n\nQuestions:\n" + "\n".join(lines) + "\n\nJSON:"
+    )
+
+
+def _clean(tags: Any) -> List[str]:
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    if not isinstance(tags, list):
+        return []
+    return [str(t).strip() for t in tags if str(t).strip()][:MAX_TAGS]
+
+
+def parse_tags(content: str, ids: Sequence[int]) -> Dict[int, List[str]]:
+    """Tags per question id from the LLM's answer; ids it did not answer for are left out.
+
+    Expects a JSON object; falls back to "id: tag, tag" lines.
+    """
+    wanted = set(ids)
+    out: Dict[int, List[str]] = {}
+    start, end = content.find("{"), content.rfind("}")
+    if 0 <= start < end:
+        try:
+            data = json.loads(content[start:end + 1])
+            for key, tags in (data.items() if isinstance(data, dict) else []):
+                digits = re.sub(r"\D", "", str(key))
+                if digits and int(digits) in wanted:
+                    out[int(digits)] = _clean(tags)
+            if out:
+                return out
+        except ValueError:
+            pass
+    for line in content.splitlines():
+        m = re.match(r"^\W*(\d+)\W*?[:=\-]\s*(.+)$", line)
+        if m and int(m.group(1)) in wanted:
+            out[int(m.group(1))] = _clean(m.group(2).strip(" []").replace('"', "").split(","))
+    return out
+
+
+def _tag_batch(batch: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, str]], Dict[int, List[str]]]:
+    response = get_llm().invoke(build_prompt(batch))
+    content = response.content if hasattr(response, "content") else str(response)
+    tags = parse_tags(content, [qid for qid, _ in batch])
+    if not tags:
+        # counts as an attempt for every question in the batch, like a partial answer
+        logger.warning("Tagging: no tags could be parsed from the LLM response: %r", content[:200])
+    return batch, tags
+
+
+def _retryable():
+    """Filter for questions not yet left out of `TAGGING_MAX_ATTEMPTS` batch answers."""
+    return or_(Question.tag_attempts.is_(None), Question.tag_attempts < settings.TAGGING_MAX_ATTEMPTS)
+
+
+def _store(batch: List[Tuple[int, str]], tags: Dict[int, List[str]]) -> int:
+    """Write tags for the questions the LLM answered; the ones it left out stay untagged for a later pass."""
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        tagged = 0
+        for qid, _ in batch:
+            if qid not in tags:
+                db.query(Question).filter(Question.id == qid, Question.tagged_at.is_(None)).update(
+                    {Question.tag_attempts: func.coalesce(Question.tag_attempts, 0) + 1}, synchronize_session=False,
+                )
+                continue
+            q_tags = tags[qid]
+            claimed = db.query(Question).filter(Question.id == qid, Question.tagged_at.is_(None)).update(
+                {Question.tags: q_tags, Question.tagged_at: now}, synchronize_session=False,
+            )
+            if not claimed or not q_tags:
+                continue  # tagged meanwhile, or nothing to add
+            question_tags.index_question(db, qid, q_tags)
+            username, timestamp = db.query(Question.username, Question.timestamp).filter(Question.id == qid).one()
+            try:
+                with db.begin_nested():
+                    rollups.apply(db, timestamp or now, rollups.tag_deltas(username, q_tags))
+            except Exception as e:
+                logger.error("Tagging: rollup update failed, invalidating rollups: %s", e)
+                rollups.invalidate(db)
+            tagged += 1
+        db.commit()
+        return tagged
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _pending_batches(batch_size: int, limit: Optional[int]):
+    """Yield batches of untagged (id, question), in id order."""
+    has_tags = exists().where(QuestionTag.question_id == Question.id)
+    last_id, remaining = 0, limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        db = SessionLocal()
+        try:
+            batch = [
+                (r.id, r.question) for r in db.query(Question.id, Question.question)
+                .filter(Question.id > last_id, Question.tagged_at.is_(None), ~has_tags, _retryable())
+                .order_by(Question.id).limit(size)
+            ]
+        finally:
+            db.close()
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        if remaining is not None:
+            remaining -= len(batch)
+        yield batch
+
+
+def pending_count() -> int:
+    db = SessionLocal()
+    try:
+        has_tags = exists().where(QuestionTag.question_id == Question.id)
+        return db.query(func.count(Question.id)).filter(Question.tagged_at.is_(None), ~has_tags, _retryable()).scalar() or 0
+    finally:
+        db.close()
+
+
+def tag_pending(batch_size: Optional[int] = None, concurrency: Optional[int] = None,
+                limit: Optional[int] = None) -> Dict[str, Any]:
+    """Tag untagged questions in batched prompts, at most `concurrency` in flight; stops at the first failure."""
+    batch_size = batch_size or settings.TAGGING_BATCH_SIZE
+    concurrency = max(1, concurrency or settings.TAGGING_CONCURRENCY)
+    if not question_tags.is_ready():
+        question_tags.backfill()  # "untagged" is only meaningful once question_tags is complete
+
+    start = time.perf_counter()
+    scanned = tagged = calls = 0
+    error = None
+    in_flight = deque()
+
+    def _drain(limit_: int) -> None:
+        nonlocal scanned, tagged, calls, error
+        while len(in_flight) > limit_:
+            future = in_flight.popleft()
+            calls += 1
+            try:
+                batch, tags = future.result()
+                tagged += _store(batch, tags)
+                scanned += len(batch)
+            except Exception as e:
+                error = error or str(e)
+
+    _set_status(state="running", started_at=datetime.now(timezone.utc).isoformat())
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in _pending_batches(batch_size, limit):
+            if error:
+                break
+            in_flight.append(pool.submit(_tag_batch, batch))
+            _drain(concurrency - 1)
+        _drain(0)
+
+    elapsed = time.perf_counter() - start
+    result = {
+        "questions": scanned,
+        "tagged": tagged,
+        "llm_calls": calls,
+        "questions_per_call": round(scanned / calls, 1) if calls else 0.0,
+        "error": error,
+        "elapsed_s": round(elapsed, 2),
+    }
+    _set_status(state="failed" if error else "idle", last_run=result,
+                finished_at=datetime.now(timezone.utc).isoformat())
+    if error:
+        logger.warning("Tagging: stopped after %d questions: %s", scanned, error)
+    elif scanned:
+        logger.info("Tagging: tagged %d of %d questions in %d LLM calls (%.1fs)", tagged, scanned, calls, elapsed)
+    return result
+
+
+def _worker_loop() -> None:
+    while True:
+        if _wake.wait(timeout=settings.TAGGING_INTERVAL_SECONDS):
+            time.sleep(settings.TAGGING_MAX_WAIT_SECONDS)  # let more new questions join the batch
+        _wake.clear()
+        try:
+            tag_pending()
+        except Exception as e:
+            logger.warning("Tagging: worker pass failed: %s", e)
+
+
+def start_worker() -> None:
+    """Start the background tagging thread (once per process)."""
+    global _worker_started
+    with _worker_lock:
+        if _worker_started:
+            return
+        _worker_started = True
+    threading.Thread(target=_worker_loop, name="tagging", daemon=True).start()
+
+
+def notify() -> None:
+    """Wake the worker: a question was recorded untagged."""
+    _wake.set()
+
+
+def get_status() -> Dict[str, Any]:
+    with _status_lock:
+        out = dict(_status)
+    out.update(mode=settings.TAGGING_MODE, worker=_worker_started, pending=pending_count())
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tag recorded questions with the LLM in batched prompts.")
+    parser.add_argument("command", choices=["backfill", "status"])
+    parser.add_argument("--batch-size", type=int, default=settings.TAGGING_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=settings.TAGGING_CONCURRENCY)
+    parser.add_argument("--limit", type=int, default=None, help="tag at most this many questions")
+    args = parser.parse_args()
+    from app.core import analytics  # imports this module
+    analytics.init_schema()
+    if args.command == "backfill":
+        print(tag_pending(args.batch_size, args.concurrency, args.limit))
+    else:
+        print(get_status())
+
+
+if __name__ == "__main__":
+    main()
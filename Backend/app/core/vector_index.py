@@ -0,0 +1,691 @@
+"""Vector index backends behind `app.core.vector_store`.
+
+The store talks to its index through the small `VectorIndex` interface
+(upsert / query / delete / ids / count), so the search path is the same
+whichever backend is configured with `VECTOR_INDEX_BACKEND`:
+
+- `chroma`: a Chroma collection in `.chromadb/` (the original behaviour).
+- `flat`: exact NumPy search over float32 vectors in a memory-mapped file.
+- `hnsw`: approximate search with hnswlib over the same files.
+- `native`: flat below `VECTOR_INDEX_HNSW_THRESHOLD` vectors, HNSW above it.
+
+Native indexes live in `.vectorindex/<name>/`. Vectors are appended to a raw
+float32 file that every uvicorn worker maps read-only, so in flat mode the OS
+shares the pages between processes. Records (id, metadata, document offset)
+go to a JSONL file that each process keeps in memory as Python objects;
+document text goes to a separate file that is only
+read for returned hits. Metadata filters are NumPy comparisons over an int32
+code per row for each filtered key, built on the first filter by that key and
+extended as rows are appended. Each write publishes a new `manifest.json` with
+os.replace, and other processes pick the change up on their next call. Writes
+are serialized across processes with a file lock. Overwrites and deletes
+leave tombstones until `compact()` rewrites the files under a new epoch.
+
+HNSW mode is per process: hnswlib cannot search a memory-mapped graph, so
+every worker builds (or loads) its own graph, and hnswlib keeps its own copy
+of every vector next to it. That is roughly N * (4 * dim + 8 * M) bytes of
+private memory per worker (about 170 MB for 100k 384-dim vectors with M=16),
+on top of the records. With several workers and a large corpus, use `flat`
+(shared pages) or fewer workers.
+
+Distances are squared L2 for every backend, like Chroma's default space.
+"""
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+import json
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within a process
+    fcntl = None
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class VectorIndex:
+    """Interface for a named set of (id, embedding, document, metadata) entries."""
+
+    name = ""
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def query(self, embeddings, top_k: int, where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Return, per query embedding, hits as dicts with id, document, metadata and distance."""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def ids(self) -> List[str]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+# --- Chroma -----------------------------------------------------------------
+
+
+class ChromaIndex(VectorIndex):
+    """A Chroma collection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        # Chroma's upsert merges metadata into the old entry; delete first so removed keys go away
+        self._collection.delete(ids=[str(i) for i in ids])
+        self._collection.add(
+            ids=[str(i) for i in ids],
+            embeddings=[list(map(float, e)) for e in embeddings],
+            documents=list(documents),
+            metadatas=[m or {} for m in metadatas],
+        )
+
+    def query(self, embeddings, top_k, where=None):
+        embeddings = [list(map(float, e)) for e in embeddings]
+        if not embeddings:
+            return []
+        # ids are always returned; only the optional fields go in `include`
+        results = self._collection.query(
+            query_embeddings=embeddings,
+            n_results=top_k,
+            where=where or None,
+            include=["metadatas", "documents", "distances"],
+        )
+        out = []
+        for q in range(len(embeddings)):
+            ids = results["ids"][q]
+            docs = (results.get("documents") or [[]] * len(embeddings))[q] or []
+            metas = (results.get("metadatas") or [[]] * len(embeddings))[q] or []
+            dists = (results.get("distances") or [[]] * len(embeddings))[q] or []
+            out.append([
+                {
+                    "id": ids[i],
+                    "document": docs[i] if i < len(docs) else None,
+                    "metadata": (metas[i] if i < len(metas) else None) or {},
+                    "distance": dists[i] if i < len(dists) else None,
+                }
+                for i in range(len(ids))
+            ])
+        return out
+
+    def delete(self, ids) -> None:
+        if ids:
+            self._collection.delete(ids=[str(i) for i in ids])
+
+    def ids(self, page_size: int = 10000) -> List[str]:
+        ids: List[str] = []
+        offset = 0
+        while True:
+            page = self._collection.get(include=[], limit=page_size, offset=offset).get("ids", [])
+            ids.extend(page)
+            if len(page) < page_size:
+                return ids
+            offset += page_size
+
+    def count(self) -> int:
+        return self._collection.count()
+
+
+class ChromaBackend:
+    """Opens Chroma collections from a persistent client."""
+
+    kind = "chroma"
+
+    def __init__(self, root: str):
+        import chromadb
+
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        # Use persistent client (works with latest ChromaDB versions)
+        self._client = chromadb.PersistentClient(path=root)
+
+    def open(self, name: str) -> ChromaIndex:
+        return ChromaIndex(self._client.get_or_create_collection(name=name))
+
+    def drop(self, name: str) -> None:
+        self._client.delete_collection(name)
+
+    def names(self) -> List[str]:
+        # Chroma >= 0.6 returns names, older versions Collection objects
+        return [c if isinstance(c, str) else c.name for c in self._client.list_collections()]
+
+
+# --- Native (NumPy flat / hnswlib) ------------------------------------------
+
+
+class _MetadataColumn:
+    """One metadata key as an int32 code per row, so filters are NumPy comparisons.
+
+    Each distinct value gets a code (missing/None is 0); the array grows by
+    doubling as rows are appended.
+    """
+
+    def __init__(self, np, values):
+        self._np = np
+        self.codes_of: Dict[Any, int] = {None: 0}
+        self._codes = np.zeros(1024, dtype=np.int32)
+        self.size = 0
+        self.extend(values)
+
+    @staticmethod
+    def _key(value):
+        # lists/dicts are not hashable; compare them by their JSON form
+        return json.dumps(value, sort_keys=True) if isinstance(value, (list, dict)) else value
+
+    def extend(self, values) -> None:
+        codes = [self.codes_of.setdefault(self._key(v), len(self.codes_of)) for v in values]
+        end = self.size + len(codes)
+        if end > len(self._codes):
+            grown = self._np.zeros(max(end, 2 * len(self._codes)), dtype=self._np.int32)
+            grown[:self.size] = self._codes[:self.size]
+            self._codes = grown
+        self._codes[self.size:end] = codes
+        self.size = end
+
+    def isin(self, values):
+        """Boolean mask of rows whose value is one of `values`."""
+        codes = [self.codes_of[k] for k in map(self._key, values) if k in self.codes_of]
+        return self._np.isin(self._codes[:self.size], codes)
+
+
+class NativeIndex(VectorIndex):
+    """Memory-mapped vectors searched exactly (flat) or with an HNSW graph.
+
+    `mode` is "flat", "hnsw" or "auto" (HNSW once the live count reaches
+    `hnsw_threshold`). Without hnswlib installed every mode searches flat.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        mode: str = "auto",
+        hnsw_threshold: int = 20000,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef_search: int = 64,
+    ):
+        import numpy as np
+
+        self._np = np
+        self.path = path
+        self.name = name
+        self.mode = mode
+        self.hnsw_threshold = hnsw_threshold
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        os.makedirs(path, exist_ok=True)
+        self._manifest_path = os.path.join(path, "manifest.json")
+        self._lock = threading.RLock()
+        self._write_mutex = threading.Lock()
+        self._manifest_mtime = None
+        self._reset(None)
+        with self._lock:
+            self._refresh()
+
+    # -- state ---------------------------------------------------------------
+
+    def _reset(self, epoch: Optional[int]) -> None:
+        self._epoch = epoch
+        self._generation = -1
+        self._dim: Optional[int] = None
+        self._count = 0  # rows, including tombstoned ones
+        self._vectors = None  # read-only memmap of shape (count, dim)
+        self._sq_norms = None
+        self._records: List[Dict[str, Any]] = []
+        self._records_size = 0
+        self._row_of: Dict[str, int] = {}  # id -> live row
+        self._tombstones: set = set()
+        self._mask_cache: Dict[str, Any] = {}
+        self._columns: Dict[str, _MetadataColumn] = {}  # built on first filter by that key
+        self._hnsw = None
+        self._hnsw_count = 0
+        self._hnsw_deleted: set = set()
+
+    def _files(self, epoch: int):
+        return (
+            os.path.join(self.path, f"vectors.{epoch}.f32"),
+            os.path.join(self.path, f"records.{epoch}.jsonl"),
+            os.path.join(self.path, f"documents.{epoch}.jsonl"),
+        )
+
+    def _hnsw_path(self, epoch: int) -> str:
+        return os.path.join(self.path, f"hnsw.{epoch}.bin")
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _refresh(self) -> None:
+        """Pick up changes published by this or another process (caller holds `_lock`)."""
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+        manifest = self._read_manifest()
+        self._manifest_mtime = mtime
+        if manifest is None:
+            return
+        if manifest["epoch"] != self._epoch:
+            # compacted: the row numbering changed, start over
+            self._reset(manifest["epoch"])
+        if manifest["generation"] != self._generation:
+            self._load(manifest)
+
+    def _load(self, manifest: Dict[str, Any]) -> None:
+        np = self._np
+        vec_path, rec_path, _ = self._files(self._epoch)
+        self._dim = manifest["dim"]
+
+        # Only the records appended since the last load are read
+        if manifest["records_size"] > self._records_size:
+            with open(rec_path, "rb") as f:
+                f.seek(self._records_size)
+                data = f.read(manifest["records_size"] - self._records_size)
+            first = len(self._records)
+            for line in data.splitlines():
+                if line:
+                    row = len(self._records)
+                    record = json.loads(line)
+                    self._records.append(record)
+                    self._row_of[record["id"]] = row
+            self._records_size = manifest["records_size"]
+            for key, column in self._columns.items():
+                column.extend(r["metadata"].get(key) for r in self._records[first:])
+
+        old_count = self._count
+        self._count = manifest["count"]
+        self._tombstones = set(manifest["tombstones"])
+        for row in self._tombstones:
+            record_id = self._records[row]["id"]
+            if self._row_of.get(record_id) == row:
+                del self._row_of[record_id]
+
+        if self._count:
+            self._vectors = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(self._count, self._dim))
+            new = np.asarray(self._vectors[old_count:self._count])
+            new_norms = (new * new).sum(axis=1)
+            self._sq_norms = new_norms if self._sq_norms is None else np.concatenate([self._sq_norms, new_norms])
+        self._mask_cache = {}
+        self._generation = manifest["generation"]
+        self._sync_hnsw(manifest)
+
+    def _use_hnsw(self) -> bool:
+        if self.mode == "flat":
+            return False
+        if self.mode == "auto" and len(self._row_of) < self.hnsw_threshold:
+            return False
+        try:
+            import hnswlib  # noqa: F401
+        except ImportError:
+            logger.warning("Vector index: hnswlib not installed, searching %s with the flat index", self.name)
+            self.mode = "flat"
+            return False
+        return True
+
+    def _sync_hnsw(self, manifest: Dict[str, Any]) -> None:
+        """Bring the HNSW graph up to date with the rows and tombstones on disk."""
+        np = self._np
+        if not self._count or not self._use_hnsw():
+            self._hnsw = None
+            return
+        import hnswlib
+
+        if self._hnsw is None:
+            graph = hnswlib.Index(space="l2", dim=self._dim)
+            saved_path = self._hnsw_path(self._epoch)
+            if manifest.get("hnsw_count") and os.path.exists(saved_path):
+                graph.load_index(saved_path, max_elements=max(self._count, manifest["hnsw_count"]), allow_replace_deleted=False)
+                self._hnsw_count = min(graph.get_current_count(), self._count)
+            else:
+                graph.init_index(max_elements=max(self._count, 1024), ef_construction=self.hnsw_ef_construction, M=self.hnsw_m)
+                self._hnsw_count = 0
+            graph.set_ef(self.hnsw_ef_search)
+            logger.info("Vector index %s: HNSW graph for %d vectors held in this process (~%.0f MB)",
+                        self.name, self._count, self._count * (4 * self._dim + 8 * self.hnsw_m) / 2 ** 20)
+            self._hnsw = graph
+            self._hnsw_deleted = set()
+
+        graph = self._hnsw
+        if self._count > self._hnsw_count:
+            if self._count > graph.get_max_elements():
+                graph.resize_index(max(self._count, 2 * graph.get_max_elements()))
+            graph.add_items(np.asarray(self._vectors[self._hnsw_count:self._count]), np.arange(self._hnsw_count, self._count))
+            self._hnsw_count = self._count
+        for row in self._tombstones - self._hnsw_deleted:
+            try:
+                graph.mark_deleted(row)
+            except RuntimeError:
+                pass  # already marked in the saved graph
+            self._hnsw_deleted.add(row)
+
+    # -- writes --------------------------------------------------------------
+
+    @contextmanager
+    def _write_lock(self):
+        # Writers exclude each other (threads and processes) but not readers: nothing
+        # else can publish a manifest meanwhile, so reader refreshes are no-ops.
+        with self._write_mutex:
+            with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    with self._lock:
+                        self._refresh()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _publish(self, manifest: Dict[str, Any]) -> None:
+        self._write_manifest(manifest)
+        with self._lock:
+            self._refresh()
+
+    @staticmethod
+    def _append(path: str, at: int, data: bytes) -> None:
+        # Drop anything past the published size (left by a writer that crashed mid-append)
+        with open(path, "ab") as f:
+            f.truncate(at)
+            f.write(data)
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        np = self._np
+        # Keep the last occurrence of an id within one call
+        latest = {str(i): n for n, i in enumerate(ids)}
+        keep = sorted(latest.values())
+        if not keep:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)[keep]
+
+        with self._write_lock():
+            manifest = self._read_manifest() or {
+                "epoch": 1, "generation": 0, "dim": int(vectors.shape[1]), "count": 0,
+                "records_size": 0, "documents_size": 0, "tombstones": [], "hnsw_count": 0,
+            }
+            if self._epoch is None:
+                self._epoch = manifest["epoch"]
+            if vectors.shape[1] != manifest["dim"]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {manifest['dim']}")
+            vec_path, rec_path, doc_path = self._files(manifest["epoch"])
+
+            tombstones = set(manifest["tombstones"])
+            records, docs = [], []
+            offset = manifest["documents_size"]
+            for n in keep:
+                record_id = str(ids[n])
+                if record_id in self._row_of:
+                    tombstones.add(self._row_of[record_id])
+                doc = (json.dumps(documents[n]) + "\n").encode("utf-8")
+                records.append((json.dumps({
+                    "id": record_id, "metadata": metadatas[n] or {}, "offset": offset, "length": len(doc),
+                }) + "\n").encode("utf-8"))
+                docs.append(doc)
+                offset += len(doc)
+
+            vec_bytes = vectors.tobytes()
+            rec_bytes = b"".join(records)
+            self._append(vec_path, manifest["count"] * manifest["dim"] * 4, vec_bytes)
+            self._append(rec_path, manifest["records_size"], rec_bytes)
+            self._append(doc_path, manifest["documents_size"], b"".join(docs))
+
+            manifest.update(
+                generation=manifest["generation"] + 1,
+                count=manifest["count"] + len(keep),
+                records_size=manifest["records_size"] + len(rec_bytes),
+                documents_size=offset,
+                tombstones=sorted(tombstones),
+            )
+            with self._lock:
+                self._save_hnsw_if_due(manifest)
+            self._publish(manifest)
+
+    def _save_hnsw_if_due(self, manifest: Dict[str, Any]) -> None:
+        """Persist the graph when it has grown enough that rebuilding it on startup would be slow."""
+        if self._hnsw is None:
+            return
+        saved = manifest.get("hnsw_count", 0)
+        if self._hnsw_count - saved < max(1000, saved // 10):
+            return
+        path = self._hnsw_path(manifest["epoch"])
+        self._hnsw.save_index(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        manifest["hnsw_count"] = self._hnsw_count
+
+    def delete(self, ids) -> None:
+        if not ids:
+            return
+        with self._write_lock():
+            manifest = self._read_manifest()
+            if manifest is None:
+                return
+            rows = {self._row_of[str(i)] for i in ids if str(i) in self._row_of}
+            if not rows:
+                return
+            manifest.update(
+                generation=manifest["generation"] + 1,
+                tombstones=sorted(set(manifest["tombstones"]) | rows),
+            )
+            self._publish(manifest)
+
+    def tombstone_ratio(self) -> float:
+        with self._lock:
+            self._refresh()
+            return len(self._tombstones) / self._count if self._count else 0.0
+
+    def compact(self) -> int:
+        """Rewrite the files without tombstoned rows; return the number of rows dropped."""
+        np = self._np
+        with self._write_lock():
+            manifest = self._read_manifest()
+            if manifest is None or not self._tombstones:
+                return 0
+            old_epoch = manifest["epoch"]
+            new_epoch = old_epoch + 1
+            old_doc_path = self._files(old_epoch)[2]
+            vec_path, rec_path, doc_path = self._files(new_epoch)
+            live = [r for r in range(self._count) if r not in self._tombstones]
+
+            records_size = documents_size = 0
+            with open(vec_path, "wb") as vf, open(rec_path, "wb") as rf, \
+                    open(doc_path, "wb") as df, open(old_doc_path, "rb") as old_docs:
+                for start in range(0, len(live), 4096):
+                    chunk = live[start:start + 4096]
+                    vf.write(np.asarray(self._vectors[chunk], dtype=np.float32).tobytes())
+                    for row in chunk:
+                        record = self._records[row]
+                        old_docs.seek(record["offset"])
+                        doc = old_docs.read(record["length"])
+                        line = (json.dumps({
+                            "id": record["id"], "metadata": record["metadata"],
+                            "offset": documents_size, "length": len(doc),
+                        }) + "\n").encode("utf-8")
+                        rf.write(line)
+                        df.write(doc)
+                        records_size += len(line)
+                        documents_size += len(doc)
+
+            dropped = self._count - len(live)
+            self._publish({
+                "epoch": new_epoch, "generation": manifest["generation"] + 1, "dim": manifest["dim"],
+                "count": len(live), "records_size": records_size, "documents_size": documents_size,
+                "tombstones": [], "hnsw_count": 0,
+            })
+
+            # Readers still mapping the old files keep them alive until they remap (POSIX)
+            for path in self._files(old_epoch) + (self._hnsw_path(old_epoch),):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            logger.info("Vector index %s: compacted %d tombstoned rows", self.name, dropped)
+            return dropped
+
+    # -- reads ---------------------------------------------------------------
+
+    def _column(self, key: str) -> _MetadataColumn:
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = _MetadataColumn(self._np, (r["metadata"].get(key) for r in self._records))
+        return column
+
+    def _filter_mask(self, where: Dict[str, Any]):
+        """Rows matching a Chroma-style metadata filter.
+
+        Supports `{"key": value}`, `{"key": {"$eq"|"$ne"|"$in"|"$nin": ...}}` and `$and`/`$or` lists.
+        """
+        np = self._np
+        mask = np.ones(self._count, dtype=bool)
+        for key, cond in where.items():
+            if key == "$and":
+                for c in cond:
+                    mask &= self._filter_mask(c)
+            elif key == "$or":
+                either = np.zeros(self._count, dtype=bool)
+                for c in cond:
+                    either |= self._filter_mask(c)
+                mask &= either
+            elif isinstance(cond, dict):
+                column = self._column(key)
+                for op, expected in cond.items():
+                    if op == "$eq":
+                        mask &= column.isin([expected])
+                    elif op == "$ne":
+                        mask &= ~column.isin([expected])
+                    elif op == "$in":
+                        mask &= column.isin(expected)
+                    elif op == "$nin":
+                        mask &= ~column.isin(expected)
+                    else:
+                        raise ValueError(f"Unsupported filter operator: {op}")
+            else:
+                mask &= self._column(key).isin([cond])
+        return mask
+
+    def _live_mask(self, where: Optional[Dict[str, Any]]):
+        """Boolean mask of rows that are live and match `where`, cached per generation."""
+        np = self._np
+        key = json.dumps(where or {}, sort_keys=True)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = self._filter_mask(where) if where else np.ones(self._count, dtype=bool)
+            if self._tombstones:
+                mask[np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))] = False
+            self._mask_cache[key] = mask
+        return mask
+
+    def _search_flat(self, q, top_k: int, mask):
+        np = self._np
+        k = min(top_k, int(mask.sum()))
+        if k <= 0:
+            return [[] for _ in range(len(q))]
+        # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x, one matrix product for every query
+        dists = self._sq_norms[None, :] - 2.0 * (q @ np.asarray(self._vectors).T) + (q * q).sum(axis=1)[:, None]
+        dists[:, ~mask] = np.inf
+        top = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        out = []
+        for qi in range(len(q)):
+            rows = top[qi][np.argsort(dists[qi, top[qi]])]
+            out.append([(int(r), float(max(dists[qi, r], 0.0))) for r in rows])
+        return out
+
+    def _search_hnsw(self, q, top_k: int, mask, filtered: bool):
+        k = min(top_k, int(mask.sum()))
+        if k <= 0:
+            return [[] for _ in range(len(q))]
+        self._hnsw.set_ef(max(self.hnsw_ef_search, k))
+        labels, dists = self._hnsw.knn_query(q, k=k, filter=(lambda row: bool(mask[row])) if filtered else None)
+        return [
+            [(int(r), float(d)) for r, d in zip(labels[qi], dists[qi]) if r < self._count]
+            for qi in range(len(q))
+        ]
+
+    def query(self, embeddings, top_k, where=None):
+        np = self._np
+        with self._lock:
+            self._refresh()
+            if not self._count or top_k <= 0:
+                return [[] for _ in range(len(embeddings))]
+            q = np.asarray(embeddings, dtype=np.float32).reshape(-1, self._dim)
+            mask = self._live_mask(where)
+            hits = None
+            if self._hnsw is not None:
+                try:
+                    hits = self._search_hnsw(q, top_k, mask, filtered=bool(where))
+                except RuntimeError as e:
+                    # hnswlib cannot fill k results when the filter is very selective
+                    logger.info("Vector index %s: HNSW search fell back to flat: %s", self.name, e)
+            if hits is None:
+                hits = self._search_flat(q, top_k, mask)
+            records = self._records
+            doc_path = self._files(self._epoch)[2]
+
+            out = []
+            with open(doc_path, "rb") as docs:
+                for query_hits in hits:
+                    results = []
+                    for row, dist in query_hits:
+                        record = records[row]
+                        docs.seek(record["offset"])
+                        results.append({
+                            "id": record["id"],
+                            "document": json.loads(docs.read(record["length"])),
+                            "metadata": record["metadata"],
+                            "distance": dist,
+                        })
+                    out.append(results)
+            return out
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return list(self._row_of)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._row_of)
+
+
+class NativeBackend:
+    """Opens native indexes stored as directories under `root`."""
+
+    kind = "native"
+
+    def __init__(self, root: str, mode: str = "auto", **options):
+        import numpy  # noqa: F401  (fail at warmup, not on the first query)
+
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.mode = mode
+        self._options = options
+
+    def open(self, name: str) -> NativeIndex:
+        return NativeIndex(os.path.join(self.root, name), name, mode=self.mode, **self._options)
+
+    def drop(self, name: str) -> None:
+        shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def names(self) -> List[str]:
+        return sorted(n for n in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, n)))
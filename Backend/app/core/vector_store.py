@@ -1,124 +1,388 @@
-"""Simple local vector store backed by Chroma + SentenceTransformers.
+"""Simple local vector store backed by a pluggable index + embedding backend.
 
-This module provides a thin wrapper that will try to load ChromaDB and
-SentenceTransformers (all-MiniLM-L6-v2). If those packages are not
-available or fail to initialize, the wrapper will be disabled and callers
-should fall back to the plaintext keyword search.
+This module provides a thin wrapper that will try to load the vector index
+from `app.core.vector_index` (a Chroma collection by default, or the native
+memory-mapped flat/HNSW index) and the embedding backend from
+`app.core.embeddings` (SentenceTransformers all-MiniLM-L6-v2 by default, or
+its ONNX Runtime export). If those packages are not available or fail to
+initialize, the wrapper will be disabled and callers should fall back to the
+plaintext keyword search.
 
-The Chroma collection is persisted under `.chromadb/` in the project root.
+Loading is lazy and happens in the background: `start_warmup()` (called at
+app startup, or by the first `is_ready()` check) spawns a thread that opens
+the index and loads the model, so the app serves non-RAG traffic immediately.
+Until warmup completes `is_ready()` returns False without blocking. A failed
+warmup is retried with exponential backoff rather than on every call, and
+`status()` reports the state and load timings for the readiness endpoint.
+
+Chroma persists under `.chromadb/` and the native index under `.vectorindex/`
+in the project root. The name of the live collection is kept in an
+`active_collection` file in that directory so a rebuilt index (see
+`app.core.reindex`) can be swapped in atomically.
 """
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
+import hashlib
+import json
 import os
+import threading
+import time
+from app.core import embeddings, vector_index
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
 _ready = False
-_client = None
+_state = "idle"  # idle | loading | ready | failed
+_error: Optional[str] = None
+_attempts = 0
+_next_retry_at = 0.0
+_timings_ms: Dict[str, float] = {}
+_loaded_at: Optional[str] = None
+_state_lock = threading.Lock()
+_done = threading.Event()
+_backend = None
 _collection = None
+_collection_name = None
+_active_mtime = None
 _model = None
+_compacting = threading.Lock()
 
+_ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+_PERSIST_DIRS = {"chroma": os.path.join(_ROOT, ".chromadb"), "native": os.path.join(_ROOT, ".vectorindex")}
+_NATIVE_MODES = {"native": "auto", "flat": "flat", "hnsw": "hnsw"}
+DEFAULT_COLLECTION = "docs"
 
-def _init():
-    global _ready, _client, _collection, _model
+
+def _make_backend():
+    kind = settings.VECTOR_INDEX_BACKEND
+    if kind == "chroma":
+        return vector_index.ChromaBackend(_PERSIST_DIRS["chroma"])
+    if kind in _NATIVE_MODES:
+        return vector_index.NativeBackend(
+            _PERSIST_DIRS["native"],
+            mode=_NATIVE_MODES[kind],
+            hnsw_threshold=settings.VECTOR_INDEX_HNSW_THRESHOLD,
+            hnsw_m=settings.VECTOR_INDEX_HNSW_M,
+            hnsw_ef_construction=settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION,
+            hnsw_ef_search=settings.VECTOR_INDEX_HNSW_EF_SEARCH,
+        )
+    raise ValueError(f"Unknown vector index backend: {kind}")
+
+
+def _active_file() -> str:
+    return os.path.join(_backend.root, "active_collection")
+
+
+def _read_active_name() -> str:
     try:
-        import chromadb
-        from sentence_transformers import SentenceTransformer
+        with open(_active_file()) as f:
+            return f.read().strip() or DEFAULT_COLLECTION
+    except FileNotFoundError:
+        return DEFAULT_COLLECTION
 
-        persist_dir = os.path.join(os.path.dirname(__file__), "..", "..", ".chromadb")
-        os.makedirs(persist_dir, exist_ok=True)
 
-        # Use persistent client (works with latest ChromaDB versions)
-        _client = chromadb.PersistentClient(path=persist_dir)
+def _active_file_mtime() -> Optional[float]:
+    try:
+        return os.stat(_active_file()).st_mtime
+    except FileNotFoundError:
+        return None
 
-        # Get or create collection
-        _collection = _client.get_or_create_collection(name="docs")
+
+def _init():
+    global _ready, _state, _error, _attempts, _next_retry_at, _timings_ms, _loaded_at
+    global _backend, _collection, _collection_name, _active_mtime, _model
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    try:
+        # Open (or create) the live collection
+        _backend = _make_backend()
+        _active_mtime = _active_file_mtime()
+        _collection_name = _read_active_name()
+        _collection = _backend.open(_collection_name)
+        timings["index"] = (time.perf_counter() - start) * 1000
 
         # Load small, fast embedding model
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        t = time.perf_counter()
+        _model = embeddings.get_backend()
+        timings["model"] = (time.perf_counter() - t) * 1000
+
+        # First encode pays for lazy kernel/tokenizer setup; do it here, not on a user query
+        t = time.perf_counter()
+        _model.encode(["warmup"])
+        timings["first_encode"] = (time.perf_counter() - t) * 1000
+        timings["total"] = (time.perf_counter() - start) * 1000
 
-        _ready = True
-        logger.info("Vector store initialized (Chroma + SentenceTransformer)")
+        with _state_lock:
+            _timings_ms = {k: round(v, 1) for k, v in timings.items()}
+            _loaded_at = datetime.now(timezone.utc).isoformat()
+            _error = None
+            _state = "ready"
+            _ready = True
+        logger.info("Vector store initialized (%s + %s) in %.0fms",
+                    settings.VECTOR_INDEX_BACKEND, _model.name, timings["total"])
     except Exception as e:
-        _ready = False
-        logger.warning("Vector store unavailable: %s", e)
+        with _state_lock:
+            _ready = False
+            _state = "failed"
+            _error = str(e)
+            _attempts += 1
+            backoff = min(settings.VECTOR_WARMUP_BACKOFF_MAX_SECONDS,
+                          settings.VECTOR_WARMUP_BACKOFF_SECONDS * 2 ** (_attempts - 1))
+            _next_retry_at = time.monotonic() + backoff
+            _timings_ms = {k: round(v, 1) for k, v in timings.items()}
+        logger.warning("Vector store unavailable (attempt %d, retry in %.1fs): %s", _attempts, backoff, e)
+    finally:
+        _done.set()
+
+
+def start_warmup() -> bool:
+    """Start loading the store in a background thread.
+
+    Returns False if it is already loaded or loading, or a failed attempt is still backing off.
+    """
+    global _state
+    with _state_lock:
+        if _state in ("ready", "loading"):
+            return False
+        if _state == "failed" and time.monotonic() < _next_retry_at:
+            return False
+        _state = "loading"
+        _done.clear()
+    threading.Thread(target=_init, name="vector-store-warmup", daemon=True).start()
+    return True
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until the current warmup attempt finishes (for CLI tools and scripts)."""
+    start_warmup()
+    _done.wait(timeout)
+    return _ready
 
 
 def is_ready() -> bool:
     if not _ready:
-        # try initialize on first check
-        _init()
+        # non-blocking: kicks off (or retries, after backoff) warmup in the background
+        start_warmup()
     return _ready
 
 
+def status() -> Dict[str, Any]:
+    """Report model/index state and load timings."""
+    with _state_lock:
+        info: Dict[str, Any] = {
+            "state": _state,
+            "ready": _ready,
+            "model": settings.EMBEDDING_MODEL,
+            "backend": settings.EMBEDDING_BACKEND,
+            "index_backend": settings.VECTOR_INDEX_BACKEND,
+            "collection": _collection_name,
+            "attempts": _attempts,
+            "error": _error,
+            "loaded_at": _loaded_at,
+            "timings_ms": dict(_timings_ms),
+        }
+        if _state == "failed":
+            info["retry_in_s"] = max(0.0, round(_next_retry_at - time.monotonic(), 1))
+    if _ready:
+        try:
+            info["documents"] = _collection.count()
+        except Exception as e:
+            info["documents"] = None
+            logger.warning("Vector store: count failed: %s", e)
+        if hasattr(_model, "stats"):
+            # shared embedding service: batching and queue wait across all workers
+            try:
+                info["embedding_service"] = _model.stats()
+            except Exception as e:
+                info["embedding_service"] = {"error": str(e)}
+    return info
+
+
+def _refresh_active() -> None:
+    """Reopen the live collection if another process swapped it since we opened it."""
+    global _collection, _collection_name, _active_mtime
+    mtime = _active_file_mtime()
+    if mtime == _active_mtime:
+        return
+    name = _read_active_name()
+    if name != _collection_name:
+        _collection = _backend.open(name)
+        _collection_name = name
+        logger.info("Vector store: switched to collection %s", name)
+    _active_mtime = mtime
+
+
 def _embed(texts: List[str]) -> List[List[float]]:
     if not is_ready():
         raise RuntimeError("Vector store not initialized")
     return _model.encode(texts).tolist()
 
 
-def add_document(doc_id: str, title: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> None:
-    """Add a document to the vector store. `doc_id` must be unique."""
+def embed(texts: List[str]) -> List[List[float]]:
+    """Embed a batch of texts with the store's model."""
+    return _embed(texts)
+
+
+def active_collection_name() -> Optional[str]:
+    if not is_ready():
+        return None
+    _refresh_active()
+    return _collection_name
+
+
+def open_collection(name: str):
+    """Get or create a collection by name (e.g. a shadow collection for a rebuild)."""
+    if not is_ready():
+        raise RuntimeError("Vector store not initialized")
+    return _backend.open(name)
+
+
+def swap_collection(name: str) -> None:
+    """Make `name` the live collection.
+
+    The pointer file is replaced atomically, so this process switches
+    immediately and other workers pick the new collection up on their next call.
+    The previous collection is kept, so queries other workers are still
+    running against it finish; `drop_inactive` (`reindex gc`) removes it later.
+    """
+    global _collection, _collection_name, _active_mtime
+    if not is_ready():
+        raise RuntimeError("Vector store not initialized")
+    new_collection = _backend.open(name)
+    tmp_path = _active_file() + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(name)
+    os.replace(tmp_path, _active_file())
+
+    old_name = _collection_name
+    _collection, _collection_name, _active_mtime = new_collection, name, _active_file_mtime()
+    logger.info("Vector store: swapped live collection %s -> %s", old_name, name)
+
+
+def drop_inactive(grace_seconds: float, keep: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Drop every collection except the live one and `keep`, once the last swap is `grace_seconds` old.
+
+    Until then nothing is dropped, since another worker may not have re-read
+    the pointer file yet.
+    """
+    if not is_ready():
+        raise RuntimeError("Vector store not initialized")
+    _refresh_active()
+    inactive = [n for n in _backend.names() if n != _collection_name and n not in (keep or [])]
+    mtime = _active_file_mtime()
+    age = time.time() - mtime if mtime is not None else None
+    if inactive and age is not None and age < grace_seconds:
+        return {"dropped": [], "pending": inactive, "retry_in_s": round(grace_seconds - age, 1)}
+    dropped = []
+    for name in inactive:
+        try:
+            _backend.drop(name)
+            dropped.append(name)
+        except Exception as e:
+            logger.warning("Vector store: failed to drop collection %s: %s", name, e)
+    if dropped:
+        logger.info("Vector store: dropped inactive collections %s", ", ".join(dropped))
+    return {"dropped": dropped, "pending": [n for n in inactive if n not in dropped], "retry_in_s": None}
+
+
+def list_ids(collection=None) -> List[str]:
+    """Return every id in the live (or given) collection without loading documents or embeddings."""
     if not is_ready():
+        return []
+    if collection is None:
+        _refresh_active()
+        collection = _collection
+    return collection.ids()
+
+
+def _compact(collection) -> None:
+    try:
+        collection.compact()
+    except Exception as e:
+        logger.warning("Vector store: compaction of %s failed: %s", collection.name, e)
+    finally:
+        _compacting.release()
+
+
+def _after_write() -> None:
+    """Compact tombstones in the background once they pile up."""
+    collection = _collection
+    if not hasattr(collection, "tombstone_ratio"):
+        return  # Chroma manages its own storage
+    if collection.tombstone_ratio() < settings.VECTOR_INDEX_COMPACT_RATIO:
         return
+    if _compacting.acquire(blocking=False):
+        threading.Thread(target=_compact, args=(collection,), name="vector-index-compact", daemon=True).start()
+
+
+def delete_ids(ids: List[str]) -> None:
+    """Remove ids from the live collection."""
+    if not is_ready() or not ids:
+        return
+    _refresh_active()
+    _collection.delete(ids=[str(i) for i in ids])
+    _after_write()
+
+
+def document_text(title: Optional[str], content: Optional[str]) -> str:
+    """The text embedded and stored for a doc."""
+    return (title or "") + "\n" + (content or "")
+
+
+def content_hash(title: Optional[str], content: Optional[str]) -> str:
+    """sha256 of a doc's embedded text, stored as `Doc.content_hash`."""
+    return hashlib.sha256(document_text(title, content).encode("utf-8")).hexdigest()
+
+
+def entry_hash(doc_content_hash: Optional[str], tags: Optional[Dict[str, str]] = None) -> str:
+    """Hash of a doc's vector entry, stored as `Doc.indexed_hash` once it is indexed.
+
+    Built from the stored `content_hash` and the namespace tags (the rest of
+    the metadata is the id and title), so staleness can be checked without
+    reading the doc text.
+    """
+    payload = (doc_content_hash or "") + "\n" + json.dumps(tags or {}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def add_document(doc_id: str, title: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+    """Add a document to the vector store, replacing any existing entry with the same id.
+
+    Returns True once the entry is written, False if the store is not ready or the write failed.
+    """
+    if not is_ready():
+        return False
     try:
-        text = (title or "") + "\n" + (content or "")
+        _refresh_active()
+        text = document_text(title, content)
         emb = _embed([text])[0]
-        # Chroma expects lists
-        _collection.add(ids=[str(doc_id)], documents=[text], metadatas=[metadata or {}], embeddings=[emb])
-        logger.info("Vector store: added doc id=%s", doc_id)
+        _collection.upsert(ids=[str(doc_id)], embeddings=[emb], documents=[text], metadatas=[metadata or {}])
+        _after_write()
+        logger.info("Vector store: indexed doc id=%s", doc_id)
+        return True
     except Exception as e:
         logger.error("Failed to add document to vector store: %s", e)
+        return False
 
 
-def query(query_text: str, top_k: int = 3) -> List[Dict[str, Any]]:
+def query(query_text: str, top_k: int = 3, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """Query the vector store and return list of results with fields: id, document, metadata, distance."""
-    if not is_ready():
-        return []
-    try:
-        q_emb = _embed([query_text])[0]
+    return query_batch([query_text], top_k, where)[0]
 
-        # Different ChromaDB versions accept different `include` keys.
-        # Try the older form first (which included 'ids'), then fall back
-        # to newer include keys such as 'data' if needed.
-        out = []
-        try:
-            results = _collection.query(query_embeddings=[q_emb], n_results=top_k, include=["metadatas", "documents", "distances", "ids"])
-            ids = results.get("ids", [[]])[0]
-            docs = results.get("documents", [[]])[0]
-            metas = results.get("metadatas", [[]])[0]
-            dists = results.get("distances", [[]])[0]
-        except Exception:
-            # Fallback for newer Chroma versions where 'ids' is not an allowed include
-            # and query returns a 'data' structure (or only documents/metadatas/distances).
-            results = _collection.query(query_embeddings=[q_emb], n_results=top_k, include=["metadatas", "documents", "distances", "data"])
-            # Extract lists safely (some keys might be missing depending on Chroma version)
-            docs = results.get("documents", [[]])[0] if "documents" in results else []
-            metas = results.get("metadatas", [[]])[0] if "metadatas" in results else []
-            dists = results.get("distances", [[]])[0] if "distances" in results else []
-
-            # 'data' is often a list of dicts containing id/uri information.
-            data_list = results.get("data", [[]])[0]
-            ids = []
-            for item in data_list:
-                if isinstance(item, dict):
-                    ids.append(item.get("id") or item.get("uri") or item.get("uuid") or None)
-                else:
-                    ids.append(item)
-
-        # Build normalized output
-        for i in range(len(ids)):
-            out.append({
-                "id": ids[i],
-                "document": docs[i] if i < len(docs) else None,
-                "metadata": metas[i] if i < len(metas) else {},
-                "distance": dists[i] if i < len(dists) else None,
-            })
-        return out
-    except Exception as e:
-        logger.error("Vector store query failed: %s", e)
-        return []
 
+def query_batch(query_texts: List[str], top_k: int = 3, where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+    """Query several texts with one batched encode and one multi-embedding index query.
 
-# initialize eagerly but safely
-_init()
+    `where` is a metadata filter applied inside the index (see `vector_index.matches`).
+    Returns one result list per text, aligned with `query_texts`.
+    """
+    if not query_texts or not is_ready():
+        return [[] for _ in query_texts]
+    try:
+        _refresh_active()
+        return _collection.query(_embed(list(query_texts)), top_k, where)
+    except Exception as e:
+        logger.error("Vector store query failed: %s", e)
+        return [[] for _ in query_texts]
@@ -1,6 +1,7 @@
 """LLM module using LangChain Google LLM (pluggable)."""
 from typing import Optional
 
+from app.core import instrumentation
 from app.core.config import settings
 from app.core.logging import get_logger
 
@@ -43,6 +44,23 @@ def get_local_llm():
         raise
 
 
+class InstrumentedLLM:
+    """Wraps an LLM so each `invoke` is timed and its token usage recorded on the running agent step."""
+
+    def __init__(self, llm):
+        self._llm = llm
+
+    def invoke(self, *args, **kwargs):
+        name = getattr(self._llm, "model_name", None) or getattr(self._llm, "model", None) or ""
+        with instrumentation.call("llm", str(name)) as record:
+            response = self._llm.invoke(*args, **kwargs)
+            record.update(instrumentation.token_usage(response))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+
 _default_llm: Optional[object] = None
 
 
@@ -50,5 +68,5 @@ def get_llm():
     """Get singleton LLM instance."""
     global _default_llm
     if _default_llm is None:
-        _default_llm = get_local_llm()
+        _default_llm = InstrumentedLLM(get_local_llm())
     return _default_llm
@@ -1,19 +1,35 @@
 """FastAPI application entrypoint."""
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.routes import router as api_router
 from app.api.auth import router as auth_router
+from app.api.conditional import NotModified, not_modified_handler
 from app.api.chat import router as chat_router
 from app.api.docs import router as docs_router
 from app.api.users import router as users_router
 from app.core.config import settings
 from app.core.middleware import AuthMiddleware
+from app.core import analytics, tagging, vector_store
 from app.mcp import mcp_registry
 from app.mcp.google_mcp import GoogleMCP
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model and vector index in the background; RAG falls back
+    # to keyword search until it is ready (see /api/health/ready)
+    vector_store.start_warmup()
+    # Analytics columns, indexes, rollups and question_tags
+    analytics.init_schema()
+    # Tags questions recorded untagged, in batched LLM prompts
+    tagging.start_worker()
+    yield
+
+
 def create_app() -> FastAPI:
     middleware = [
         Middleware(CORSMiddleware, 
@@ -23,7 +39,8 @@ def create_app() -> FastAPI:
                    allow_headers=["*"]),
         Middleware(AuthMiddleware)
     ]
-    app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, middleware=middleware)
+    app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, middleware=middleware, lifespan=lifespan)
+    app.add_exception_handler(NotModified, not_modified_handler)
     # Register MCP clients (Google via SerpAPI) if configured
     try:
         google_mcp = GoogleMCP()
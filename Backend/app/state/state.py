@@ -27,6 +27,7 @@ class AgentState:
     # Search and retrieval results
     search_results: List[Dict[str, Any]] = field(default_factory=list)
     retrieval_results: List[Dict[str, Any]] = field(default_factory=list)
+    doc_filters: Dict[str, str] = field(default_factory=dict)  # namespace (team/environment/doc_type) to search
     
     # Final answer
     final_answer: str = ""
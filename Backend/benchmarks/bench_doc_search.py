@@ -0,0 +1,163 @@
+"""Benchmark keyword document search: ILIKE scan vs database full-text search.
+
+Builds a synthetic DevOps corpus of N documents in a scratch database, then
+times the same set of queries against the ILIKE path (full rows, as the
+original fallback did) and the full-text path in `app.core.fulltext`.
+
+Usage (from the Backend directory):
+
+    python benchmarks/bench_doc_search.py                      # SQLite, 10k and 100k docs
+    python benchmarks/bench_doc_search.py --sizes 10000 --queries 500
+    python benchmarks/bench_doc_search.py --database-url postgresql://.../scratch
+
+WARNING: with --database-url the `docs` table of that database is dropped
+and recreated. Point it at a scratch database only.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+TOPICS = ["kubernetes", "docker", "terraform", "ansible", "jenkins", "helm", "prometheus", "grafana",
+          "nginx", "postgres", "redis", "kafka", "argocd", "vault", "istio", "elasticsearch"]
+ACTIONS = ["restart", "rollback", "scale", "upgrade", "rotate", "drain", "migrate", "backup", "restore", "deploy"]
+SYMPTOMS = ["timeout", "crashloop", "oomkilled", "latency spike", "disk pressure", "certificate expiry",
+            "connection refused", "permission denied", "image pull backoff", "split brain"]
+FILLER = ("Check the dashboards and confirm the alert is still firing before acting. "
+          "Page the on-call secondary if the change window is closed. "
+          "Record every command you run in the incident channel. ")
+
+QUERIES = [
+    "kubernetes", "timeout", "rollback helm release", "how do I restart a crashed redis pod",
+    "terraform state lock", "certificate expiry nginx", "oomkilled", "kafka consumer lag runbook",
+    "vault token rotate", "why is grafana dashboard slow",
+]
+
+
+def _make_doc(rng: random.Random, i: int):
+    topic = rng.choice(TOPICS)
+    action = rng.choice(ACTIONS)
+    symptom = rng.choice(SYMPTOMS)
+    title = f"{topic} {action} runbook {i}"
+    body = (f"Runbook for {topic}: how to {action} when you see {symptom}. "
+            f"Steps: identify the affected {topic} nodes, {action} them one at a time, "
+            f"and verify {symptom} has cleared. " + FILLER * rng.randint(2, 6))
+    return {"title": title, "content": body}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _summarize(timings_ms, hits):
+    return {
+        "mean_ms": round(statistics.mean(timings_ms), 3),
+        "p50_ms": round(_percentile(timings_ms, 50), 3),
+        "p95_ms": round(_percentile(timings_ms, 95), 3),
+        "avg_hits": round(statistics.mean(hits), 2),
+    }
+
+
+def run(size: int, database_url: str, n_queries: int, top_k: int, seed: int):
+    from sqlalchemy import create_engine, or_
+    from sqlalchemy.orm import sessionmaker
+    from app.core import fulltext
+    from app.core.models import Doc
+
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("DROP TABLE IF EXISTS docs_fts")
+        Doc.__table__.drop(conn, checkfirst=True)
+        Doc.__table__.create(conn)
+
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    batch = []
+    with engine.begin() as conn:
+        for i in range(size):
+            batch.append(_make_doc(rng, i))
+            if len(batch) == 5000:
+                conn.execute(Doc.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Doc.__table__.insert(), batch)
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fulltext.init(engine)
+    index_s = time.perf_counter() - t0
+    if not fulltext.is_ready():
+        raise SystemExit(f"full-text search unavailable on {engine.dialect.name}")
+
+    Session = sessionmaker(bind=engine)
+    queries = [QUERIES[i % len(QUERIES)] for i in range(n_queries)]
+    results = {"size": size, "dialect": engine.dialect.name, "load_s": round(load_s, 2), "index_s": round(index_s, 2)}
+
+    db = Session()
+    try:
+        timings, hits = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            q_str = f"%{q}%"
+            rows = db.query(Doc).filter(or_(Doc.title.ilike(q_str), Doc.content.ilike(q_str))).limit(top_k).all()
+            timings.append((time.perf_counter() - t0) * 1000)
+            hits.append(len(rows))
+        results["ilike"] = _summarize(timings, hits)
+
+        timings, hits = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            rows = fulltext.search(db, q, limit=top_k)
+            timings.append((time.perf_counter() - t0) * 1000)
+            hits.append(len(rows))
+        results["fulltext"] = _summarize(timings, hits)
+    finally:
+        db.close()
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", default=None, help="scratch database (default: temporary SQLite file)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="pipelight-bench-")
+    # app.core.database builds its engine at import time; keep it off the real database
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmpdir, 'unused.db')}")
+
+    all_results = []
+    try:
+        for size in args.sizes:
+            url = args.database_url or f"sqlite:///{os.path.join(tmpdir, f'docs_{size}.db')}"
+            res = run(size, url, args.queries, args.top_k, args.seed)
+            all_results.append(res)
+            if not args.json:
+                print(f"\n{size:,} docs ({res['dialect']}; load {res['load_s']}s, index {res['index_s']}s)")
+                print(f"  {'path':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'avg hits':>10}")
+                for path in ("ilike", "fulltext"):
+                    r = res[path]
+                    print(f"  {path:<10}{r['mean_ms']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['avg_hits']:>10}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    if args.json:
+        print(json.dumps(all_results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
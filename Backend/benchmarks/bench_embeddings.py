@@ -0,0 +1,176 @@
+"""Benchmark embedding backends: throughput, single-query latency, memory and fidelity.
+
+Each backend runs in its own subprocess so resident memory is measured in
+isolation. Reported per backend:
+
+- load time and RSS after loading + encoding (MB)
+- batch throughput (sentences/sec) over a synthetic DevOps corpus
+- single-query latency p50/p99 (ms), as seen by one chat turn
+- cosine similarity of its embeddings against the PyTorch
+  sentence-transformers model (mean/min over a sample set)
+
+Usage (from the Backend directory):
+
+    python benchmarks/bench_embeddings.py
+    python benchmarks/bench_embeddings.py --backends sentence-transformers onnx-int8 --sentences 5000
+    python benchmarks/bench_embeddings.py --json
+
+The first onnx run exports (and quantizes) the model under EMBEDDING_ONNX_DIR.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BACKENDS = {
+    "sentence-transformers": ("sentence-transformers", None),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True),
+}
+
+SAMPLE_TEXTS = [
+    "How do I restart a crashlooping pod in Kubernetes?",
+    "Terraform state lock is stuck after a failed apply",
+    "Rotate the Vault root token and update the CI secrets",
+    "nginx returns 502 bad gateway behind the load balancer",
+    "Scale the Kafka consumer group to reduce lag",
+    "Helm rollback to the previous release revision",
+    "Prometheus alert fires for high disk pressure on node",
+    "Jenkins pipeline fails with permission denied on docker.sock",
+    "Postgres replication slot is growing without bound",
+    "Argo CD application stuck in progressing state",
+]
+
+WORDS = ("kubernetes docker terraform ansible jenkins helm prometheus grafana nginx postgres redis kafka "
+         "pod node deployment rollback restart timeout latency certificate secret volume ingress service "
+         "cluster pipeline build artifact image registry alert dashboard runbook incident outage").split()
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def _corpus(n: int, seed: int):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))) for _ in range(n)]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_child(label: str, n_sentences: int, n_queries: int, seed: int) -> dict:
+    from app.core import embeddings
+
+    name, quantize = BACKENDS[label]
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    backend = embeddings.get_backend(name, quantize=quantize)
+    backend.encode(["warmup"])
+    load_s = time.perf_counter() - t0
+
+    corpus = _corpus(n_sentences, seed)
+    t0 = time.perf_counter()
+    backend.encode(corpus)
+    throughput = n_sentences / (time.perf_counter() - t0)
+
+    latencies = []
+    queries = _corpus(n_queries, seed + 1)
+    for q in queries:
+        t0 = time.perf_counter()
+        backend.encode([q])
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "backend": label,
+        "load_s": round(load_s, 2),
+        "sentences_per_sec": round(throughput, 1),
+        "single_p50_ms": round(_percentile(latencies, 50), 2),
+        "single_p99_ms": round(_percentile(latencies, 99), 2),
+        "rss_mb": round(_rss_mb(), 1),
+        "rss_delta_mb": round(_rss_mb() - rss_before, 1),
+        "sample_embeddings": backend.encode(SAMPLE_TEXTS).tolist(),
+    }
+
+
+def _cosine_stats(ref, cand):
+    import numpy as np
+
+    a = np.asarray(ref, dtype=np.float32)
+    b = np.asarray(cand, dtype=np.float32)
+    a /= np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b /= np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    cos = (a * b).sum(axis=1)
+    return round(float(cos.mean()), 5), round(float(cos.min()), 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--child", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.sentences, args.queries, args.seed)))
+        return
+
+    results = []
+    for label in args.backends:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", label, "--sentences", str(args.sentences),
+             "--queries", str(args.queries), "--seed", str(args.seed)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            results.append({"backend": label, "error": proc.stderr.strip().splitlines()[-1:] or ["failed"]})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    # Fidelity against the PyTorch model, when it ran
+    reference = next((r for r in results if r.get("backend") == "sentence-transformers" and "error" not in r), None)
+    for r in results:
+        if "error" not in r and reference is not None:
+            r["mean_cosine_vs_torch"], r["min_cosine_vs_torch"] = _cosine_stats(
+                reference["sample_embeddings"], r["sample_embeddings"])
+    for r in results:
+        r.pop("sample_embeddings", None)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'backend':<24}{'load s':>8}{'sent/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>9}{'cos mean':>10}{'cos min':>9}"
+    print(header)
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<24}error: {r['error'][0]}")
+            continue
+        print(f"{r['backend']:<24}{r['load_s']:>8}{r['sentences_per_sec']:>10}{r['single_p50_ms']:>9}"
+              f"{r['single_p99_ms']:>9}{r['rss_mb']:>9}{r.get('mean_cosine_vs_torch', '-'):>10}"
+              f"{r.get('min_cosine_vs_torch', '-'):>9}")
+    if reference is None:
+        print("(fidelity columns need the sentence-transformers backend in the run)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""Benchmark retrieval quality and latency across index backends and corpus sizes.
+
+Builds a labeled synthetic DevOps corpus (one runbook chunk per unique
+service/tool/symptom/action combination, and paraphrased questions whose
+answer is a known chunk), or loads one from JSONL files. Then, for each
+corpus size and backend, in a fresh subprocess with a scratch SQLite database
+and a scratch index directory, it reports:
+
+- ingestion: rows/sec into the database and docs/sec through the vector
+  rebuild path (`app.core.reindex`, embed + index)
+- query latency p50/p95/p99 (ms) for the index alone (pre-computed query
+  embeddings) and for `auth.search_docs`, which is what `retrieve_docs` calls
+- recall@1/5/10 and MRR@10 against the labeled relevant chunks
+
+Backends: `chroma`, `flat` and `hnsw` (the native index in
+`app.core.vector_index`) go through the vector path; `keyword` runs the
+database full-text search alone.
+
+The default `hash` embedder hashes word unigrams and bigrams into a fixed
+vector, so the run needs no model download; `--embedder model` uses the
+configured `EMBEDDING_BACKEND`/`EMBEDDING_MODEL` instead (set
+`HF_HUB_OFFLINE=1` with a locally cached model to stay offline).
+
+Usage (from the Backend directory):
+
+    python benchmarks/bench_retrieval.py                         # 1k, 10k and 100k chunks
+    python benchmarks/bench_retrieval.py --sizes 1000 --backends flat keyword
+    python benchmarks/bench_retrieval.py --output results.json   # machine-readable, diffable across runs
+    python benchmarks/bench_retrieval.py --export-corpus corpus/ --sizes 10000
+    python benchmarks/bench_retrieval.py --corpus corpus/10000/docs.jsonl --labels corpus/10000/queries.jsonl
+
+Corpus files are JSONL: docs as `{"id": 1, "title": ..., "content": ...}`,
+labels as `{"query": ..., "relevant": [1, ...]}`.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BACKENDS = ("chroma", "flat", "hnsw", "keyword")
+RECALL_AT = (1, 5, 10)
+_WORD_RE = re.compile(r"\w+")
+
+TOOLS = ["kubernetes", "docker", "terraform", "ansible", "jenkins", "helm", "prometheus", "grafana",
+         "nginx", "postgres", "redis", "kafka", "argocd", "vault", "istio", "elasticsearch"]
+# symptom -> phrasings a user might type instead
+SYMPTOMS = {
+    "timeout": ["requests timing out", "timeout"],
+    "crashloop": ["keeps crashing and restarting", "crashloop"],
+    "oomkilled": ["out of memory kills", "oomkilled"],
+    "latency spike": ["slow responses", "latency spike"],
+    "disk pressure": ["disk almost full", "disk pressure"],
+    "certificate expiry": ["expired tls cert", "certificate expiry"],
+    "connection refused": ["cannot connect", "connection refused"],
+    "permission denied": ["access denied errors", "permission denied"],
+    "image pull backoff": ["image fails to pull", "image pull backoff"],
+    "split brain": ["two primaries", "split brain"],
+}
+# action -> phrasings
+ACTIONS = {
+    "restart": ["bounce", "restart"], "rollback": ["revert", "roll back"], "scale": ["add capacity to", "scale"],
+    "upgrade": ["update", "upgrade"], "rotate": ["renew", "rotate"], "drain": ["evacuate", "drain"],
+    "migrate": ["move", "migrate"], "backup": ["snapshot", "back up"], "restore": ["recover", "restore"],
+    "deploy": ["ship", "deploy"],
+}
+SERVICE_PREFIXES = ["billing", "checkout", "search", "auth", "ledger", "catalog", "notify", "profile",
+                    "payments", "orders", "inventory", "shipping", "pricing", "reports", "gateway", "media",
+                    "session", "audit", "export", "import", "ingest", "metrics", "mailer", "scheduler"]
+SERVICE_SUFFIXES = ["api", "worker", "db", "cache", "queue", "cron", "proxy", "web", "sync", "stream",
+                    "store", "edge", "batch", "core", "admin", "hub", "relay", "index", "agent", "bridge",
+                    "daemon", "router", "feed", "vault"]
+STEPS = [
+    "Check the dashboards and confirm the alert is still firing before acting.",
+    "Page the on-call secondary if the change window is closed.",
+    "Record every command you run in the incident channel.",
+    "Compare the error rate against the last deploy marker.",
+    "Open a change ticket and link the alert that fired.",
+    "Verify backups completed in the last 24 hours first.",
+    "Announce the maintenance in the status page before starting.",
+    "Capture logs from the affected hosts for the postmortem.",
+]
+QUESTION_TEMPLATES = [
+    "{service} on {tool} has {symptom}, how do I {action} it?",
+    "how to {action} {service} when {tool} shows {symptom}",
+    "{symptom} in {tool} for {service} - what is the {action} procedure",
+    "runbook to {action} the {service} {tool} setup after {symptom}",
+]
+
+
+# -- corpus -----------------------------------------------------------------
+
+def _combo(index: int):
+    """Decode a combination index into (service, tool, symptom, action)."""
+    combos = []
+    for options in (SERVICE_SUFFIXES, SERVICE_PREFIXES, TOOLS, list(SYMPTOMS), list(ACTIONS)):
+        index, i = divmod(index, len(options))
+        combos.append(options[i])
+    suffix, prefix, tool, symptom, action = combos
+    return f"{prefix}-{suffix}", tool, symptom, action
+
+
+def generate_corpus(size: int, n_queries: int, seed: int):
+    """Return (docs, labels): `size` unique runbook chunks and paraphrased questions about some of them."""
+    total = len(SERVICE_PREFIXES) * len(SERVICE_SUFFIXES) * len(TOOLS) * len(SYMPTOMS) * len(ACTIONS)
+    if size > total:
+        raise SystemExit(f"synthetic corpus tops out at {total:,} chunks")
+    rng = random.Random(seed)
+    docs = []
+    for doc_id, combo in enumerate(rng.sample(range(total), size), start=1):
+        service, tool, symptom, action = _combo(combo)
+        steps = " ".join(rng.sample(STEPS, rng.randint(2, 5)))
+        docs.append({
+            "id": doc_id,
+            "title": f"{service} {tool}: {action} on {symptom}",
+            "content": (f"Runbook for {service} on {tool}. When {service} reports {symptom}, {action} the "
+                        f"affected {tool} resources one at a time and verify {symptom} has cleared. {steps}"),
+            "_combo": (service, tool, symptom, action),
+        })
+
+    labels = []
+    for doc in rng.sample(docs, min(n_queries, size)):
+        service, tool, symptom, action = doc["_combo"]
+        labels.append({
+            "query": rng.choice(QUESTION_TEMPLATES).format(
+                service=service, tool=tool, symptom=rng.choice(SYMPTOMS[symptom]), action=rng.choice(ACTIONS[action])),
+            "relevant": [doc["id"]],
+        })
+    for doc in docs:
+        del doc["_combo"]
+    return docs, labels
+
+
+def _read_jsonl(path: str):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_jsonl(path: str, rows) -> None:
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+# -- offline embedder ---------------------------------------------------------
+
+def _hash_backend(dim: int):
+    import numpy as np
+    from app.core import embeddings
+
+    class HashEmbeddingBackend(embeddings.EmbeddingBackend):
+        """Signed feature hashing of word unigrams and bigrams, L2-normalized (no model needed)."""
+
+        name = "hash"
+
+        def encode(self, texts):
+            out = np.zeros((len(texts), dim), dtype=np.float32)
+            for row, text in enumerate(texts):
+                tokens = _WORD_RE.findall(text.lower())
+                for feature in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+                    h = zlib.crc32(feature.encode("utf-8"))
+                    out[row, h % dim] += 1.0 if h & 0x80000000 else -1.0
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+            return out
+
+    return HashEmbeddingBackend()
+
+
+# -- measurement --------------------------------------------------------------
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _latency(timings_ms):
+    return {
+        "mean_ms": round(statistics.mean(timings_ms), 3),
+        "p50_ms": round(_percentile(timings_ms, 50), 3),
+        "p95_ms": round(_percentile(timings_ms, 95), 3),
+        "p99_ms": round(_percentile(timings_ms, 99), 3),
+    }
+
+
+def _quality(ranked_ids, labels):
+    """recall@k (share of relevant ids in the top k) and MRR over the ranked lists."""
+    recall = {k: [] for k in RECALL_AT}
+    reciprocal = []
+    for ids, label in zip(ranked_ids, labels):
+        relevant = {int(r) for r in label["relevant"]}
+        for k in RECALL_AT:
+            recall[k].append(len(relevant.intersection(ids[:k])) / len(relevant))
+        rank = next((i for i, d in enumerate(ids, start=1) if d in relevant), None)
+        reciprocal.append(1.0 / rank if rank else 0.0)
+    out = {f"recall@{k}": round(statistics.mean(v), 4) for k, v in recall.items()}
+    out[f"mrr@{max(RECALL_AT)}"] = round(statistics.mean(reciprocal), 4)
+    return out
+
+
+def _hit_ids(results):
+    ids = []
+    for r in results:
+        doc_id = (r.get("metadata") or {}).get("id") or r.get("id")
+        try:
+            ids.append(int(doc_id))
+        except (TypeError, ValueError):
+            ids.append(None)
+    return ids
+
+
+def run_child(backend: str, docs_path: str, labels_path: str, workdir: str, embedder: str, dim: int,
+              batch_size: int) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'docs.db')}"
+    if backend != "keyword":
+        os.environ["VECTOR_INDEX_BACKEND"] = backend
+
+    from app.core import auth, embeddings, fulltext, reindex, vector_store
+    from app.core.database import SessionLocal, engine
+    from app.core.models import Doc
+
+    # Keep indexes out of the project's .chromadb/.vectorindex
+    for kind in vector_store._PERSIST_DIRS:
+        vector_store._PERSIST_DIRS[kind] = os.path.join(workdir, kind)
+    if embedder == "hash":
+        hash_backend = _hash_backend(dim)
+        embeddings.get_backend = lambda *args, **kwargs: hash_backend
+
+    docs = _read_jsonl(docs_path)
+    labels = _read_jsonl(labels_path)
+    queries = [label["query"] for label in labels]
+    k = max(RECALL_AT)
+    result = {"backend": backend, "size": len(docs), "queries": len(labels)}
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        for start in range(0, len(docs), 5000):
+            conn.execute(Doc.__table__.insert(), [
+                {"id": int(d["id"]), "title": d["title"], "content": d["content"]} for d in docs[start:start + 5000]
+            ])
+    fulltext.init(engine)
+    load_s = time.perf_counter() - t0
+    result["ingest"] = {"db_s": round(load_s, 2), "db_rows_per_sec": round(len(docs) / load_s, 1)}
+
+    if backend == "keyword":
+        if not fulltext.is_ready():
+            raise SystemExit("full-text search unavailable")
+        db = SessionLocal()
+        try:
+            timings, ranked = [], []
+            for q in queries:
+                t0 = time.perf_counter()
+                hits = fulltext.search(db, q, limit=k, snippet_chars=None)
+                timings.append((time.perf_counter() - t0) * 1000)
+                ranked.append(_hit_ids(hits))
+        finally:
+            db.close()
+        result["search"] = {**_latency(timings), **_quality(ranked, labels)}
+        return result
+
+    if not vector_store.wait_until_ready(timeout=600):
+        raise SystemExit(f"vector store failed to load: {vector_store.status().get('error')}")
+    rebuilt = reindex.rebuild(batch_size=batch_size)
+    result["ingest"].update(index_s=rebuilt["elapsed_s"], index_docs_per_sec=rebuilt["docs_per_sec"])
+    result["embedder"] = vector_store._model.name
+
+    # Index alone: embeddings computed up front, one query per call as in a chat turn
+    collection = vector_store._collection
+    vectors = vector_store.embed(queries)
+    timings, ranked = [], []
+    for vec in vectors:
+        t0 = time.perf_counter()
+        hits = collection.query([vec], k)[0]
+        timings.append((time.perf_counter() - t0) * 1000)
+        ranked.append(_hit_ids(hits))
+    result["index"] = {**_latency(timings), **_quality(ranked, labels)}
+
+    # Full path: embed + index + fetch snippets from the database
+    timings, ranked = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits = auth.search_docs(q, top_k=k)
+        timings.append((time.perf_counter() - t0) * 1000)
+        ranked.append(_hit_ids(hits))
+    result["search"] = {**_latency(timings), **_quality(ranked, labels)}
+    return result
+
+
+def _run_backend(backend: str, docs_path: str, labels_path: str, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"pipelight-retrieval-{backend}-")
+    try:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--corpus", docs_path, "--labels", labels_path,
+             "--workdir", workdir, "--embedder", args.embedder, "--dim", str(args.dim),
+             "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if proc.returncode != 0:
+        return {"backend": backend, "error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _print_table(results) -> None:
+    k = max(RECALL_AT)
+    header = (f"  {'backend':<10}{'path':<8}{'ingest/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              + "".join(f"{'R@' + str(r):>7}" for r in RECALL_AT) + f"{'MRR':>7}")
+    current = object()
+    for r in results:
+        if r.get("size") != current:
+            current = r.get("size")
+            print(f"\n{current:,} chunks, {r['queries']} queries" if current else "")
+            print(header)
+        if "error" in r:
+            print(f"  {r['backend']:<10}error: {r['error']}")
+            continue
+        ingest = r["ingest"].get("index_docs_per_sec", r["ingest"]["db_rows_per_sec"])
+        for path in ("index", "search"):
+            if path not in r:
+                continue
+            m = r[path]
+            print(f"  {r['backend']:<10}{path:<8}{ingest:>10}{m['p50_ms']:>9}{m['p95_ms']:>9}{m['p99_ms']:>9}"
+                  + "".join(f"{m['recall@' + str(x)]:>7}" for x in RECALL_AT) + f"{m['mrr@' + str(k)]:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--queries", type=int, default=200, help="labeled queries per size (synthetic corpus)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash")
+    parser.add_argument("--dim", type=int, default=384, help="hash embedder dimension")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--corpus", default=None, help="docs JSONL to load instead of generating")
+    parser.add_argument("--labels", default=None, help="labeled queries JSONL for --corpus")
+    parser.add_argument("--export-corpus", default=None, metavar="DIR", help="write the generated corpus and stop")
+    parser.add_argument("--output", default=None, help="write results JSON to this file")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--child", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.corpus, args.labels, args.workdir, args.embedder, args.dim,
+                                   args.batch_size)))
+        return
+    if bool(args.corpus) != bool(args.labels):
+        parser.error("--corpus and --labels go together")
+
+    tmpdir = tempfile.mkdtemp(prefix="pipelight-retrieval-")
+    results = []
+    try:
+        if args.corpus:
+            corpora = [(os.path.abspath(args.corpus), os.path.abspath(args.labels))]
+        else:
+            corpora = []
+            for size in args.sizes:
+                docs, labels = generate_corpus(size, args.queries, args.seed)
+                out_dir = os.path.join(args.export_corpus or tmpdir, str(size))
+                os.makedirs(out_dir, exist_ok=True)
+                docs_path, labels_path = os.path.join(out_dir, "docs.jsonl"), os.path.join(out_dir, "queries.jsonl")
+                _write_jsonl(docs_path, docs)
+                _write_jsonl(labels_path, labels)
+                corpora.append((docs_path, labels_path))
+            if args.export_corpus:
+                print("\n".join(f"{d}\n{q}" for d, q in corpora))
+                return
+
+        for docs_path, labels_path in corpora:
+            for backend in args.backends:
+                res = _run_backend(backend, docs_path, labels_path, args)
+                results.append(res)
+                if not args.json and "error" not in res:
+                    print(f"  done: {res['size']:,} chunks on {backend}", file=sys.stderr)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report = {
+        "run": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "embedder": args.embedder,
+            "dim": args.dim if args.embedder == "hash" else None,
+            "seed": args.seed,
+            "corpus": args.corpus or "synthetic",
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway SQLite database before any app module reads settings
+_db_dir = tempfile.mkdtemp(prefix="pipelight-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
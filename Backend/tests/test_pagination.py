@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+
+from app.core import analytics
+from app.core.database import SessionLocal
+from app.core.models import Question
+
+
+@pytest.fixture
+def questions():
+    """Seven questions where several share a timestamp; returns ids newest first."""
+    analytics.init_schema()
+    times = [datetime(2026, 1, 1, 12, 0)] * 4 + [datetime(2026, 1, 1, 11, 0)] * 2 + [datetime(2026, 1, 1, 13, 0)]
+    db = SessionLocal()
+    try:
+        db.query(Question).delete()
+        rows = [Question(username="alice", question=f"q{n}", timestamp=ts, tags=[]) for n, ts in enumerate(times)]
+        rows.append(Question(username="bob", question="other user", timestamp=datetime(2026, 1, 1, 12, 0), tags=[]))
+        db.add_all(rows)
+        db.commit()
+        alice = [r for r in rows if r.username == "alice"]
+        return [r.id for r in sorted(alice, key=lambda r: (r.timestamp, r.id), reverse=True)]
+    finally:
+        db.close()
+
+
+def _all_pages(limit, **kwargs):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = analytics.page_questions(limit=limit, cursor=cursor, **kwargs)
+        ids += [q["id"] for q in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_pages_cover_equal_timestamps_once(questions, limit):
+    ids, pages = _all_pages(limit, username="alice")
+    assert ids == questions
+    assert pages == max(1, -(-len(questions) // limit))
+
+
+def test_cursor_keeps_fields_and_filter(questions):
+    page = analytics.page_questions(username="alice", limit=3, fields=["question"])
+    assert set(page["items"][0]) == {"question"}
+    rest = analytics.page_questions(username="alice", limit=10, cursor=page["next_cursor"], fields=["question"])
+    assert len(page["items"]) + len(rest["items"]) == len(questions)
+    assert rest["next_cursor"] is None
+
+
+def test_cursor_round_trip():
+    ts = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    assert analytics.decode_cursor(analytics.encode_cursor(ts, 42)) == (ts, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "bm9waXBl", analytics.encode_cursor(datetime(2026, 1, 1), 1)[:-4]])
+def test_bad_cursor_is_rejected(questions, cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        analytics.decode_cursor(cursor)
+    if cursor:
+        with pytest.raises(ValueError):
+            analytics.page_questions(username="alice", cursor=cursor)
@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from app.core.vector_index import NativeBackend
+
+
+def _vec(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return NativeBackend(str(tmp_path), mode="flat")
+
+
+def test_upsert_query_and_replace(backend):
+    index = backend.open("docs")
+    index.upsert(
+        ["a", "b"],
+        [_vec(1, 0, 0), _vec(0, 1, 0)],
+        ["doc a", "doc b"],
+        [{"source": "x"}, {"source": "y"}],
+    )
+    assert index.count() == 2
+
+    hit = index.query([_vec(1, 0, 0)], top_k=1)[0][0]
+    assert hit["id"] == "a"
+    assert hit["document"] == "doc a"
+    assert hit["metadata"] == {"source": "x"}
+
+    # re-upserting an id replaces its vector, document and metadata
+    index.upsert(["a"], [_vec(0, 0, 1)], ["doc a v2"], [{"source": "z"}])
+    assert index.count() == 2
+    hit = index.query([_vec(0, 0, 1)], top_k=1)[0][0]
+    assert (hit["id"], hit["document"], hit["metadata"]) == ("a", "doc a v2", {"source": "z"})
+    assert index.query([_vec(0, 0, 1)], top_k=5, where={"source": "x"}) == [[]]
+
+
+def test_delete_compact_and_reopen(backend):
+    index = backend.open("docs")
+    index.upsert(
+        ["a", "b", "c"],
+        [_vec(1, 0), _vec(0, 1), _vec(1, 1)],
+        ["doc a", "doc b", "doc c"],
+        [{}, {}, {"keep": True}],
+    )
+    index.upsert(["c"], [_vec(2, 2)], ["doc c v2"], [{"keep": True}])
+    index.delete(["b"])
+    assert sorted(index.ids()) == ["a", "c"]
+    assert index.tombstone_ratio() == pytest.approx(2 / 4)
+
+    assert index.compact() == 2
+    assert index.tombstone_ratio() == 0.0
+    assert sorted(index.ids()) == ["a", "c"]
+
+    reopened = backend.open("docs")
+    assert sorted(reopened.ids()) == ["a", "c"]
+    hits = reopened.query([_vec(2, 2)], top_k=2)[0]
+    assert [h["id"] for h in hits] == ["c", "a"]
+    assert hits[0]["document"] == "doc c v2"
+    assert hits[0]["metadata"] == {"keep": True}
+
+    # writes after a compaction land in the new files and survive another reopen
+    reopened.upsert(["d"], [_vec(0, 3)], ["doc d"], [{}])
+    assert sorted(backend.open("docs").ids()) == ["a", "c", "d"]
+
+
+def test_drop_removes_index(backend):
+    backend.open("old").upsert(["a"], [_vec(1.0)], ["doc"], [{}])
+    backend.open("new")
+    assert backend.names() == ["new", "old"]
+    backend.drop("old")
+    assert backend.names() == ["new"]
+
+
+def _reference_match(metadata, where):
+    """Filter semantics the native index mirrors (Chroma's `where`)."""
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(_reference_match(metadata, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(_reference_match(metadata, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            for op, expected in cond.items():
+                ok = {"$eq": value == expected, "$ne": value != expected}.get(op)
+                if ok is None:
+                    ok = (value in expected) if op == "$in" else (value not in expected)
+                if not ok:
+                    return False
+        elif metadata.get(key) != cond:
+            return False
+    return True
+
+
+FILTERS = [
+    {"team": "payments"},
+    {"team": "nobody"},
+    {"team": {"$ne": "payments"}},
+    {"environment": {"$in": ["prod", "staging"]}},
+    {"environment": {"$nin": ["prod"]}},
+    {"$and": [{"team": "search"}, {"doc_type": "runbook"}]},
+    {"$or": [{"team": "search"}, {"environment": "dev"}]},
+    {"$and": [{"$or": [{"team": "payments"}, {"team": "search"}]}, {"doc_type": {"$ne": "faq"}}]},
+    {"doc_type": None},
+]
+
+
+def test_filters_match_reference_after_writes(backend):
+    rng = np.random.default_rng(7)
+    index = backend.open("docs")
+
+    def _write(start, n):
+        metadatas = []
+        for i in range(start, start + n):
+            meta = {"id": i, "team": ["payments", "search", "platform"][i % 3]}
+            if i % 4:
+                meta["environment"] = ["prod", "staging", "dev"][i % 3 - 1]
+            if i % 5:
+                meta["doc_type"] = ["runbook", "faq"][i % 2]
+            metadatas.append(meta)
+        index.upsert([str(i) for i in range(start, start + n)], rng.random((n, 4)), [f"doc {i}" for i in range(start, start + n)], metadatas)
+        return {str(i): m for i, m in zip(range(start, start + n), metadatas)}
+
+    def _check(live):
+        for where in FILTERS:
+            hits = index.query([np.zeros(4)], top_k=10000, where=where)[0]
+            expected = {i for i, m in live.items() if _reference_match(m, where)}
+            assert {h["id"] for h in hits} == expected, where
+
+    live = _write(0, 60)
+    _check(live)
+    # appended rows, overwrites and deletes update the filter columns built above
+    live.update(_write(40, 50))
+    index.delete(["1", "2", "3"])
+    for i in ("1", "2", "3"):
+        del live[i]
+    _check(live)
+    index.compact()
+    _check(live)
+
+
+def test_unsupported_filter_operator(backend):
+    index = backend.open("docs")
+    index.upsert(["a"], [_vec(1.0)], ["doc"], [{"team": "x"}])
+    with pytest.raises(ValueError, match="Unsupported filter operator"):
+        index.query([_vec(1.0)], top_k=1, where={"team": {"$gt": "a"}})
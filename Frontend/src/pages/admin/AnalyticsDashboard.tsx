@@ -24,40 +24,33 @@ export default function AnalyticsDashboard() {
   const [bucket, setBucket] = useState<'hour' | 'day' | 'week' | 'month'>('day')
   const [daysBack, setDaysBack] = useState(30)
 
-  // Fetch all analytics data
-  const questionsTS: any = useAnalytics('/api/analytics/charts/questions-timeseries', {
-    bucket,
-    days_back: daysBack,
-  })
-  const tagsTS: any = useAnalytics('/api/analytics/charts/tags-timeseries', {
+  // Fetch all chart data in one request; insights and predictions are served from their own cache
+  const dashboard: any = useAnalytics('/api/analytics/charts/dashboard', {
     bucket,
     days_back: daysBack,
     top_n: 5,
+    correlation_top_n: 10,
+  })
+  const chart = (name: string) => ({
+    data: dashboard.data?.charts?.[name] ?? null,
+    loading: dashboard.loading,
+    error: dashboard.error,
+    refetch: dashboard.refetch,
   })
-  const distribution: any = useAnalytics('/api/analytics/charts/distribution')
-  const userComparison: any = useAnalytics('/api/analytics/charts/user-comparison')
-  const tagCorrelation: any = useAnalytics('/api/analytics/charts/tag-correlation', { top_n: 10 })
-  const successRate: any = useAnalytics('/api/analytics/charts/success-rate')
+  const questionsTS: any = chart('questions-timeseries')
+  const tagsTS: any = chart('tags-timeseries')
+  const distribution: any = chart('distribution')
+  const userComparison: any = chart('user-comparison')
+  const tagCorrelation: any = chart('tag-correlation')
+  const successRate: any = chart('success-rate')
   const insights: any = useAnalytics('/api/analytics/charts/insights')
   const predictions: any = useAnalytics('/api/analytics/charts/predictions')
-  const agentEfficiency: any = useAnalytics('/api/analytics/charts/agent-efficiency')
-  const activityHeatmap: any = useAnalytics('/api/analytics/charts/heatmap-hours', { days_back: daysBack })
-  const scatterTags: any = useAnalytics('/api/analytics/charts/scatter-tags-volume')
+  const agentEfficiency: any = chart('agent-efficiency')
+  const activityHeatmap: any = chart('heatmap-hours')
+  const scatterTags: any = chart('scatter-tags-volume')
 
   const refetchAll = () => {
-    ;[
-      questionsTS,
-      tagsTS,
-      distribution,
-      userComparison,
-      tagCorrelation,
-      successRate,
-      insights,
-      predictions,
-      agentEfficiency,
-      activityHeatmap,
-      scatterTags,
-    ].forEach((q) => q.refetch())
+    ;[dashboard, insights, predictions].forEach((q) => q.refetch())
   }
 
   return (